@@ -0,0 +1,143 @@
+"""Throughput of the /api/* polling endpoints: sync views on WSGI vs async views on ASGI.
+
+Each mode runs in its own process against a freshly seeded test database.
+
+- wsgi: the sync views behind Django's WSGI handler, served by a fixed pool
+  of worker threads like a threaded WSGI server.
+- asgi: the async views from dashboard.api behind the ASGI handler, with every
+  poller as a task on a single event loop.
+
+The handlers are called in-process, so server and network overhead are left out.
+
+    python benchmarks/bench_async_api.py [--pollers 300] [--rounds 5] [--wsgi-threads 16]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ['/api/dashboard-stats/', '/api/chart-data/', '/api/notifications/', '/api/ai/summary/', '/api/ai/suggestions/']
+
+
+def setup_django(async_api):
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coordinator_management.settings')
+    os.environ['ASYNC_API'] = '1' if async_api else '0'
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def seed():
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from dashboard.models import District, Initiative, Note, Task, UserProfile
+
+    district = District.objects.create(name='Batticaloa')
+    user = User.objects.create_user('poller', password='pw')
+    profile = UserProfile.objects.create(user=user, role='coordinator', district=district)
+    now = timezone.now()
+    for i in range(20):
+        initiative = Initiative.objects.create(
+            title=f'Initiative {i}', description='d', initiative_type='other', status='active',
+            district=district, coordinator=profile, start_date=now.date(),
+        )
+        Task.objects.bulk_create(
+            Task(
+                title=f'Task {i}-{j}', description='d', initiative=initiative, assigned_to=profile,
+                created_by=profile, due_date=now + timezone.timedelta(days=j - 10),
+                status=['not_started', 'in_progress', 'completed'][j % 3], progress_percentage=j * 5,
+            )
+            for j in range(20)
+        )
+        Note.objects.create(title=f'Note {i}', content='c', initiative=initiative, author=profile)
+
+
+def report(mode, latencies, elapsed, errors):
+    latencies.sort()
+    print(f'{mode}: {len(latencies) / elapsed:8.0f} req/s  p50 {statistics.median(latencies) * 1000:7.1f} ms'
+          f'  p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f} ms  errors {errors}')
+
+
+def run_wsgi(args):
+    from django.test import Client
+
+    seed()
+    cookies = Client()
+    cookies.login(username='poller', password='pw')
+    # Warm the session and auth snapshot outside the timed run
+    cookies.get(ENDPOINTS[0])
+    latencies, errors = [], 0
+
+    def poll(n):
+        client = Client()
+        client.cookies = cookies.cookies
+        started = time.perf_counter()
+        status = client.get(ENDPOINTS[n % len(ENDPOINTS)]).status_code
+        return time.perf_counter() - started, status
+
+    total = args.pollers * args.rounds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.wsgi_threads) as pool:
+        for latency, status in pool.map(poll, range(total)):
+            latencies.append(latency)
+            errors += status != 200
+    report(f'wsgi ({args.wsgi_threads} threads)', latencies, time.perf_counter() - started, errors)
+
+
+def run_asgi(args):
+    from asgiref.sync import sync_to_async
+    from django.test import AsyncClient, Client
+
+    seed()
+    cookies = Client()
+    cookies.login(username='poller', password='pw')
+
+    async def main():
+        latencies, errors = [], 0
+
+        async def poller(n):
+            nonlocal errors
+            client = AsyncClient()
+            client.cookies = cookies.cookies
+            for r in range(args.rounds):
+                started = time.perf_counter()
+                response = await client.get(ENDPOINTS[(n + r) % len(ENDPOINTS)])
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        # Warm the session and auth snapshot outside the timed run
+        await sync_to_async(cookies.get)(ENDPOINTS[0])
+        started = time.perf_counter()
+        await asyncio.gather(*(poller(n) for n in range(args.pollers)))
+        report('asgi (1 event loop)', latencies, time.perf_counter() - started, errors)
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pollers', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=5, help='Requests per poller')
+    parser.add_argument('--wsgi-threads', type=int, default=16)
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        setup_django(async_api=args.mode == 'asgi')
+        (run_asgi if args.mode == 'asgi' else run_wsgi)(args)
+        return
+    for mode in ('wsgi', 'asgi'):
+        subprocess.run([sys.executable, __file__, '--mode', mode, *sys.argv[1:]], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Time of one bulk action over many tasks.
+
+- per-row: ``save()`` on every task, as editing them one by one does, with
+  the counter and activity signals firing per row.
+- bulk: ``dashboard.bulk.apply`` as shipped, one UPDATE per action plus one
+  counter refresh and one batched activity insert.
+
+Runs against a freshly created test database.
+
+    python benchmarks/bench_bulk_actions.py [--rows 10000] [--per-row-rows 1000]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coordinator_management.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def seed(rows):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from dashboard.models import District, Initiative, Task, UserProfile
+
+    Task.objects.all().delete()
+    district = District.objects.get_or_create(name='Batticaloa')[0]
+    user = User.objects.get_or_create(username='bench')[0]
+    profile = UserProfile.objects.get_or_create(user=user, defaults={'role': 'admin', 'district': district})[0]
+    initiatives = [
+        Initiative.objects.get_or_create(
+            title=title, defaults=dict(
+                description='d', initiative_type='other', status='active', district=district,
+                coordinator=profile, start_date=timezone.now().date(),
+            ),
+        )[0]
+        for title in ('Source', 'Target')
+    ]
+    Task.objects.bulk_create(
+        (Task(title=f'Task {i}', description='d', initiative=initiatives[0], assigned_to=profile,
+              created_by=profile, due_date=timezone.now()) for i in range(rows)),
+        batch_size=1000,
+    )
+    Initiative.objects.refresh_counters()
+    return profile, initiatives[1]
+
+
+def per_row(profile, target):
+    from django.db import transaction
+    from dashboard.models import Task
+
+    with transaction.atomic():
+        for task in Task.objects.all():
+            task.initiative = target
+            task.save()
+
+
+def bulk_move(profile, target):
+    from dashboard import bulk
+    from dashboard.models import Task
+
+    bulk.apply(Task.objects.all(), 'move', target.pk, profile)
+
+
+def timed(rows, run):
+    profile, target = seed(rows)
+    start = time.perf_counter()
+    run(profile, target)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='Tasks moved by the bulk action')
+    parser.add_argument('--per-row-rows', type=int, default=1000, help='Tasks saved one by one (slow)')
+    args = parser.parse_args()
+
+    setup_django()
+    print(f'{"variant":>8} {"rows":>7} {"seconds":>8}')
+    print(f'{"per-row":>8} {args.per_row_rows:>7} {timed(args.per_row_rows, per_row):>8.2f}')
+    print(f'{"bulk":>8} {args.rows:>7} {timed(args.rows, bulk_move):>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Time to delete a district with Django's cascade and with delete_target.
+
+Each run seeds one district with ``--initiatives`` initiatives holding
+``--size`` tasks, notes and documents each, then deletes it. Runs against a
+freshly created test database.
+
+    python benchmarks/bench_bulk_delete.py [--initiatives 20] [--sizes 50,200,500]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coordinator_management.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def seed(initiatives, size):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from dashboard.models import District, Document, Initiative, Note, Task, UserProfile
+
+    district = District.objects.create(name=f'District {time.monotonic_ns()}')
+    user = User.objects.get_or_create(username='bench')[0]
+    profile = UserProfile.objects.get_or_create(user=user, defaults={'role': 'coordinator'})[0]
+    now = timezone.now()
+    for i in range(initiatives):
+        initiative = Initiative.objects.create(
+            title=f'Initiative {i}', description='d', initiative_type='other', status='active',
+            district=district, coordinator=profile, start_date=now.date(),
+        )
+        tasks = Task.objects.bulk_create(
+            Task(title='t', description='d', initiative=initiative, assigned_to=profile, created_by=profile, due_date=now)
+            for _ in range(size)
+        )
+        Note.objects.bulk_create(
+            Note(title='n', content='c', initiative=initiative, task=task, author=profile) for task in tasks
+        )
+        Document.objects.bulk_create(
+            Document(title='d', file='documents/x.txt', initiative=initiative, uploaded_by=profile) for _ in range(size)
+        )
+    return district
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--initiatives', type=int, default=20)
+    parser.add_argument('--sizes', default='50,200,500', help='Tasks, notes and documents per initiative')
+    args = parser.parse_args()
+
+    setup_django()
+    from dashboard.deletion import delete_target
+
+    strategies = {'cascade': lambda district: district.delete(), 'bulk': delete_target}
+    print(f'{"rows":>8} {"cascade s":>10} {"bulk s":>8}')
+    for size in (int(n) for n in args.sizes.split(',')):
+        timings = {}
+        for name, delete in strategies.items():
+            district = seed(args.initiatives, size)
+            started = time.perf_counter()
+            delete(district)
+            timings[name] = time.perf_counter() - started
+        print(f'{args.initiatives * size * 3:>8} {timings["cascade"]:>10.2f} {timings["bulk"]:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
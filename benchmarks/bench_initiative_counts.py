@@ -0,0 +1,104 @@
+"""Cost of the initiative list counters as tasks and notes per initiative grow.
+
+- join: the old Count('tasks') / Count('notes') annotations in one query. The
+  tasks x notes join makes this grow with the product of the two counts, and
+  it also over-counts.
+- subquery: Initiative.objects.with_actual_counts(). It uses one correlated
+  COUNT per relation, so the cost grows with their sum.
+- columns: the denormalized counters that initiatives_list reads.
+
+Runs against a freshly created test database.
+
+    python benchmarks/bench_initiative_counts.py [--initiatives 20] [--sizes 25,50,100,200] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coordinator_management.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def seed(initiatives, per_initiative):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from dashboard.models import District, Initiative, Note, Task, UserProfile
+
+    Note.objects.all().delete()
+    Task.objects.all().delete()
+    Initiative.objects.all().delete()
+    district = District.objects.get_or_create(name='Batticaloa')[0]
+    user = User.objects.get_or_create(username='bench')[0]
+    profile = UserProfile.objects.get_or_create(user=user, defaults={'role': 'coordinator', 'district': district})[0]
+    now = timezone.now()
+    for i in range(initiatives):
+        initiative = Initiative.objects.create(
+            title=f'Initiative {i}', description='d', initiative_type='other', status='active',
+            district=district, coordinator=profile, start_date=now.date(),
+        )
+        Task.objects.bulk_create(
+            Task(title='t', description='d', initiative=initiative, assigned_to=profile, created_by=profile,
+                 due_date=now, status='completed' if j % 2 else 'in_progress')
+            for j in range(per_initiative)
+        )
+        Note.objects.bulk_create(
+            Note(title='n', content='c', initiative=initiative, author=profile) for _ in range(per_initiative)
+        )
+    # bulk_create skips the counter signals
+    Initiative.objects.refresh_counters()
+
+
+def strategies():
+    from django.db.models import Count, Q
+    from dashboard.models import Initiative
+
+    return {
+        'join': lambda: list(Initiative.objects.annotate(
+            total_tasks=Count('tasks'),
+            completed_tasks=Count('tasks', filter=Q(tasks__status='completed')),
+            total_notes=Count('notes'),
+        ).values_list('pk', 'total_tasks', 'completed_tasks', 'total_notes')),
+        'subquery': lambda: list(Initiative.objects.with_actual_counts().values_list(
+            'pk', 'actual_tasks_count', 'actual_completed_tasks_count', 'actual_notes_count',
+        )),
+        'columns': lambda: list(Initiative.objects.values_list(
+            'pk', 'tasks_count', 'completed_tasks_count', 'notes_count',
+        )),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--initiatives', type=int, default=20)
+    parser.add_argument('--sizes', default='25,50,100,200', help='Tasks (and notes) per initiative')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    print(f'{"per initiative":>15} {"join rows":>10} {"join ms":>9} {"subquery ms":>12} {"columns ms":>11}')
+    for size in (int(n) for n in args.sizes.split(',')):
+        seed(args.initiatives, size)
+        timings = {}
+        for name, run in strategies().items():
+            run()  # warm the page cache
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                run()
+            timings[name] = (time.perf_counter() - started) / args.repeat * 1000
+        print(f'{size:>15} {args.initiatives * size * size:>10} {timings["join"]:>9.1f}'
+              f' {timings["subquery"]:>12.1f} {timings["columns"]:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Bytes and time per row of the tasks list as HTML and through /api/tasks/.
+
+- html: ``tasks_list`` rendered from scratch (fragment cache cleared)
+- json / compact: one page of ``/api/tasks/`` with the default fields
+
+Each is measured plain and gzipped. Runs against a freshly created test
+database.
+
+    python benchmarks/bench_list_api.py [--rows 100] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(page_size):
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coordinator_management.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    settings.API_PAGE_SIZE = page_size
+    connection.creation.create_test_db(verbosity=0)
+
+
+def seed(rows):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from dashboard.models import District, Initiative, Task, UserProfile
+
+    district = District.objects.create(name='Batticaloa')
+    user = User.objects.create_user('bench', password='bench')
+    profile = UserProfile.objects.create(user=user, role='coordinator', district=district)
+    initiative = Initiative.objects.create(
+        title='Initiative', description='d', initiative_type='other', status='active',
+        district=district, coordinator=profile, start_date=timezone.now().date(),
+    )
+    Task.objects.bulk_create(
+        Task(title=f'Task {i}', description='Follow up with the venue', summary='Follow up with the venue',
+             initiative=initiative, assigned_to=profile, created_by=profile, due_date=timezone.now())
+        for i in range(rows)
+    )
+
+
+def measure(client, url, repeat, gzip):
+    from django.core.cache import cache
+
+    headers = {'HTTP_ACCEPT_ENCODING': 'gzip'} if gzip else {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        cache.clear()
+        response = client.get(url, **headers)
+    assert response.status_code == 200, response.status_code
+    return len(response.content), (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100, help='Tasks listed (one API page)')
+    parser.add_argument('--repeat', type=int, default=20, help='Requests timed per variant')
+    args = parser.parse_args()
+
+    setup_django(args.rows)
+    from django.test import Client
+    from django.urls import reverse
+
+    seed(args.rows)
+    client = Client()
+    client.login(username='bench', password='bench')
+    variants = {
+        'html': reverse('tasks_list'),
+        'json': reverse('tasks_api'),
+        'compact': reverse('tasks_api') + '?format=compact',
+    }
+    print(f'{"variant":>8} {"bytes/row":>10} {"gzip b/row":>11} {"us/row":>8}')
+    for name, url in variants.items():
+        measure(client, url, 1, False)  # warm imports and template loading
+        size, seconds = measure(client, url, args.repeat, False)
+        gzipped, _ = measure(client, url, 1, True)
+        print(f'{name:>8} {size / args.rows:>10.0f} {gzipped / args.rows:>11.0f} {seconds / args.rows * 1e6:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
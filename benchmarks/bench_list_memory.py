@@ -0,0 +1,100 @@
+"""Peak Python memory of one tasks_list / notes_list request.
+
+- full: the lists load every column of the rows they show, including the
+  task descriptions and note contents.
+- deferred: the lists as shipped, which leave those columns out and render
+  the stored ``summary`` instead.
+
+Peaks are measured with tracemalloc around ``Client.get`` and the cache is
+cleared before each request, so the list is rendered every time. Runs
+against a freshly created test database.
+
+    python benchmarks/bench_list_memory.py [--rows 200] [--text-kb 20]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coordinator_management.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def seed(rows, text_kb):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from django.utils.text import Truncator
+    from dashboard.models import SUMMARY_LENGTH, District, Initiative, Note, Task, UserProfile
+
+    district = District.objects.create(name='Batticaloa')
+    user = User.objects.create_user('bench', password='bench')
+    profile = UserProfile.objects.create(user=user, role='coordinator', district=district)
+    initiative = Initiative.objects.create(
+        title='Initiative', description='d', initiative_type='other', status='active',
+        district=district, coordinator=profile, start_date=timezone.now().date(),
+    )
+    text = ('lorem ipsum ' * (text_kb * 1024 // 12 + 1))[:text_kb * 1024]
+    summary = Truncator(text).chars(SUMMARY_LENGTH)
+    Task.objects.bulk_create(
+        Task(title=f'Task {i}', description=text, summary=summary, initiative=initiative,
+             assigned_to=profile, created_by=profile, due_date=timezone.now())
+        for i in range(rows)
+    )
+    Note.objects.bulk_create(
+        Note(title=f'Note {i}', content=text, summary=summary, initiative=initiative, author=profile)
+        for i in range(rows)
+    )
+
+
+def peak_kb(client, url):
+    from django.core.cache import cache
+
+    cache.clear()
+    tracemalloc.start()
+    response = client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.status_code == 200, response.status_code
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200, help='Tasks and notes to list')
+    parser.add_argument('--text-kb', type=int, default=20, help='Size of each description / content')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from django.urls import reverse
+    from dashboard import views
+
+    seed(args.rows, args.text_kb)
+    client = Client()
+    client.login(username='bench', password='bench')
+    projections = {
+        'tasks_list': ('TASK_CARD_DEFER', views.TASK_CARD_DEFER),
+        'notes_list': ('NOTE_CARD_DEFER', views.NOTE_CARD_DEFER),
+    }
+    print(f'{"view":>12} {"full KiB":>10} {"deferred KiB":>13}')
+    for name, (constant, deferred) in projections.items():
+        url = reverse(name)
+        peak_kb(client, url)  # warm imports and template loading
+        setattr(views, constant, ())
+        full = peak_kb(client, url)
+        setattr(views, constant, deferred)
+        print(f'{name:>12} {full:>10.0f} {peak_kb(client, url):>13.0f}')
+
+
+if __name__ == '__main__':
+    main()
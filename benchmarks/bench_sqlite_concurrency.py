@@ -0,0 +1,129 @@
+"""Reader latency and write failures under concurrent SQLite writers.
+
+Runs the same workload against a scratch database twice: once with SQLite's
+defaults (rollback journal) and once with the connection pragmas from
+``settings.DATABASES`` plus a process-wide write lock, which is what
+``dashboard.db.serialized_write`` does for the app. Both runs use the sqlite3
+module's default 5 second busy timeout.
+
+    python benchmarks/bench_sqlite_concurrency.py [--seconds 5] [--readers 8] [--writers 4]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coordinator_management.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+
+def tuned_pragmas():
+    options = settings.DATABASES['default'].get('OPTIONS', {})
+    return [cmd.strip() for cmd in options.get('init_command', '').split(';') if cmd.strip()]
+
+
+def connect(path, pragmas, timeout):
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+    for pragma in pragmas:
+        conn.execute(pragma)
+    return conn
+
+
+def run(label, pragmas, timeout, write_lock, args):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+    setup = connect(path, pragmas, timeout)
+    setup.execute('CREATE TABLE task (id INTEGER PRIMARY KEY, status TEXT, progress INTEGER)')
+    setup.executemany('INSERT INTO task (status, progress) VALUES (?, ?)', [('not_started', 0)] * 5000)
+    setup.close()
+
+    stop = threading.Event()
+    read_latencies, write_latencies = [], []
+    failures = {'read': 0, 'write': 0}
+    guard = threading.Lock()
+
+    def reader():
+        conn = connect(path, pragmas, timeout)
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                conn.execute("SELECT status, COUNT(*) FROM task GROUP BY status").fetchall()
+            except sqlite3.OperationalError:
+                with guard:
+                    failures['read'] += 1
+                continue
+            with guard:
+                read_latencies.append(time.perf_counter() - started)
+
+    def writer():
+        conn = connect(path, pragmas, timeout)
+        n = 0
+        while not stop.is_set():
+            n += 1
+            started = time.perf_counter()
+            try:
+                if write_lock:
+                    write_lock.acquire()
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    for pk in range(n % 5000, n % 5000 + 50):
+                        conn.execute('UPDATE task SET status = ?, progress = ? WHERE id = ?', ('in_progress', n % 100, pk))
+                    # Simulate the rest of a request (signals, activity rows) inside the transaction
+                    time.sleep(0.005)
+                    conn.execute('COMMIT')
+                finally:
+                    if write_lock:
+                        write_lock.release()
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                with guard:
+                    failures['write'] += 1
+                continue
+            with guard:
+                write_latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    def pct(values, q):
+        if not values:
+            return float('nan')
+        return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) > 1 else values[0] * 1000
+
+    print(f'{label}')
+    print(f'  reads : {len(read_latencies) / args.seconds:9.0f}/s  p50 {pct(read_latencies, 50):7.2f} ms'
+          f'  p99 {pct(read_latencies, 99):7.2f} ms  failed {failures["read"]}')
+    print(f'  writes: {len(write_latencies) / args.seconds:9.0f}/s  p50 {pct(write_latencies, 50):7.2f} ms'
+          f'  p99 {pct(write_latencies, 99):7.2f} ms  failed {failures["write"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    args = parser.parse_args()
+
+    run('defaults (rollback journal)', [], 5, None, args)
+    run('tuned (settings pragmas + write lock)', tuned_pragmas(),
+        settings.DATABASES['default']['OPTIONS'].get('timeout', 5), threading.Lock(), args)
+
+
+if __name__ == '__main__':
+    main()
@@ -54,7 +54,9 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'dashboard.middleware.CachedAuthenticationMiddleware',
+    'dashboard.middleware.CurrentRequestMiddleware',
+    'dashboard.middleware.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -74,9 +76,11 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'dashboard.fragments.fragment_cache',
             ],
             'libraries': {
                 'string_extras': 'dashboard.templatetags.string_extras',
+                'previews': 'dashboard.templatetags.previews',
             },
         },
     },
@@ -92,9 +96,103 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections (and their page cache) between requests
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # WAL lets readers run alongside the single writer; the rest trades
+            # fsyncs and syscalls for memory. Run once per new connection.
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            # Take the write lock at BEGIN so a transaction never fails while
+            # upgrading from a read lock
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
     }
 }
 
+# Sessions are read from the cache and only fall back to the database on a
+# miss. Run a shared cache (REDIS_URL) with more than one worker process so
+# that user invalidations reach every worker.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'coordinator-management',
+        }
+    }
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Seconds a session's copy of the user is trusted before it is reloaded; with
+# the per-process cache this is how long other workers can miss a change
+AUTH_SNAPSHOT_TTL = 60
+
+# Serve the /api/* polling endpoints from the async views in dashboard.api.
+# Turn on when running under an ASGI server (e.g. uvicorn coordinator_management.asgi:application).
+ASYNC_API = os.environ.get('ASYNC_API', '').lower() in ('1', 'true', 'yes')
+
+# Template fragments are keyed on updated_at stamps, so they can live long
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Pivot reports are keyed on a change stamp of the rows they read
+REPORT_CACHE_TIMEOUT = 60 * 60
+
+# Longest a request waits for this process's write slot (see dashboard.db)
+SQLITE_WRITE_LOCK_TIMEOUT = 5
+
+# Districts, initiatives and users with more dependent rows than this are
+# deleted by `manage.py run_deletion_jobs` instead of in the request
+DELETE_INLINE_LIMIT = 5000
+# A queued deletion may wait longer for the write slot than a request
+DELETE_WRITE_LOCK_TIMEOUT = 60
+
+# Completed and cancelled initiatives untouched for this long are moved to the
+# archive tables by `manage.py archive_initiatives`
+ARCHIVE_AFTER_DAYS = 365
+
+# /api/sync/: most rows per stream in one response, and how long deletions are
+# remembered for clients (older cursors get a full resync); see dashboard.sync
+SYNC_PAGE_SIZE = 500
+SYNC_TOMBSTONE_DAYS = 90
+
+# Largest page of the /api/tasks/, /api/initiatives/ and /api/notes/ lists
+API_PAGE_SIZE = 100
+
+# Optional read replica for reports and API reads, refreshed from the primary
+# with `manage.py sync_replica`. Views opt in with dashboard.routers.replica_reads.
+if os.environ.get('DB_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DB_REPLICA_PATH'],
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only=ON;PRAGMA mmap_size=134217728;PRAGMA cache_size=-20000;',
+            'timeout': 5,
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['dashboard.routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+# Seconds a user's reads stay on the primary after they write
+REPLICA_LAG_TOLERANCE = int(os.environ.get('REPLICA_LAG_TOLERANCE', 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,6 +238,37 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Documents are stored content-addressed (deduplicated by SHA-256)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # Outside DEBUG, collectstatic emits minified, content-hashed and
+    # precompressed files (see dashboard.staticfiles)
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'dashboard.staticfiles.CompressedManifestStaticFilesStorage'
+        ),
+    },
+    'documents': {
+        'BACKEND': 'dashboard.storage.ContentAddressedStorage',
+        'OPTIONS': {'allow_overwrite': True},
+    },
+}
+
+# How permission-checked document downloads are transferred: 'django'
+# (FileResponse, for runserver), 'nginx' (X-Accel-Redirect to an internal
+# location aliasing MEDIA_ROOT) or 'apache' (X-Sendfile)
+DOCUMENT_SERVE_MODE = os.environ.get('DOCUMENT_SERVE_MODE', 'django')
+DOCUMENT_ACCEL_PREFIX = '/protected-media/'
+
+# Hash uploads while they stream in so storage never re-reads them
+FILE_UPLOAD_HANDLERS = [
+    'dashboard.storage.HashingMemoryFileUploadHandler',
+    'dashboard.storage.HashingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -171,5 +300,19 @@ ACCOUNT_EMAIL_VERIFICATION = 'none'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
 
+# Resumable chunked document uploads
+CHUNKED_UPLOAD_MAX_SIZE = 500 * 1024 * 1024
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+
+# Thumbnail renditions (longest edge in pixels) made by generate_previews
+PREVIEW_SIZES = {'sm': 160, 'md': 480}
+
+# Calendar subscription feeds: window of days rendered around today
+CALENDAR_FEED_PAST_DAYS = 30
+CALENDAR_FEED_FUTURE_DAYS = 180
+
+# Activity timeline page size
+TIMELINE_PAGE_SIZE = 20
+
 # Custom User Model (if needed later)
 # AUTH_USER_MODEL = 'dashboard.CustomUser'
@@ -14,9 +14,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from django.views.static import serve
+
+from dashboard.staticfiles import serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -24,6 +26,20 @@ urlpatterns = [
     path('', include('dashboard.urls')),
 ]
 
-# Serve media files during development
+# Serve media files during development. Documents and their previews are
+# excluded: they are only reachable through the permission-checked
+# document_download and document_preview views.
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += [
+        re_path(
+            r'^%s(?!documents/|previews/)(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'),
+            serve,
+            {'document_root': settings.MEDIA_ROOT},
+        ),
+    ]
+else:
+    # Hashed, precompressed static files for deployments without a front-end
+    # server; nginx should serve STATIC_ROOT directly when present
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_static),
+    ]
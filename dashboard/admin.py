@@ -1,7 +1,85 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import District, UserProfile, Initiative, Task, Note, Document
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField, ExpressionWrapper, Max, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from . import archive, bulk
+from .db import WriteQueueTimeout
+from .deletion import job_progress
+from .models import (
+    District, UserProfile, Initiative, Task, Note, Document, KpiSnapshot, DeletionJob, InitiativeArchive,
+    InitiativeSheet, Event,
+)
+
+class EstimatedCountPaginator(Paginator):
+    """Changelist paginator that never counts a large table exactly.
+
+    Unfiltered lists use the planner's row estimate (PostgreSQL) or the
+    highest id (SQLite) once the table is past ``COUNT_LIMIT`` rows; filtered
+    lists count at most ``COUNT_LIMIT`` matches.
+    """
+    COUNT_LIMIT = 10000
+
+    def estimated_rows(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if queryset.model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField'):
+            return queryset.model._default_manager.aggregate(n=Max('pk'))['n'] or 0
+        return None
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimated_rows()
+            if estimate is not None and estimate > self.COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:self.COUNT_LIMIT].count()
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Changelist defaults for tables that grow without bound"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class ProfileFilter(admin.SimpleListFilter):
+    """Filter by a person's username typed into a box, instead of listing
+    every profile as an option"""
+    template = 'admin/input_filter.html'
+    profile_field = None
+
+    def lookups(self, request, model_admin):
+        # The filter is only shown when it has lookups; they are never listed
+        return [('', '')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f'{self.profile_field}__user__username': self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        # The other active filters, kept as hidden fields of the search box
+        all_choice['query_parts'] = [
+            (key, value)
+            for key, values in changelist.get_filters_params().items() if key != self.parameter_name
+            for value in values
+        ]
+        yield all_choice
+
+def profile_filter(field, title):
+    return type(f'{field.title()}Filter', (ProfileFilter,), {
+        'title': title, 'parameter_name': field, 'profile_field': field,
+    })
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -12,7 +90,10 @@ class CustomUserAdmin(UserAdmin):
     inlines = (UserProfileInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'get_role', 'get_district')
     list_filter = ('profile__role', 'profile__district', 'is_staff', 'is_active')
+    list_select_related = ('profile__district',)
     search_fields = ('username', 'first_name', 'last_name', 'email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     def get_role(self, obj):
         return obj.profile.get_role_display() if hasattr(obj, 'profile') else 'N/A'
@@ -22,41 +103,132 @@ class CustomUserAdmin(UserAdmin):
         return obj.profile.district.name if hasattr(obj, 'profile') and obj.profile.district else 'N/A'
     get_district.short_description = 'District'
 
+class UserProfileAdmin(ScalableAdmin):
+    list_display = ('user', 'role', 'district', 'phone')
+    list_filter = ('role', 'district')
+    list_select_related = ('user', 'district')
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+    autocomplete_fields = ('user', 'district')
+
 class DistrictAdmin(admin.ModelAdmin):
     list_display = ('name', 'description', 'created_at', 'updated_at')
     search_fields = ('name', 'description')
     ordering = ('name',)
 
-class InitiativeAdmin(admin.ModelAdmin):
+class InitiativeAdmin(ScalableAdmin):
     list_display = ('title', 'district', 'coordinator', 'initiative_type', 'status', 'start_date', 'end_date')
-    list_filter = ('status', 'initiative_type', 'district', 'coordinator')
+    list_filter = ('status', 'initiative_type', 'district', profile_filter('coordinator', 'coordinator'))
+    list_select_related = ('district', 'coordinator__user')
     search_fields = ('title', 'description', 'district__name')
+    autocomplete_fields = ('district', 'coordinator')
     date_hierarchy = 'start_date'
     ordering = ('-created_at',)
+    actions = ('archive_selected',)
+
+    @admin.action(description='Archive selected completed or cancelled initiatives')
+    def archive_selected(self, request, queryset):
+        ids = list(queryset.filter(status__in=archive.ARCHIVABLE_STATUSES).values_list('pk', flat=True))
+        rows = archive.archive_initiatives(ids)
+        self.message_user(request, f'Archived {len(ids)} initiatives ({rows} rows).')
+
+class InitiativeArchiveAdmin(ScalableAdmin):
+    list_display = ('title', 'district', 'initiative_type', 'status', 'start_date', 'end_date', 'archived_at')
+    list_filter = ('status', 'initiative_type', 'district')
+    list_select_related = ('district',)
+    search_fields = ('title', 'description')
+    date_hierarchy = 'archived_at'
+    actions = ('restore_selected',)
+
+    @admin.action(description='Restore selected initiatives to the live tables')
+    def restore_selected(self, request, queryset):
+        ids = list(archive.restorable(queryset).values_list('pk', flat=True))
+        rows = archive.restore_initiatives(ids)
+        self.message_user(request, f'Restored {len(ids)} initiatives ({rows} rows).')
+        skipped = queryset.count() - len(ids)
+        if skipped:
+            self.message_user(
+                request, f'{skipped} initiatives were left archived because their district or coordinator was deleted.',
+                messages.WARNING,
+            )
 
-class TaskAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+class TaskActionForm(ActionForm):
+    value = forms.CharField(
+        required=False, label='Value',
+        help_text='Priority (low, medium, high, urgent), username, number of days or initiative id',
+    )
+
+class TaskAdmin(ScalableAdmin):
+    action_form = TaskActionForm
+    actions = ('mark_completed', 'set_priority', 'reassign', 'shift_due_date', 'move_to_initiative')
     list_display = ('title', 'initiative', 'assigned_to', 'priority', 'status', 'due_date', 'progress_percentage', 'is_overdue')
-    list_filter = ('status', 'priority', 'initiative__district', 'assigned_to')
+    list_filter = ('status', 'priority', 'initiative__district', profile_filter('assigned_to', 'assigned to'))
+    list_select_related = ('initiative__district', 'assigned_to__user')
     search_fields = ('title', 'description', 'initiative__title')
+    autocomplete_fields = ('initiative', 'assigned_to', 'created_by')
     date_hierarchy = 'due_date'
     ordering = ('-due_date', '-priority')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(overdue=ExpressionWrapper(
+            Q(due_date__lt=timezone.now()) & ~Q(status='completed'), output_field=BooleanField(),
+        ))
     
     def is_overdue(self, obj):
-        return obj.is_overdue()
+        return obj.overdue
     is_overdue.boolean = True
     is_overdue.short_description = 'Overdue'
+    is_overdue.admin_order_field = 'overdue'
+
+    def _bulk(self, request, queryset, action, value=None):
+        try:
+            changed = bulk.apply(queryset, action, value)
+        except bulk.BulkActionError as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+        except WriteQueueTimeout:
+            self.message_user(request, 'The server is busy saving other changes. Please try again.', messages.ERROR)
+        else:
+            self.message_user(request, f'Updated {changed} tasks.')
+
+    @admin.action(description='Mark selected tasks completed')
+    def mark_completed(self, request, queryset):
+        self._bulk(request, queryset, 'complete')
+
+    @admin.action(description='Set priority of selected tasks to the value')
+    def set_priority(self, request, queryset):
+        self._bulk(request, queryset, 'priority', request.POST.get('value', '').strip().lower())
+
+    @admin.action(description='Reassign selected tasks to the username in the value')
+    def reassign(self, request, queryset):
+        username = request.POST.get('value', '').strip()
+        profile = UserProfile.objects.filter(user__username=username).values_list('pk', flat=True).first()
+        self._bulk(request, queryset, 'reassign', profile)
 
-class NoteAdmin(admin.ModelAdmin):
+    @admin.action(description='Shift due dates of selected tasks by the value in days')
+    def shift_due_date(self, request, queryset):
+        self._bulk(request, queryset, 'shift_due', request.POST.get('value'))
+
+    @admin.action(description='Move selected tasks to the initiative id in the value')
+    def move_to_initiative(self, request, queryset):
+        self._bulk(request, queryset, 'move', request.POST.get('value'))
+
+class NoteAdmin(ScalableAdmin):
     list_display = ('title', 'initiative', 'author', 'note_type', 'created_at')
-    list_filter = ('note_type', 'initiative__district', 'author', 'is_public')
+    list_filter = ('note_type', 'initiative__district', profile_filter('author', 'author'), 'is_public')
+    list_select_related = ('initiative__district', 'author__user')
     search_fields = ('title', 'content', 'initiative__title')
+    autocomplete_fields = ('initiative', 'task', 'author')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
 
-class DocumentAdmin(admin.ModelAdmin):
+class DocumentAdmin(ScalableAdmin):
     list_display = ('title', 'initiative', 'uploaded_by', 'file_size', 'created_at')
-    list_filter = ('initiative__district', 'uploaded_by')
+    list_filter = ('initiative__district', profile_filter('uploaded_by', 'uploaded by'))
+    list_select_related = ('initiative__district', 'uploaded_by__user')
     search_fields = ('title', 'description', 'initiative__title')
+    autocomplete_fields = ('initiative', 'task', 'uploaded_by')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
     
@@ -66,13 +238,54 @@ class DocumentAdmin(admin.ModelAdmin):
         return "N/A"
     file_size.short_description = 'File Size'
 
+class InitiativeSheetAdmin(ScalableAdmin):
+    list_display = ('initiative', 'coordinator', 'sheet_url', 'updated_at')
+    list_filter = ('initiative__district', profile_filter('coordinator', 'coordinator'))
+    list_select_related = ('initiative__district', 'coordinator__user')
+    search_fields = ('initiative__title', 'sheet_url')
+    autocomplete_fields = ('initiative', 'coordinator')
+    ordering = ('-updated_at',)
+
+class EventAdmin(ScalableAdmin):
+    list_display = ('title', 'initiative', 'organizer', 'start_datetime', 'end_datetime', 'location')
+    list_filter = ('initiative__district', profile_filter('organizer', 'organizer'))
+    list_select_related = ('initiative__district', 'organizer__user')
+    search_fields = ('title', 'description', 'initiative__title', 'location')
+    autocomplete_fields = ('initiative', 'organizer')
+    date_hierarchy = 'start_datetime'
+    ordering = ('-start_datetime',)
+
+class KpiSnapshotAdmin(ScalableAdmin):
+    list_display = ('date', 'district', 'tasks_total', 'completed', 'overdue', 'completed_today', 'avg_progress', 'reconstructed')
+    list_filter = ('district', 'reconstructed')
+    list_select_related = ('district',)
+    date_hierarchy = 'date'
+
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('target_label', 'target_type', 'status', 'progress', 'requested_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'target_type')
+    list_select_related = ('requested_by__user',)
+    readonly_fields = ('target_type', 'target_id', 'target_label', 'requested_by', 'status', 'total', 'deleted',
+                       'error', 'created_at', 'started_at', 'finished_at')
+
+    def progress(self, obj):
+        deleted, total = job_progress(obj)
+        return f"{deleted} / {total}"
+    progress.short_description = 'Rows removed'
+
 # Unregister the default User admin and register our custom one
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
 
 # Register our models
+admin.site.register(UserProfile, UserProfileAdmin)
 admin.site.register(District, DistrictAdmin)
 admin.site.register(Initiative, InitiativeAdmin)
 admin.site.register(Task, TaskAdmin)
 admin.site.register(Note, NoteAdmin)
 admin.site.register(Document, DocumentAdmin)
+admin.site.register(InitiativeSheet, InitiativeSheetAdmin)
+admin.site.register(Event, EventAdmin)
+admin.site.register(KpiSnapshot, KpiSnapshotAdmin)
+admin.site.register(DeletionJob, DeletionJobAdmin)
+admin.site.register(InitiativeArchive, InitiativeArchiveAdmin)
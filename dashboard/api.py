@@ -0,0 +1,178 @@
+"""Async versions of the polling JSON endpoints, for ASGI deployments.
+
+They return the same payloads as the views of the same name in views.py, and
+urls.py serves them instead when ``settings.ASYNC_API`` is on. Each endpoint
+folds its counts into one conditional aggregate per table and awaits the
+per-table aggregates together with ``asyncio.gather``. The event loop keeps
+serving other pollers while the queries run.
+"""
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db.models import Avg, Count, Q
+from django.http import JsonResponse
+from django.utils import timezone
+
+from . import kpis
+from .models import Initiative, Note, Task
+from .routers import replica_reads
+
+OPEN_STATUSES = ['not_started', 'in_progress']
+
+
+async def _profile(request):
+    user = await request.auser()
+    # Pre-cached by CachedAuthenticationMiddleware; only a profile-less user hits the DB
+    return await sync_to_async(lambda: user.profile)()
+
+
+def _scoped(user_profile):
+    """Return the initiatives, tasks and notes visible to ``user_profile``."""
+    if user_profile.role == 'admin':
+        return Initiative.objects.all(), Task.objects.all(), Note.objects.all()
+    district_id = user_profile.district_id
+    return (
+        Initiative.objects.filter(district_id=district_id),
+        Task.objects.filter(initiative__district_id=district_id),
+        Note.objects.filter(initiative__district_id=district_id),
+    )
+
+
+@login_required
+@replica_reads
+async def get_dashboard_stats(request):
+    """Get dashboard statistics via AJAX"""
+    initiatives, tasks, _ = _scoped(await _profile(request))
+    initiative_stats, task_stats = await asyncio.gather(
+        initiatives.aaggregate(
+            total_initiatives=Count('pk'),
+            active_initiatives=Count('pk', filter=Q(status='active')),
+        ),
+        tasks.aaggregate(
+            total_tasks=Count('pk'),
+            completed_tasks=Count('pk', filter=Q(status='completed')),
+            overdue_tasks=Count('pk', filter=Q(due_date__lt=timezone.now(), status__in=OPEN_STATUSES)),
+        ),
+    )
+    return JsonResponse({**initiative_stats, **task_stats})
+
+
+@login_required
+@replica_reads
+async def get_chart_data(request):
+    """Get chart data for dashboard"""
+    profile = await _profile(request)
+    initiatives, tasks, _ = _scoped(profile)
+
+    # Monthly data for the last 6 months, from the nightly KPI snapshots for
+    # the months they cover
+    months = kpis.chart_months()
+    initiative_data, task_data = await sync_to_async(kpis.monthly_created)(kpis.scoped_snapshots(profile), months)
+    uncovered = kpis.uncovered_counts(months, initiative_data)
+    if uncovered:
+        initiative_counts, task_counts = await asyncio.gather(
+            initiatives.aaggregate(**uncovered), tasks.aaggregate(**uncovered),
+        )
+        initiative_data = kpis.fill_uncovered(initiative_data, initiative_counts)
+        task_data = kpis.fill_uncovered(task_data, task_counts)
+
+    chart_data = {
+        'labels': [label for label, _, _ in months],
+        'datasets': [
+            {
+                'label': 'Initiatives',
+                'data': initiative_data,
+                'backgroundColor': 'rgba(54, 162, 235, 0.5)',
+                'borderColor': 'rgba(54, 162, 235, 1)',
+                'borderWidth': 2
+            },
+            {
+                'label': 'Tasks',
+                'data': task_data,
+                'backgroundColor': 'rgba(255, 99, 132, 0.5)',
+                'borderColor': 'rgba(255, 99, 132, 1)',
+                'borderWidth': 2
+            }
+        ]
+    }
+    return JsonResponse(chart_data)
+
+
+@login_required
+@replica_reads
+async def get_notifications(request):
+    """Get notifications for user"""
+    _, tasks, _ = _scoped(await _profile(request))
+    overdue_tasks = tasks.filter(
+        due_date__lt=timezone.now(), status__in=OPEN_STATUSES,
+    ).order_by('-due_date').only('pk', 'title', 'due_date')[:5]
+
+    notifications = [
+        {
+            'type': 'warning',
+            'message': f'Task "{task.title}" is overdue',
+            'url': f'/tasks/{task.pk}/',
+            'time': task.due_date.strftime('%Y-%m-%d')
+        }
+        async for task in overdue_tasks
+    ]
+    return JsonResponse({'notifications': notifications})
+
+
+@login_required
+@replica_reads
+async def ai_summary(request):
+    """Return AI-like daily/weekly summaries based on recent data (stub)."""
+    _, tasks, notes = _scoped(await _profile(request))
+    week_ago = timezone.now() - timedelta(days=7)
+    task_stats, note_stats = await asyncio.gather(
+        tasks.aaggregate(
+            completed_week=Count('pk', filter=Q(completed_at__gte=week_ago)),
+            created_week=Count('pk', filter=Q(created_at__gte=week_ago)),
+            updated_today=Count('pk', filter=Q(updated_at__date=timezone.now().date())),
+        ),
+        notes.aaggregate(notes_week=Count('pk', filter=Q(created_at__gte=week_ago))),
+    )
+
+    summary = {
+        'daily': f"{task_stats['updated_today']} tasks updated today.",
+        'weekly': (
+            f"{task_stats['completed_week']} tasks completed and {task_stats['created_week']} new tasks "
+            f"created in the last 7 days. {note_stats['notes_week']} notes added."
+        ),
+        'recommendations': [
+            'Prioritize overdue high-urgency tasks in the next 48 hours.',
+            'Schedule a review meeting for initiatives with < 30% progress.',
+            'Encourage coordinators to add weekly notes for better visibility.'
+        ]
+    }
+    return JsonResponse(summary)
+
+
+@login_required
+@replica_reads
+async def ai_suggestions(request):
+    """Provide simple, rule-based next-step suggestions (stub)."""
+    initiatives, tasks, _ = _scoped(await _profile(request))
+    overdue_query = tasks.filter(due_date__lt=timezone.now(), status__in=OPEN_STATUSES).values('title')[:5]
+    # Initiatives without tasks average to NULL and drop out, as before. Meta.ordering
+    # is not applied to GROUP BY queries, so it is spelled out.
+    low_progress_query = initiatives.annotate(
+        avg_progress=Avg('tasks__progress_percentage'),
+    ).filter(avg_progress__lt=30).order_by('-created_at').values_list('title', flat=True)[:5]
+
+    async def collect(queryset):
+        return [row async for row in queryset]
+
+    overdue, low_progress_inits = await asyncio.gather(collect(overdue_query), collect(low_progress_query))
+    return JsonResponse({
+        'overdue_tasks': overdue,
+        'low_progress_initiatives': low_progress_inits,
+        'ideas': [
+            'Host a cross-district knowledge sharing session.',
+            'Leverage alumni mentors for YGC cohorts.',
+            'Pilot a mini-hackathon under Makerspace.'
+        ]
+    })
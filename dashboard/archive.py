@@ -0,0 +1,174 @@
+"""Hot/cold archival of finished initiatives.
+
+Completed and cancelled initiatives untouched for a while are moved, with
+their tasks, notes, documents, sheet links and events, into the parallel
+``*Archive`` tables, so every scoped query on the live tables scans only
+current work. Lists, detail pages and the API read the live tables only.
+Reports and exports read both (see ``dashboard.reports``).
+
+Rows keep their ids, so ``restore`` puts them back where they were, stamped
+as changed so sync clients fetch them again. An initiative whose district or
+coordinator was deleted while it was archived stays archived, and restored
+rows of a deleted person go to the initiative's coordinator. Archived
+documents keep their blob reference, so their files stay on disk. Their
+extracted text is dropped and extracted again after a restore. A note or
+document linked to a task on the other side of the move keeps its
+initiative and loses the task link. Moves run a
+batch of initiatives per transaction and bypass the model signals, so moving
+rows adds nothing to the activity stream.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import DateTimeField, Exists, OuterRef, Q, Subquery, Value
+from django.utils import timezone
+
+from . import sync
+from .db import insert_select, serialized_write
+from .models import (
+    District, Document, DocumentArchive, DocumentText, Event, EventArchive, Initiative, InitiativeArchive,
+    InitiativeSheet, InitiativeSheetArchive, Note, NoteArchive, Task, TaskArchive, UploadSession, UserProfile,
+)
+from .uploads import discard_parts
+
+ARCHIVABLE_STATUSES = ['completed', 'cancelled']
+BATCH_SIZE = 100
+
+# (live model, archive model), parents first
+ARCHIVED_MODELS = [
+    (Initiative, InitiativeArchive),
+    (Task, TaskArchive),
+    (Event, EventArchive),
+    (InitiativeSheet, InitiativeSheetArchive),
+    (Document, DocumentArchive),
+    (Note, NoteArchive),
+]
+# People on archived rows below the initiative: (archive model, field)
+ARCHIVED_PEOPLE = [
+    (TaskArchive, 'assigned_to'),
+    (TaskArchive, 'created_by'),
+    (EventArchive, 'organizer'),
+    (InitiativeSheetArchive, 'coordinator'),
+    (DocumentArchive, 'uploaded_by'),
+    (NoteArchive, 'author'),
+]
+
+
+def _rows_of(model, initiative_ids):
+    """Rows of ``model`` filed under the given initiatives"""
+    if model in (Initiative, InitiativeArchive):
+        return model.objects.filter(pk__in=initiative_ids)
+    return model.objects.filter(initiative_id__in=initiative_ids)
+
+
+def _unlink_tasks(initiative_ids):
+    """Drop the task of notes and documents linked across the archive line:
+    filed under a live initiative with an archived task, or the other way
+    round. They stay with the initiative they are filed under."""
+    now = timezone.now()
+    for model in (Note, Document):
+        crossing = model.objects.filter(
+            Q(task__initiative_id__in=initiative_ids) & ~Q(initiative_id__in=initiative_ids)
+            | Q(initiative_id__in=initiative_ids, task__isnull=False) & ~Q(task__initiative_id__in=initiative_ids)
+        )
+        crossing.update(task=None, **({'updated_at': now} if model is Note else {}))
+
+
+def _exists(model, field):
+    return Exists(model.objects.filter(pk=OuterRef(field)))
+
+
+def restorable(initiatives):
+    """Archived ``initiatives`` whose district and coordinator still exist"""
+    return initiatives.filter(_exists(District, 'district_id'), _exists(UserProfile, 'coordinator_id'))
+
+
+def _adopt_orphans(initiative_ids):
+    """Hand archived rows of deleted people to their initiative's coordinator"""
+    coordinator = Subquery(InitiativeArchive.objects.filter(pk=OuterRef('initiative_id')).values('coordinator_id'))
+    for model, field in ARCHIVED_PEOPLE:
+        model.objects.filter(~_exists(UserProfile, f'{field}_id'), initiative_id__in=initiative_ids).update(
+            **{f'{field}_id': coordinator},
+        )
+
+
+def archivable(days):
+    """Finished initiatives with no change to them or their tasks in ``days`` days"""
+    cutoff = timezone.now() - timedelta(days=days)
+    return Initiative.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=cutoff).exclude(
+        tasks__updated_at__gte=cutoff,
+    )
+
+
+def _copy(rows, target, archived_at=None):
+    """``INSERT ... SELECT`` the rows into ``target`` with every value as stored.
+
+    ``bulk_create`` would stamp ``created_at``/``updated_at`` afresh, and the
+    rows never need to pass through Python.
+    """
+    fields = [f.attname for f in rows.model._meta.concrete_fields if f.attname != 'archived_at']
+    values = list(fields)
+    if archived_at is not None:
+        rows = rows.annotate(archived_value=Value(archived_at, output_field=DateTimeField()))
+        fields.append('archived_at')
+        values.append('archived_value')
+    insert_select(target, fields, rows.values_list(*values))
+
+
+def _move(pairs, initiative_ids, archived_at=None):
+    """Copy the rows of ``initiative_ids`` from the first to the second model of
+    each pair, then delete them from the first, children first"""
+    moved = 0
+    for source, target in pairs:
+        _copy(_rows_of(source, initiative_ids), target, archived_at)
+    for source, _ in reversed(pairs):
+        rows = _rows_of(source, initiative_ids)
+        moved += rows._raw_delete(rows.db)
+    return moved
+
+
+def archive_initiatives(initiative_ids):
+    """Move initiatives and their rows into the archive; returns the rows moved"""
+    with serialized_write():
+        _unlink_tasks(initiative_ids)
+        documents = _rows_of(Document, initiative_ids)
+        DocumentText.objects.filter(document__in=documents).delete()
+        sessions = UploadSession.objects.filter(
+            Q(initiative_id__in=initiative_ids) | Q(task__initiative_id__in=initiative_ids),
+        )
+        stale = list(sessions.values_list('pk', flat=True))
+        UploadSession.objects.filter(pk__in=stale).delete()
+        UploadSession.objects.filter(document__in=documents).update(document=None)
+        for model in sync.OBJECT_TYPES:
+            sync.bury(_rows_of(model, initiative_ids))
+        moved = _move(ARCHIVED_MODELS, initiative_ids, archived_at=timezone.now())
+        transaction.on_commit(lambda: discard_parts(stale))
+    return moved
+
+
+def restore_initiatives(initiative_ids):
+    """Move archived initiatives back into the live tables; returns the rows moved.
+
+    Only ``restorable`` initiatives are moved.
+    """
+    pairs = [(archive, live) for live, archive in ARCHIVED_MODELS]
+    with serialized_write():
+        initiative_ids = list(
+            restorable(InitiativeArchive.objects.filter(pk__in=initiative_ids)).values_list('pk', flat=True)
+        )
+        _adopt_orphans(initiative_ids)
+        moved = _move(pairs, initiative_ids)
+        sync.revive_initiatives(initiative_ids)
+        # Text is re-extracted by extract_document_text
+        Document.objects.filter(initiative_id__in=initiative_ids).update(text_sha256='')
+        Initiative.objects.filter(pk__in=initiative_ids).refresh_counters()
+    return moved
+
+
+def archive_older_than(days, batch_size=BATCH_SIZE):
+    """Archive everything ``archivable(days)`` in batches; returns ``(initiatives, rows)``"""
+    initiatives = rows = 0
+    while batch := list(archivable(days).order_by('pk').values_list('pk', flat=True)[:batch_size]):
+        rows += archive_initiatives(batch)
+        initiatives += len(batch)
+    return initiatives, rows
@@ -0,0 +1,100 @@
+"""Per-session copy of the logged-in user, profile and district.
+
+The first request after login (or after any change to the user, their profile
+or their district) loads the three rows and stores their field values in the
+session next to a version token kept in the cache. Later requests rebuild the
+instances from the session, so with a cache-backed session engine the auth
+path runs no queries at all. Saving any of the rows deletes the user's version
+token, and the next request reloads them.
+
+Tokens expire after ``settings.AUTH_SNAPSHOT_TTL`` seconds. With a shared
+cache that only bounds how long a snapshot lives; with a per-process cache,
+where a deletion in one worker never reaches the others, it bounds how long
+another worker can serve a changed user from a stale snapshot.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import District, UserProfile
+
+SESSION_KEY = '_dashboard_user'
+
+# Never copy credentials into the session; the password stays deferred
+USER_FIELDS = [f for f in User._meta.concrete_fields if f.name != 'password']
+PROFILE_FIELDS = UserProfile._meta.concrete_fields
+DISTRICT_FIELDS = District._meta.concrete_fields
+
+
+def _version_key(user_id):
+    return f'dashboard:auth-version:{user_id}'
+
+
+def current_version(user_id):
+    """Return the user's version token, issuing a new one if the cache lost it."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, getattr(settings, 'AUTH_SNAPSHOT_TTL', 60))
+        version = cache.get(key)
+    return version
+
+
+def invalidate(*user_ids):
+    """Force the next request of each user to reload from the database."""
+    cache.delete_many([_version_key(user_id) for user_id in user_ids])
+
+
+def _dump(instance, fields):
+    return [field.value_to_string(instance) if getattr(instance, field.attname) is not None else None
+            for field in fields]
+
+
+def _load(model, fields, values):
+    values = [None if value is None else field.to_python(value) for field, value in zip(fields, values)]
+    return model.from_db(DEFAULT_DB_ALIAS, [field.attname for field in fields], values)
+
+
+def snapshot(user, version):
+    """Serialize ``user`` with its profile and district for the session."""
+    data = {'v': version, 'user': _dump(user, USER_FIELDS), 'profile': None, 'district': None}
+    try:
+        profile = user.profile
+    except UserProfile.DoesNotExist:
+        return data
+    data['profile'] = _dump(profile, PROFILE_FIELDS)
+    if profile.district_id:
+        data['district'] = _dump(profile.district, DISTRICT_FIELDS)
+    return data
+
+
+def restore(data):
+    """Rebuild the user from a snapshot with ``profile.district`` pre-cached."""
+    user = _load(User, USER_FIELDS, data['user'])
+    if data['profile'] is not None:
+        profile = _load(UserProfile, PROFILE_FIELDS, data['profile'])
+        UserProfile.user.field.set_cached_value(profile, user)
+        User.profile.related.set_cached_value(user, profile)
+        district = _load(District, DISTRICT_FIELDS, data['district']) if data['district'] else None
+        UserProfile.district.field.set_cached_value(profile, district)
+    return user
+
+
+def get_user(request):
+    """Drop-in for ``django.contrib.auth.get_user`` backed by the session snapshot."""
+    user_id = request.session.get(auth.SESSION_KEY)
+    if user_id is None:
+        return auth.get_user(request)
+    version = current_version(user_id)
+    data = request.session.get(SESSION_KEY)
+    if data and data['v'] == version and str(data['user'][0]) == str(user_id):
+        return restore(data)
+    # Full check, including the session hash, before trusting the snapshot
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        request.session[SESSION_KEY] = snapshot(user, version)
+    return user
@@ -0,0 +1,134 @@
+"""Bulk actions on many tasks at once.
+
+Each action is one ``UPDATE ... WHERE`` over the selected tasks instead of a
+``save()`` per row, so its cost hardly grows with the selection. The per-row
+signal work is done in bulk instead: ``updated_at`` is stamped in the same
+statement (the list fragments key on it), the counters of the initiatives
+involved are recomputed once, and the activity entries are written with one
+``INSERT ... SELECT`` from the tasks, as are the sync tombstones of tasks
+moved to another district.
+"""
+from datetime import timedelta
+
+from django.db.models import CharField, DateTimeField, F, IntegerField, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
+
+from . import sync
+from .db import insert_select, serialized_write
+from .models import Activity, Initiative, Task, UserProfile
+
+ACTIONS = [
+    ('complete', 'Mark completed'),
+    ('priority', 'Change priority'),
+    ('reassign', 'Reassign to'),
+    ('shift_due', 'Shift due date (days)'),
+    ('move', 'Move to initiative'),
+]
+# Furthest due dates can be shifted in one go, either way
+MAX_SHIFT_DAYS = 3650
+
+
+class BulkActionError(ValueError):
+    """The action or its value is not valid for the acting user"""
+
+
+def scoped_tasks(profile):
+    """Tasks ``profile`` may change in bulk; the same as editing them one by one"""
+    if profile.role == 'admin':
+        return Task.objects.all()
+    return Task.objects.filter(initiative__district=profile.district, assigned_to=profile)
+
+
+def assignable_profiles(profile):
+    """Coordinators tasks can be reassigned to, as in ``TaskForm``"""
+    coordinators = UserProfile.objects.filter(role='coordinator')
+    if profile is None or profile.role == 'admin':
+        return coordinators
+    return coordinators.filter(district=profile.district)
+
+
+def target_initiatives(profile):
+    if profile is None or profile.role == 'admin':
+        return Initiative.objects.all()
+    return Initiative.objects.filter(district=profile.district)
+
+
+def _changes(action, value, profile):
+    """Return ``(fields to update, activity note)`` for one action"""
+    if action == 'complete':
+        return {'status': 'completed', 'completed_at': timezone.now(), 'progress_percentage': 100}, 'marked completed'
+    if action == 'priority':
+        priorities = dict(Task.PRIORITY_CHOICES)
+        if value not in priorities:
+            raise BulkActionError('Choose a priority.')
+        return {'priority': value}, f'priority {priorities[value]}'
+    if action == 'reassign':
+        assignee = assignable_profiles(profile).select_related('user').filter(pk=_int(value)).first()
+        if assignee is None:
+            raise BulkActionError('Choose a coordinator to reassign the tasks to.')
+        return {'assigned_to': assignee}, f'reassigned to {assignee.user.get_full_name() or assignee.user.username}'
+    if action == 'shift_due':
+        days = _int(value)
+        if not days or abs(days) > MAX_SHIFT_DAYS:
+            raise BulkActionError(f'Enter a number of days to shift the due dates by, up to {MAX_SHIFT_DAYS} either way.')
+        return {'due_date': F('due_date') + timedelta(days=days)}, f'due date {days:+d} days'
+    if action == 'move':
+        initiative = target_initiatives(profile).filter(pk=_int(value)).first()
+        if initiative is None:
+            raise BulkActionError('Choose an initiative to move the tasks to.')
+        return {'initiative': initiative}, f'moved to {initiative.title}'
+    raise BulkActionError('Choose an action.')
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _record_activity(tasks, note, profile, district_id=None):
+    """``INSERT ... SELECT`` one "updated" entry per task in ``tasks``;
+    ``district_id`` overrides the district of the tasks' initiative"""
+    actor_name = (profile.user.get_full_name() or profile.user.username) if profile else ''
+    values = {
+        'district_id': Value(district_id) if district_id else F('initiative__district_id'),
+        'actor_id': Value(profile.pk if profile else None, output_field=IntegerField()),
+        'actor_name': Value(actor_name),
+        'verb': Value('updated'),
+        'object_type': Value('task'),
+        'object_id': F('pk'),
+        'summary': Substr(Concat(Value('Task updated: '), 'title', Value(f' ({note})'), output_field=CharField()), 1, 255),
+        'created_at': Value(timezone.now(), output_field=DateTimeField()),
+    }
+    entries = tasks.order_by().annotate(**{f'entry_{name}': value for name, value in values.items()})
+    insert_select(Activity, list(values), entries.values_list(*(f'entry_{name}' for name in values)))
+
+
+def apply(tasks, action, value=None, profile=None):
+    """Apply ``action`` to every task in ``tasks``; returns the number changed.
+
+    ``profile`` is the acting user. It limits who tasks can be reassigned to
+    and which initiatives they can move to (``None``: no limit, for the admin
+    site), and is recorded as the actor of the activity entries.
+    """
+    changes, note = _changes(action, value, profile)
+    tasks = tasks.order_by()
+    if action == 'complete':
+        tasks = tasks.exclude(status='completed')
+    with serialized_write():
+        touched = set(tasks.values_list('initiative_id', flat=True).distinct())
+        if not touched:
+            return 0
+        moved_to = changes.get('initiative')
+        # Written first: the update can take tasks out of ``tasks``
+        _record_activity(tasks, note, profile, district_id=moved_to and moved_to.district_id)
+        if moved_to:
+            sync.bury(tasks.exclude(initiative__district_id=moved_to.district_id), moved=True)
+        changed = tasks.update(updated_at=timezone.now(), **changes)
+        if moved_to:
+            touched.add(moved_to.pk)
+        if action in ('complete', 'move'):
+            Initiative.objects.filter(pk__in=touched).refresh_counters()
+    return changed
@@ -0,0 +1,160 @@
+"""iCalendar (ICS) subscription feeds for districts and coordinators.
+
+Feeds are addressed by a signed token so calendar clients can poll them
+without a session. Each response carries an ETag / Last-Modified pair derived
+from a per-scope change stamp, so unchanged feeds are answered with a 304, and
+only events and task due dates inside a bounded window are rendered.
+"""
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import Event, Task
+
+FEED_TOKEN_SALT = 'dashboard.calendar_feed'
+FEED_SCOPES = ('district', 'user')
+
+
+def make_feed_token(user, scope, pk):
+    """Return the signed token for a feed issued to ``user``."""
+    return signing.dumps({'u': user.pk, 's': scope, 'id': pk}, salt=FEED_TOKEN_SALT)
+
+
+def read_feed_token(token):
+    """Decode a feed token into ``(user_id, scope, pk)``.
+
+    Raises ``signing.BadSignature`` for tampered or malformed tokens.
+    """
+    data = signing.loads(token, salt=FEED_TOKEN_SALT)
+    if not isinstance(data, dict) or data.get('s') not in FEED_SCOPES:
+        raise signing.BadSignature('Unknown feed scope')
+    return data['u'], data['s'], data['id']
+
+
+def feed_window(now=None):
+    """Return the ``(start, end)`` datetimes rendered into every feed.
+
+    The start is truncated to midnight so the window (and the ETag) only moves
+    once a day.
+    """
+    now = now or timezone.now()
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    start -= timedelta(days=getattr(settings, 'CALENDAR_FEED_PAST_DAYS', 30))
+    end = start + timedelta(
+        days=getattr(settings, 'CALENDAR_FEED_PAST_DAYS', 30) + getattr(settings, 'CALENDAR_FEED_FUTURE_DAYS', 180)
+    )
+    return start, end
+
+
+def feed_querysets(scope, pk, start, end):
+    """Return the events and tasks belonging to a feed scope inside the window."""
+    events = Event.objects.filter(end_datetime__gte=start, start_datetime__lte=end)
+    tasks = Task.objects.filter(due_date__gte=start, due_date__lte=end)
+    if scope == 'district':
+        events = events.filter(initiative__district_id=pk)
+        tasks = tasks.filter(initiative__district_id=pk)
+    else:
+        events = events.filter(Q(organizer_id=pk) | Q(initiative__coordinator_id=pk))
+        tasks = tasks.filter(assigned_to_id=pk)
+    return events, tasks
+
+
+def change_stamp(scope, pk, events, tasks, window_start):
+    """Return ``(etag, last_modified)`` for a feed.
+
+    Row counts are folded into the ETag so deletions invalidate it as well.
+    """
+    event_stats = events.aggregate(n=Count('id'), last=Max('updated_at'))
+    task_stats = tasks.aggregate(n=Count('id'), last=Max('updated_at'))
+    stamps = [s for s in (event_stats['last'], task_stats['last']) if s]
+    last_modified = max(stamps) if stamps else None
+    raw = '|'.join(str(part) for part in (
+        scope, pk, window_start.date(),
+        event_stats['n'], event_stats['last'], task_stats['n'], task_stats['last'],
+    ))
+    return hashlib.sha1(raw.encode()).hexdigest(), last_modified
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Fold a content line at 75 octets as required by RFC 5545."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Never split a multi-byte UTF-8 sequence
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def iter_calendar(name, events, tasks, host):
+    """Yield the feed line by line so responses can be streamed."""
+    yield _fold('BEGIN:VCALENDAR')
+    yield _fold('VERSION:2.0')
+    yield _fold('PRODID:-//Yarl IT Hub//Coordinator Management//EN')
+    yield _fold('CALSCALE:GREGORIAN')
+    yield _fold(f'X-WR-CALNAME:{_escape(name)}')
+
+    events = events.select_related('initiative').only(
+        'title', 'description', 'start_datetime', 'end_datetime', 'location',
+        'meet_link', 'updated_at', 'initiative__title',
+    ).order_by('start_datetime')
+    for event in events.iterator(chunk_size=500):
+        description = event.description
+        if event.meet_link:
+            description = f'{description}\n{event.meet_link}'.strip()
+        yield _fold('BEGIN:VEVENT')
+        yield _fold(f'UID:event-{event.pk}@{host}')
+        yield _fold(f'DTSTAMP:{_utc(event.updated_at)}')
+        yield _fold(f'DTSTART:{_utc(event.start_datetime)}')
+        yield _fold(f'DTEND:{_utc(event.end_datetime)}')
+        yield _fold(f'SUMMARY:{_escape(event.title)}')
+        if description:
+            yield _fold(f'DESCRIPTION:{_escape(description)}')
+        if event.location:
+            yield _fold(f'LOCATION:{_escape(event.location)}')
+        if event.meet_link:
+            yield _fold(f'URL:{event.meet_link}')
+        yield _fold(f'CATEGORIES:{_escape(event.initiative.title)}')
+        yield _fold('END:VEVENT')
+
+    tasks = tasks.select_related('initiative').only(
+        'title', 'status', 'priority', 'due_date', 'updated_at', 'initiative__title',
+    ).order_by('due_date')
+    for task in tasks.iterator(chunk_size=500):
+        due = timezone.localtime(task.due_date).date()
+        yield _fold('BEGIN:VEVENT')
+        yield _fold(f'UID:task-{task.pk}@{host}')
+        yield _fold(f'DTSTAMP:{_utc(task.updated_at)}')
+        yield _fold(f'DTSTART;VALUE=DATE:{due:%Y%m%d}')
+        yield _fold(f'DTEND;VALUE=DATE:{due + timedelta(days=1):%Y%m%d}')
+        yield _fold(f'SUMMARY:{_escape("Due: " + task.title)}')
+        yield _fold(f'DESCRIPTION:{_escape(f"{task.initiative.title} - {task.get_status_display()}, {task.get_priority_display()} priority")}')
+        yield _fold('TRANSP:TRANSPARENT')
+        yield _fold('END:VEVENT')
+
+    yield _fold('END:VCALENDAR')
@@ -0,0 +1,109 @@
+"""Write serialization for the SQLite deployment.
+
+SQLite allows a single writer at a time. In WAL mode readers never wait for
+that writer, but concurrent writers still race for the lock and the loser
+eventually fails with "database is locked". Funnelling this process's writes
+through one lock turns that race into a short, bounded queue. Other backends
+handle concurrent writers themselves, so the lock is skipped for them.
+"""
+import sqlite3
+import threading
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+_write_lock = threading.RLock()
+
+
+class WriteQueueTimeout(Exception):
+    """Raised when a write could not get its turn within the allowed wait."""
+
+
+class serialized_write(ContextDecorator):
+    """Run a block as one transaction while holding the process write lock.
+
+    Usable as a decorator or a context manager. ``timeout`` defaults to
+    ``settings.SQLITE_WRITE_LOCK_TIMEOUT`` seconds.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, timeout=None):
+        self.using = using
+        self.timeout = timeout
+
+    def _recreate_cm(self):
+        # Each decorated call gets its own state so threads never share it
+        return type(self)(self.using, self.timeout)
+
+    def __enter__(self):
+        self.locked = connections[self.using].vendor == 'sqlite'
+        if self.locked:
+            timeout = self.timeout
+            if timeout is None:
+                timeout = getattr(settings, 'SQLITE_WRITE_LOCK_TIMEOUT', 5)
+            if not _write_lock.acquire(timeout=timeout):
+                raise WriteQueueTimeout(f'No write slot after {timeout}s')
+        self.atomic = transaction.atomic(using=self.using)
+        try:
+            self.atomic.__enter__()
+        except BaseException:
+            if self.locked:
+                _write_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            return self.atomic.__exit__(exc_type, exc_value, traceback)
+        finally:
+            if self.locked:
+                _write_lock.release()
+
+
+class SerializedWriteMixin:
+    """Save CreateView/UpdateView forms through the write queue.
+
+    When the queue is full the filled-in form is redisplayed with an error
+    message instead of surfacing "database is locked".
+    """
+
+    def form_valid(self, form):
+        try:
+            with serialized_write():
+                return super().form_valid(form)
+        except WriteQueueTimeout:
+            messages.error(self.request, 'The server is busy saving other changes. Please submit again.')
+            return self.form_invalid(form)
+
+
+def insert_select(model, fields, rows):
+    """``INSERT INTO model (fields) SELECT ...`` the values of ``rows``.
+
+    ``rows`` is a ``values_list`` queryset with one value per field, in order.
+    The rows never pass through Python, so the cost does not depend on how
+    many there are. Returns the number of rows inserted.
+    """
+    sql, params = rows.order_by().query.get_compiler(rows.db).as_sql()
+    connection = connections[rows.db]
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) {sql}', params)
+        return cursor.rowcount
+
+
+def snapshot_sqlite(source_path, target_path, pages=1024):
+    """Copy a live SQLite database into ``target_path`` with the backup API.
+
+    The copy is taken in steps of ``pages`` so writers on the source are only
+    paused briefly, and readers of the target keep their old snapshot (WAL)
+    until the new one is complete. Returns the number of pages copied.
+    """
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True, timeout=30)
+    target = sqlite3.connect(str(target_path), timeout=30)
+    try:
+        source.backup(target, pages=pages, sleep=0.005)
+        return target.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        target.close()
+        source.close()
@@ -0,0 +1,228 @@
+"""Bulk deletion of districts, initiatives and users.
+
+Django's cascade loads every related task, note, document, event and sheet
+into memory and sends their signals one row at a time, which can time a
+request out for a large district. ``delete_target`` instead removes the
+dependent rows bottom-up in batches of plain ``DELETE ... WHERE id IN``
+statements inside one transaction, and only hands the (by then childless)
+target itself to the ORM, so its own signals and light relations still run.
+Background jobs commit each batch instead, recording their progress on the
+``DeletionJob`` row as they go; a failed job can be run again for the rest.
+
+The per-row signal work is done in bulk instead: blob references are
+released per content hash (``gc_blobs`` deletes the files later), upload
+part files are discarded after commit, and the counters of initiatives that
+survive (when deleting a user) are recomputed. Removed children get no
+activity entries; the target's own "deleted" entry records the operation.
+
+Targets with more than ``settings.DELETE_INLINE_LIMIT`` dependent rows are
+queued as a ``DeletionJob`` for ``manage.py run_deletion_jobs``.
+"""
+import logging
+from collections import Counter
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.db.models.functions import Greatest
+from django.http import HttpResponseRedirect
+from django.utils import timezone
+
+from . import sync
+from .db import WriteQueueTimeout, serialized_write
+from .models import (
+    Blob, DeletionJob, District, Document, DocumentArchive, DocumentText, Event, EventArchive, Initiative,
+    InitiativeArchive, InitiativeSheet, InitiativeSheetArchive, Note, NoteArchive, Task, TaskArchive, Tombstone,
+    UploadSession, UserProfile,
+)
+from .uploads import discard_parts
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+TARGET_MODELS = {'district': District, 'initiative': Initiative, 'user': User}
+COUNTED = (Task, Note, Document)
+
+
+def target_type(target):
+    return next(name for name, model in TARGET_MODELS.items() if isinstance(target, model))
+
+
+def _scope(model, initiatives, profile, owners=(), tasks=None):
+    """Rows of ``model`` under ``initiatives`` or ``tasks``, or owned by ``profile``"""
+    q = Q(initiative__in=initiatives)
+    if tasks is not None:
+        q |= Q(task__in=tasks)
+    if profile is not None:
+        for owner in owners:
+            q |= Q(**{owner: profile})
+    return model.objects.filter(q)
+
+
+def _initiatives_of(target, model, profile):
+    if isinstance(target, District):
+        return model.objects.filter(district=target)
+    if isinstance(target, User):
+        return model.objects.filter(coordinator=profile) if profile else model.objects.none()
+    return model.objects.filter(pk=target.pk) if isinstance(target, model) else model.objects.none()
+
+
+def _tree(initiatives, profile, task, document, note, event, sheet):
+    """``[(model, queryset)]`` for one set of initiatives and their rows, children first"""
+    tasks = _scope(task, initiatives, profile, ('assigned_to', 'created_by'))
+    return [
+        (document, _scope(document, initiatives, profile, ('uploaded_by',), tasks)),
+        (note, _scope(note, initiatives, profile, ('author',), tasks)),
+        (event, _scope(event, initiatives, profile, ('organizer',))),
+        (sheet, _scope(sheet, initiatives, profile, ('coordinator',))),
+        (task, tasks),
+        (initiatives.model, initiatives),
+    ]
+
+
+def deletion_plan(target):
+    """Return ``[(model, queryset)]`` of the rows removed with ``target``, children first.
+
+    Archived rows of the target go too. Each queryset only refers to tables
+    deleted after it, so it still selects the right rows while the earlier
+    steps run.
+    """
+    profile = UserProfile.objects.filter(user=target).first() if isinstance(target, User) else None
+    initiatives = _initiatives_of(target, Initiative, profile)
+    live = _tree(initiatives, profile, Task, Document, Note, Event, InitiativeSheet)
+    archived = _tree(
+        _initiatives_of(target, InitiativeArchive, profile), profile,
+        TaskArchive, DocumentArchive, NoteArchive, EventArchive, InitiativeSheetArchive,
+    )
+    documents, tasks = live[0][1], live[4][1]
+    return [
+        (DocumentText, DocumentText.objects.filter(document__in=documents)),
+        (UploadSession, _scope(UploadSession, initiatives, profile, ('owner',), tasks)),
+        *live,
+        *archived,
+    ]
+
+
+def count_rows(target):
+    """Number of dependent rows ``delete_target`` would remove"""
+    return sum(queryset.count() for _, queryset in deletion_plan(target))
+
+
+def _release_blobs(documents):
+    held = Counter(sha256 for sha256 in documents.values_list('sha256', flat=True) if sha256)
+    for sha256, refs in held.items():
+        Blob.objects.filter(pk=sha256).update(ref_count=Greatest(F('ref_count') - refs, 0))
+
+
+def _delete_batch(model, batch, removed, touched_initiatives):
+    rows = model.objects.filter(pk__in=batch)
+    if model in COUNTED:
+        touched_initiatives.update(rows.order_by().values_list('initiative_id', flat=True).distinct())
+    if model is UploadSession:
+        transaction.on_commit(lambda: discard_parts(batch))
+    elif model is Document:
+        _release_blobs(rows)
+        # Sessions kept elsewhere only lose the link, as with SET_NULL
+        UploadSession.objects.filter(document__in=batch).update(document=None)
+    elif model is DocumentArchive:
+        _release_blobs(rows)
+    elif model in sync.OBJECT_TYPES:
+        sync.bury(rows)
+    removed[model.__name__] += rows._raw_delete(rows.db)
+
+
+def delete_target(target, progress=None, batch_size=BATCH_SIZE, atomic=True):
+    """Delete ``target`` and everything that depends on it.
+
+    ``progress`` is called with the running total of removed rows after each
+    batch, inside the batch's transaction. With ``atomic=False`` every batch
+    commits on its own, so the write lock is free in between and whatever
+    ``progress`` writes is seen straight away. Returns ``{model name: rows
+    removed}``, the target included.
+    """
+    timeout = getattr(settings, 'DELETE_WRITE_LOCK_TIMEOUT', 60)
+    removed = Counter()
+    touched_initiatives = set()
+    with serialized_write(timeout=timeout) if atomic else nullcontext():
+        last_tombstone = Tombstone.objects.aggregate(pk=Max('pk'))['pk'] or 0
+        for model, queryset in deletion_plan(target):
+            pending = queryset.order_by().values_list('pk', flat=True)
+            while True:
+                with serialized_write(timeout=timeout):
+                    batch = list(pending[:batch_size])
+                    if not batch:
+                        break
+                    _delete_batch(model, batch, removed, touched_initiatives)
+                    if progress:
+                        progress(sum(removed.values()))
+        with serialized_write(timeout=timeout):
+            # Initiatives losing rows to a user deletion keep correct counters
+            Initiative.objects.filter(pk__in=touched_initiatives).refresh_counters()
+            _, by_model = target.delete()
+            if atomic:
+                # Restamped at commit so sync clients that read during this
+                # long transaction still get them
+                Tombstone.objects.filter(pk__gt=last_tombstone).update(deleted_at=timezone.now())
+        for label, count in by_model.items():
+            removed[label.rsplit('.', 1)[-1]] += count
+    return dict(removed)
+
+
+def schedule(target, requested_by):
+    """Queue ``target`` for deletion, reusing a job already waiting for it"""
+    kind = target_type(target)
+    job = DeletionJob.objects.filter(target_type=kind, target_id=target.pk, status__in=['pending', 'running']).first()
+    if job is None:
+        job = DeletionJob.objects.create(
+            target_type=kind, target_id=target.pk, target_label=str(target)[:200],
+            requested_by=requested_by, total=count_rows(target),
+        )
+    return job
+
+
+def run_job(job):
+    """Claim and run a pending job; returns False when another worker took it"""
+    claimed = DeletionJob.objects.filter(pk=job.pk, status='pending').update(status='running', started_at=timezone.now())
+    if not claimed:
+        return False
+    target = TARGET_MODELS[job.target_type].objects.filter(pk=job.target_id).first()
+    jobs = DeletionJob.objects.filter(pk=job.pk)
+    try:
+        # Committed with each batch, so every process sees the progress
+        removed = delete_target(target, progress=lambda n: jobs.update(deleted=n), atomic=False) if target else {}
+    except Exception as exc:
+        logger.exception('Deletion job %s failed', job.pk)
+        jobs.update(status='failed', error=str(exc), finished_at=timezone.now())
+    else:
+        jobs.update(status='done', deleted=sum(removed.values()), finished_at=timezone.now())
+    return True
+
+
+def job_progress(job):
+    """Return ``(rows removed, rows to remove)`` for a job, updated while it runs"""
+    return job.deleted, job.total
+
+
+class BulkDeleteMixin:
+    """DeleteView that uses ``delete_target`` instead of the ORM cascade.
+
+    Targets above ``settings.DELETE_INLINE_LIMIT`` dependent rows are queued
+    for the background worker rather than deleted in the request.
+    """
+
+    def form_valid(self, form):
+        label = str(self.object)
+        if count_rows(self.object) > getattr(settings, 'DELETE_INLINE_LIMIT', 5000):
+            schedule(self.object, self.request.user.profile)
+            messages.info(self.request, f'"{label}" is large, so it will be deleted in the background shortly.')
+            return HttpResponseRedirect(self.get_success_url())
+        try:
+            delete_target(self.object)
+        except WriteQueueTimeout:
+            messages.error(self.request, 'The server is busy saving other changes. Please try again.')
+            return self.form_invalid(form)
+        messages.success(self.request, f'"{label}" was deleted.')
+        return HttpResponseRedirect(self.get_success_url())
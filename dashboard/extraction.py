@@ -0,0 +1,177 @@
+"""Plain-text extraction for uploaded documents.
+
+Only the standard library is used: txt is decoded directly, docx and xlsx are
+read as zipped XML, and PDFs get a best-effort scan of their content streams
+for text-showing operators (text in CID fonts without a ToUnicode map cannot
+be recovered this way). Legacy binary doc/xls files are not supported.
+
+``extract_worker`` runs in a worker process of the ``extract_document_text``
+command and enforces a per-file timeout with SIGALRM where available.
+"""
+import os
+import re
+import signal
+import zipfile
+import zlib
+from xml.etree import ElementTree
+
+SUPPORTED_EXTENSIONS = ('.txt', '.docx', '.xlsx', '.pdf')
+SEGMENT_LENGTH = 2000
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+S_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def extract_txt(path):
+    with open(path, 'rb') as source:
+        return [source.read().decode('utf-8', errors='replace')]
+
+
+def extract_docx(path):
+    """One entry per page, split on explicit and last-rendered page breaks"""
+    pages, paragraphs, runs = [], [], []
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as xml:
+        for event, element in ElementTree.iterparse(xml, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == f'{W_NS}lastRenderedPageBreak' or (
+                    element.tag == f'{W_NS}br' and element.get(f'{W_NS}type') == 'page'
+                ):
+                    paragraphs.append(''.join(runs))
+                    runs = []
+                    pages.append('\n'.join(p for p in paragraphs if p))
+                    paragraphs = []
+                continue
+            if element.tag == f'{W_NS}t':
+                runs.append(element.text or '')
+            elif element.tag == f'{W_NS}tab':
+                runs.append('\t')
+            elif element.tag == f'{W_NS}p':
+                paragraphs.append(''.join(runs))
+                runs = []
+                element.clear()
+    pages.append('\n'.join(p for p in paragraphs if p))
+    return pages
+
+
+def extract_xlsx(path):
+    """One entry per worksheet; each row becomes a tab separated line"""
+    with zipfile.ZipFile(path) as archive:
+        shared = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            with archive.open('xl/sharedStrings.xml') as xml:
+                for _, element in ElementTree.iterparse(xml):
+                    if element.tag == f'{S_NS}si':
+                        shared.append(''.join(t.text or '' for t in element.iter(f'{S_NS}t')))
+                        element.clear()
+        sheets = sorted(
+            (name for name in archive.namelist() if re.fullmatch(r'xl/worksheets/sheet\d+\.xml', name)),
+            key=lambda name: int(re.search(r'(\d+)\.xml$', name).group(1)),
+        )
+        pages = []
+        for sheet in sheets:
+            lines = []
+            with archive.open(sheet) as xml:
+                for _, element in ElementTree.iterparse(xml):
+                    if element.tag != f'{S_NS}row':
+                        continue
+                    cells = []
+                    for cell in element.iter(f'{S_NS}c'):
+                        kind = cell.get('t')
+                        if kind == 'inlineStr':
+                            cells.append(''.join(t.text or '' for t in cell.iter(f'{S_NS}t')))
+                            continue
+                        value = cell.find(f'{S_NS}v')
+                        if value is None or value.text is None:
+                            continue
+                        cells.append(shared[int(value.text)] if kind == 's' else value.text)
+                    if cells:
+                        lines.append('\t'.join(cells))
+                    element.clear()
+            pages.append('\n'.join(lines))
+        return pages
+
+
+PDF_STREAM = re.compile(rb'<<(.*?)>>\s*stream\r?\n(.*?)\r?\nendstream', re.S)
+PDF_TEXT_BLOCK = re.compile(rb'BT(.*?)ET', re.S)
+PDF_SHOW = re.compile(rb'(\((?:\\.|[^\\)])*\)|\[(?:\\.|[^\]])*\])\s*(?:Tj|TJ|\'|")')
+PDF_LITERAL = re.compile(rb'\((?:\\.|[^\\)])*\)')
+PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def _pdf_literal(raw):
+    out, i = bytearray(), 1
+    while i < len(raw) - 1:
+        byte = raw[i:i + 1]
+        if byte != b'\\':
+            out += byte
+            i += 1
+            continue
+        nxt = raw[i + 1:i + 2]
+        octal = re.match(rb'[0-7]{1,3}', raw[i + 1:i + 4])
+        if octal:
+            out.append(int(octal.group(), 8) & 0xFF)
+            i += 1 + len(octal.group())
+        else:
+            out += PDF_ESCAPES.get(nxt, nxt if nxt not in (b'\n', b'\r') else b'')
+            i += 2
+    return out.decode('latin-1')
+
+
+def extract_pdf(path):
+    """One entry per content stream that shows text (usually one per page)"""
+    with open(path, 'rb') as source:
+        data = source.read()
+    pages = []
+    for header, stream in PDF_STREAM.findall(data):
+        if b'/FlateDecode' in header:
+            try:
+                stream = zlib.decompress(stream)
+            except zlib.error:
+                continue
+        elif b'/Filter' in header:
+            continue
+        lines = []
+        for block in PDF_TEXT_BLOCK.findall(stream):
+            for operand in PDF_SHOW.findall(block):
+                lines.append(''.join(_pdf_literal(s) for s in PDF_LITERAL.findall(operand)))
+        if lines:
+            pages.append('\n'.join(lines))
+    return pages
+
+
+EXTRACTORS = {'.txt': extract_txt, '.docx': extract_docx, '.xlsx': extract_xlsx, '.pdf': extract_pdf}
+
+
+def segments(pages):
+    """Yield ``(page, offset, text)`` rows, splitting long pages"""
+    for page, text in enumerate(pages, start=1):
+        text = text.strip()
+        for offset in range(0, len(text), SEGMENT_LENGTH):
+            yield page, offset, text[offset:offset + SEGMENT_LENGTH]
+
+
+def _on_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def extract_worker(path, timeout, name=None):
+    """Extract one file inside a worker process; returns the segment rows.
+
+    ``name`` is the name it was uploaded under, which picks the extractor
+    (stored blobs have no extension).
+    """
+    extractor = EXTRACTORS[os.path.splitext(name or path)[1].lower()]
+    use_alarm = timeout and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_timeout)
+        signal.alarm(timeout)
+    try:
+        return list(segments(extractor(path)))
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous)
@@ -1,6 +1,10 @@
+import os
+import re
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Initiative, Task, Note, Document, UserProfile, District, InitiativeSheet, Event
+from .models import Initiative, Task, Note, Document, UserProfile, District, InitiativeSheet, Event, UploadSession
 
 class InitiativeForm(forms.ModelForm):
     class Meta:
@@ -97,6 +101,40 @@ class DocumentForm(forms.ModelForm):
                 self.fields['initiative'].queryset = Initiative.objects.filter(district=user.profile.district)
                 self.fields['task'].queryset = Task.objects.filter(initiative__district=user.profile.district)
 
+class UploadSessionForm(forms.ModelForm):
+    """Validates the init call of a chunked upload"""
+    class Meta:
+        model = UploadSession
+        fields = ['title', 'description', 'initiative', 'task', 'filename', 'total_size', 'sha256']
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        if user and hasattr(user, 'profile'):
+            if user.profile.role != 'admin':
+                self.fields['initiative'].queryset = Initiative.objects.filter(district=user.profile.district)
+                self.fields['task'].queryset = Task.objects.filter(initiative__district=user.profile.district)
+
+    def clean_filename(self):
+        filename = os.path.basename(self.cleaned_data['filename'])
+        extension = os.path.splitext(filename)[1].lstrip('.').lower()
+        allowed = Document._meta.get_field('file').validators[0].allowed_extensions
+        if extension not in allowed:
+            raise forms.ValidationError(f"File extension '{extension}' is not allowed.")
+        return filename
+
+    def clean_total_size(self):
+        total_size = self.cleaned_data['total_size']
+        if total_size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise forms.ValidationError('File is too large.')
+        return total_size
+
+    def clean_sha256(self):
+        sha256 = self.cleaned_data['sha256'].lower()
+        if sha256 and not re.fullmatch(r'[0-9a-f]{64}', sha256):
+            raise forms.ValidationError('Enter a hex encoded SHA-256 digest.')
+        return sha256
+
 class UserProfileForm(forms.ModelForm):
     class Meta:
         model = UserProfile
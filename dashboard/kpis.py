@@ -0,0 +1,217 @@
+"""Daily KPI snapshots behind the trend charts.
+
+``take_snapshot`` records the current task counts per district under today's
+date. It is meant to run nightly via ``manage.py snapshot_kpis``, and
+running it again the same day overwrites that day's rows.
+
+``backfill`` rebuilds earlier days in a single pass over every task's
+``created_at``, ``completed_at`` and ``due_date``. Past statuses are not
+recorded, so it has to approximate. A task counts as completed from its
+``completed_at`` on. Before that it is open, in its current status, or "in
+progress" if it is completed now. Tasks on hold today are never counted as
+overdue. Reconstructed rows leave ``avg_progress`` empty and are flagged
+``reconstructed``. Days with a real snapshot are left alone.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Avg, Count, Min, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import District, Initiative, KpiSnapshot, Task
+
+OPEN_STATUSES = ['not_started', 'in_progress']
+STATUS_FIELDS = ['not_started', 'in_progress', 'completed', 'on_hold']
+# Running totals carried from one day to the next
+LEVEL_FIELDS = ['tasks_total', 'overdue'] + STATUS_FIELDS
+# Counted on the day they happen only
+DAILY_FIELDS = ['completed_today', 'tasks_created', 'initiatives_created']
+SNAPSHOT_FIELDS = LEVEL_FIELDS + DAILY_FIELDS + ['avg_progress', 'reconstructed']
+TASK_DISTRICT = 'initiative__district_id'
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _save(snapshots):
+    KpiSnapshot.objects.bulk_create(
+        snapshots, batch_size=500, update_conflicts=True,
+        unique_fields=['district', 'date'], update_fields=SNAPSHOT_FIELDS,
+    )
+
+
+def take_snapshot(day=None):
+    """Write today's row for every district from the live tables; returns the row count."""
+    day = day or timezone.localdate()
+    start, end = _day_bounds(day)
+    task_stats = {
+        row.pop(TASK_DISTRICT): row
+        for row in Task.objects.order_by().values(TASK_DISTRICT).annotate(
+            tasks_total=Count('pk'),
+            **{status: Count('pk', filter=Q(status=status)) for status in STATUS_FIELDS},
+            overdue=Count('pk', filter=Q(due_date__lt=timezone.now(), status__in=OPEN_STATUSES)),
+            completed_today=Count('pk', filter=Q(completed_at__gte=start, completed_at__lt=end)),
+            tasks_created=Count('pk', filter=Q(created_at__gte=start, created_at__lt=end)),
+            avg_progress=Avg('progress_percentage'),
+        )
+    }
+    initiatives_created = dict(
+        Initiative.objects.filter(created_at__gte=start, created_at__lt=end).order_by()
+        .values_list('district_id').annotate(n=Count('pk'))
+    )
+    snapshots = [
+        KpiSnapshot(
+            date=day, district_id=district_id, initiatives_created=initiatives_created.get(district_id, 0),
+            **task_stats.get(district_id, {}),
+        )
+        for district_id in District.objects.values_list('pk', flat=True)
+    ]
+    _save(snapshots)
+    return len(snapshots)
+
+
+def backfill(since=None, until=None):
+    """Reconstruct rows for ``since``..``until`` (default: first task..yesterday).
+
+    Returns the number of rows written.
+    """
+    until = until or timezone.localdate() - timedelta(days=1)
+    # Per district: day -> Counter of changes to the running totals / daily counts
+    levels = defaultdict(lambda: defaultdict(Counter))
+    daily = defaultdict(lambda: defaultdict(Counter))
+    first_day = until
+
+    tasks = Task.objects.order_by().values_list(TASK_DISTRICT, 'created_at', 'completed_at', 'due_date', 'status')
+    for district_id, created_at, completed_at, due_date, status in tasks.iterator(chunk_size=2000):
+        created = timezone.localdate(created_at)
+        first_day = min(first_day, created)
+        if completed_at:
+            done = timezone.localdate(completed_at)
+        else:
+            done = created if status == 'completed' else None
+        open_status = 'in_progress' if status == 'completed' else status
+
+        changes = levels[district_id]
+        changes[created]['tasks_total'] += 1
+        daily[district_id][created]['tasks_created'] += 1
+        changes[created][open_status] += 1
+        if done is not None:
+            changes[done][open_status] -= 1
+            changes[done]['completed'] += 1
+            daily[district_id][done]['completed_today'] += 1
+        if status != 'on_hold':
+            overdue_from = max(created, timezone.localdate(due_date))
+            if done is None or done > overdue_from:
+                changes[overdue_from]['overdue'] += 1
+                if done is not None:
+                    changes[done]['overdue'] -= 1
+
+    initiatives = Initiative.objects.order_by().values_list('district_id', 'created_at')
+    for district_id, created_at in initiatives.iterator(chunk_size=2000):
+        daily[district_id][timezone.localdate(created_at)]['initiatives_created'] += 1
+
+    since = since or first_day
+    # Earlier reconstructions are redone; snapshots taken on the day are kept
+    KpiSnapshot.objects.filter(reconstructed=True, date__gte=since, date__lte=until).delete()
+    recorded = defaultdict(set)
+    for district_id, day in KpiSnapshot.objects.filter(date__gte=since, date__lte=until).values_list('district_id', 'date'):
+        recorded[district_id].add(day)
+    written = 0
+    for district_id in District.objects.values_list('pk', flat=True):
+        running = Counter()
+        for day, change in levels[district_id].items():
+            if day < since:
+                running.update(change)
+        snapshots = []
+        day = since
+        while day <= until:
+            running.update(levels[district_id].get(day, {}))
+            counts = daily[district_id].get(day, {})
+            if day not in recorded[district_id]:
+                snapshots.append(KpiSnapshot(
+                    date=day, district_id=district_id, reconstructed=True,
+                    **{field: running[field] for field in LEVEL_FIELDS},
+                    **{field: counts.get(field, 0) for field in DAILY_FIELDS},
+                ))
+            day += timedelta(days=1)
+        KpiSnapshot.objects.bulk_create(snapshots, batch_size=500)
+        written += len(snapshots)
+    return written
+
+
+def scoped_snapshots(user_profile):
+    if user_profile.role == 'admin':
+        return KpiSnapshot.objects.all()
+    return KpiSnapshot.objects.filter(district_id=user_profile.district_id)
+
+
+def chart_months(count=6):
+    """Return ``[(label, year, month)]`` for the monthly trend chart."""
+    months = []
+    for i in range(count, 0, -1):
+        month_date = timezone.now() - timedelta(days=30 * i)
+        months.append((month_date.strftime('%b'), month_date.year, month_date.month))
+    return months
+
+
+def monthly_created(snapshots, months):
+    """Initiatives and tasks created per month, read from ``snapshots``.
+
+    Returns ``(initiative_counts, task_counts)``. Months the snapshots do not
+    cover from their first day on are None in both, for callers to count
+    from the live tables with ``uncovered_counts``.
+    """
+    _, year, month = months[0]
+    first = snapshots.aggregate(first=Min('date'))['first']
+    if first is None:
+        return [None] * len(months), [None] * len(months)
+    rows = {
+        (row['month'].year, row['month'].month): row
+        for row in snapshots.filter(date__gte=datetime(year, month, 1).date()).order_by()
+        .values(month=TruncMonth('date')).annotate(i=Sum('initiatives_created'), t=Sum('tasks_created'))
+    }
+    empty = {'i': 0, 't': 0}
+    covered = [datetime(year, month, 1).date() >= first for _, year, month in months]
+    return (
+        [rows.get((year, month), empty)['i'] if ok else None for (_, year, month), ok in zip(months, covered)],
+        [rows.get((year, month), empty)['t'] if ok else None for (_, year, month), ok in zip(months, covered)],
+    )
+
+
+def uncovered_counts(months, counts):
+    """Aggregates counting the rows created in each month ``counts`` has no
+    value for, keyed for ``fill_uncovered``"""
+    return {
+        f'm{i}': Count('pk', filter=Q(created_at__year=year, created_at__month=month))
+        for i, ((_, year, month), count) in enumerate(zip(months, counts)) if count is None
+    }
+
+
+def fill_uncovered(counts, live):
+    return [live[f'm{i}'] if count is None else count for i, count in enumerate(counts)]
+
+
+def daily_trend(snapshots, days=90):
+    """Daily totals for the last ``days`` snapshot dates, summed over districts."""
+    since = timezone.localdate() - timedelta(days=days)
+    rows = snapshots.filter(date__gte=since).order_by('date').values_list(
+        'date', 'tasks_total', 'overdue', 'completed', 'completed_today', 'avg_progress',
+    )
+    trend = {}
+    for date, total, overdue, completed, completed_today, avg_progress in rows:
+        day = trend.setdefault(date, {'tasks': 0, 'overdue': 0, 'completed': 0, 'completed_today': 0, '_p': 0, '_n': 0})
+        day['tasks'] += total
+        day['overdue'] += overdue
+        day['completed'] += completed
+        day['completed_today'] += completed_today
+        if avg_progress is not None:
+            day['_p'] += avg_progress * total
+            day['_n'] += total
+    series = []
+    for date, day in trend.items():
+        progress, n = day.pop('_p'), day.pop('_n')
+        series.append({'date': date.isoformat(), **day, 'avg_progress': round(progress / n, 1) if n else None})
+    return series
@@ -0,0 +1,123 @@
+"""Read-only JSON lists of tasks, initiatives and notes.
+
+Rows are read with ``values_list`` and never become model instances. Only
+the columns asked for with ``?fields=`` are selected (``DEFAULT_FIELDS``
+otherwise). Pages are keyset-paged newest first: ``next`` is the cursor of
+the following page, or null on the last one. ``?format=`` picks the body:
+
+- ``json``: ``{"results": [{field: value}], "next": ...}``
+- ``compact``: ``{"fields": [...], "rows": [[value, ...]], "next": ...}``,
+  so field names are not repeated on every row
+- ``msgpack``: the compact body in MessagePack, when the optional
+  ``msgpack`` package is installed
+
+The views gzip any of them for clients that accept it.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F
+from django.http import HttpResponse, JsonResponse
+
+from .models import Initiative, Note, Task
+
+try:
+    import msgpack
+except ImportError:  # optional: the compact JSON body is nearly as small once gzipped
+    msgpack = None
+
+# Fields read from related rows: name -> lookup
+RELATED_FIELDS = {
+    Task: {
+        'initiative_title': 'initiative__title',
+        'district_name': 'initiative__district__name',
+        'assigned_to_username': 'assigned_to__user__username',
+    },
+    Initiative: {
+        'district_name': 'district__name',
+        'coordinator_username': 'coordinator__user__username',
+    },
+    Note: {
+        'initiative_title': 'initiative__title',
+        'author_username': 'author__user__username',
+    },
+}
+DEFAULT_FIELDS = {
+    Task: ['id', 'title', 'status', 'priority', 'due_date', 'progress_percentage', 'initiative_id', 'assigned_to_id'],
+    Initiative: [
+        'id', 'title', 'status', 'initiative_type', 'district_id', 'start_date', 'end_date',
+        'tasks_count', 'completed_tasks_count',
+    ],
+    Note: ['id', 'title', 'note_type', 'summary', 'initiative_id', 'task_id', 'author_id', 'created_at'],
+}
+FORMATS = ('json', 'compact', 'msgpack')
+
+
+class ListApiError(ValueError):
+    """A malformed ``fields``, ``cursor``, ``limit`` or ``format`` parameter"""
+
+
+def available_fields(model):
+    return [f.attname for f in model._meta.concrete_fields] + list(RELATED_FIELDS[model])
+
+
+def parse_fields(model, value):
+    if not value:
+        return DEFAULT_FIELDS[model]
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available_fields(model)]
+    if unknown or not fields:
+        raise ListApiError(f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(available_fields(model))}')
+    return fields
+
+
+def _int_param(params, name, default=None):
+    try:
+        return int(params[name]) if params.get(name) else default
+    except ValueError:
+        raise ListApiError(f'{name} must be a number') from None
+
+
+def page(queryset, params):
+    """Return ``(fields, rows, next cursor)`` for one page of ``queryset``"""
+    model = queryset.model
+    fields = parse_fields(model, params.get('fields'))
+    limit = max(1, min(_int_param(params, 'limit', settings.API_PAGE_SIZE), settings.API_PAGE_SIZE))
+    cursor = _int_param(params, 'cursor')
+    if cursor is not None:
+        queryset = queryset.filter(pk__lt=cursor)
+    related = {name: F(lookup) for name, lookup in RELATED_FIELDS[model].items() if name in fields}
+    rows = list(
+        queryset.annotate(**related).order_by('-pk').values_list(*fields, 'pk')[:limit + 1]
+    )
+    next_cursor = str(rows[limit - 1][-1]) if len(rows) > limit else None
+    return fields, [row[:-1] for row in rows[:limit]], next_cursor
+
+
+def _msgpack_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Cannot pack {type(value).__name__}')
+
+
+def respond(queryset, params):
+    """Render one page of ``queryset`` in the requested format"""
+    encoding = params.get('format') or 'json'
+    try:
+        if encoding not in FORMATS:
+            raise ListApiError(f'format must be one of {", ".join(FORMATS)}')
+        if encoding == 'msgpack' and msgpack is None:
+            raise ListApiError('msgpack is not available on this server; use format=compact')
+        fields, rows, next_cursor = page(queryset, params)
+    except ListApiError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    if encoding == 'json':
+        return JsonResponse({'results': [dict(zip(fields, row)) for row in rows], 'next': next_cursor})
+    body = {'fields': fields, 'rows': rows, 'next': next_cursor}
+    if encoding == 'compact':
+        return JsonResponse(body, json_dumps_params={'separators': (',', ':')})
+    return HttpResponse(msgpack.packb(body, default=_msgpack_default), content_type='application/msgpack')
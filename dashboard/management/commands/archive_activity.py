@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from dashboard.models import Activity, ActivityArchive
+
+ARCHIVE_FIELDS = [f.attname for f in Activity._meta.concrete_fields]
+
+
+class Command(BaseCommand):
+    help = 'Move activity older than --days from the hot stream into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=180, help='Keep this many days of activity hot (default: 180)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows moved per transaction (default: 1000)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        moved = 0
+
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    Activity.objects.filter(created_at__lt=cutoff)
+                    .order_by('created_at', 'id')
+                    .values(*ARCHIVE_FIELDS)[:batch_size]
+                )
+                if not rows:
+                    break
+                ActivityArchive.objects.bulk_create([ActivityArchive(**row) for row in rows], ignore_conflicts=True)
+                Activity.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            moved += len(rows)
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} activity entries older than {cutoff:%Y-%m-%d}'))
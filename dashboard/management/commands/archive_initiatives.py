@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dashboard.archive import BATCH_SIZE, archivable, archive_older_than, restore_initiatives
+
+
+class Command(BaseCommand):
+    help = 'Move completed and cancelled initiatives, with their rows, into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'ARCHIVE_AFTER_DAYS', 365),
+            help='Archive initiatives untouched for this many days (default: ARCHIVE_AFTER_DAYS)',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Initiatives moved per transaction')
+        parser.add_argument('--restore', type=int, nargs='+', metavar='ID', help='Move these initiatives back instead')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be archived without moving it')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            rows = restore_initiatives(options['restore'])
+            self.stdout.write(self.style.SUCCESS(f'Restored {rows} rows'))
+            return
+        if options['dry_run']:
+            count = archivable(options['days']).count()
+            self.stdout.write(self.style.SUCCESS(f'Would archive {count} initiatives'))
+            return
+        initiatives, rows = archive_older_than(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {initiatives} initiatives ({rows} rows)'))
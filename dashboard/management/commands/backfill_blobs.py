@@ -0,0 +1,71 @@
+import os
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, Min
+
+from dashboard.db import serialized_write
+from dashboard.models import Blob, Document, DocumentArchive
+from dashboard.storage import file_digest
+
+DOCUMENT_MODELS = (Document, DocumentArchive)
+
+
+class Command(BaseCommand):
+    help = 'Hash documents stored before content addressing and give every digest a Blob row with the right reference count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        hashed = 0
+        for model in DOCUMENT_MODELS:
+            legacy = model.objects.filter(sha256='').exclude(file='').only('file', 'file_size', 'original_name')
+            for document in legacy.iterator():
+                if not document.file.storage.exists(document.file.name):
+                    self.stderr.write(f'{model.__name__} {document.pk}: {document.file.name} is missing')
+                    continue
+                with document.file.open('rb') as source:
+                    sha256 = file_digest(source)
+                hashed += 1
+                if not dry_run:
+                    model.objects.filter(pk=document.pk).update(
+                        sha256=sha256,
+                        file_size=document.file_size or document.file.size,
+                        original_name=document.original_name or os.path.basename(document.file.name)[:255],
+                    )
+
+        # Archived documents keep holding their blob, as in dashboard.archive
+        references, files = Counter(), {}
+        for model in DOCUMENT_MODELS:
+            rows = model.objects.exclude(sha256='').order_by().values('sha256').annotate(
+                name=Min('file'), size=Max('file_size'), n=Count('pk'),
+            )
+            for row in rows:
+                references[row['sha256']] += row['n']
+                files.setdefault(row['sha256'], (row['name'], row['size']))
+
+        created = corrected = 0
+        with serialized_write(timeout=60):
+            counts = dict(Blob.objects.values_list('sha256', 'ref_count'))
+            for sha256, refs in references.items():
+                if sha256 not in counts:
+                    created += 1
+                    if not dry_run:
+                        name, size = files[sha256]
+                        Blob.objects.create(sha256=sha256, name=name, size=size, ref_count=refs)
+                elif counts[sha256] != refs:
+                    corrected += 1
+                    if not dry_run:
+                        Blob.objects.filter(pk=sha256).update(ref_count=refs)
+            unreferenced = Blob.objects.filter(ref_count__gt=0)
+            for model in DOCUMENT_MODELS:
+                unreferenced = unreferenced.exclude(pk__in=model.objects.values('sha256'))
+            corrected += unreferenced.count() if dry_run else unreferenced.update(ref_count=0)
+
+        if dry_run:
+            summary = f'Would hash {hashed} documents, create {created} blobs and correct {corrected} reference counts'
+        else:
+            summary = f'Hashed {hashed} documents, created {created} blobs and corrected {corrected} reference counts'
+        self.stdout.write(self.style.SUCCESS(summary))
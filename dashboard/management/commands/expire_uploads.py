@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dashboard.models import UploadSession
+from dashboard.uploads import discard_part
+
+
+class Command(BaseCommand):
+    help = 'Remove chunked upload sessions (and their part files) that have not progressed recently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Expire sessions idle for this many days (default: 7)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = 0
+        for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+            discard_part(session)
+            session.delete()
+            expired += 1
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} upload sessions'))
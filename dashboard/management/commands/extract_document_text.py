@@ -0,0 +1,83 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from dashboard.extraction import SUPPORTED_EXTENSIONS, ExtractionTimeout, extract_worker
+from dashboard.models import Document, DocumentText
+from dashboard.storage import extension_filter, file_digest
+
+logger = logging.getLogger(__name__)
+
+
+def store_segments(document_ids, sha256, rows):
+    """Replace the extracted text of documents sharing one content hash"""
+    with transaction.atomic():
+        DocumentText.objects.filter(document_id__in=document_ids).delete()
+        DocumentText.objects.bulk_create([
+            DocumentText(document_id=document_id, sha256=sha256, page=page, offset=offset, text=text)
+            for document_id in document_ids
+            for page, offset, text in rows
+        ], batch_size=500)
+        Document.objects.filter(pk__in=document_ids).update(text_sha256=sha256)
+
+
+class Command(BaseCommand):
+    help = 'Extract searchable text from new or changed txt, docx, xlsx and pdf documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Size of the process pool')
+        parser.add_argument('--timeout', type=int, default=60, help='Seconds allowed per file (default: 60)')
+
+    def handle(self, *args, **options):
+        # Incremental: only documents whose content changed since the last run
+        pending = Document.objects.filter(extension_filter(SUPPORTED_EXTENSIONS)).exclude(
+            sha256=F('text_sha256'), text_sha256__gt=''
+        ).only('file', 'sha256', 'original_name')
+
+        jobs = {}
+        for document in pending:
+            if not document.sha256:
+                with document.file.open('rb') as source:
+                    document.sha256 = file_digest(source)
+                Document.objects.filter(pk=document.pk).update(sha256=document.sha256)
+            jobs.setdefault(document.sha256, {
+                'path': document.file.path, 'name': document.original_name or document.file.name, 'documents': [],
+            })['documents'].append(document.pk)
+
+        # Identical content extracted for another document is copied, not re-parsed
+        copied = 0
+        for sha256 in list(jobs):
+            source = Document.objects.filter(text_sha256=sha256).exclude(pk__in=jobs[sha256]['documents']).first()
+            if source is not None:
+                rows = source.text_segments.values_list('page', 'offset', 'text')
+                store_segments(jobs.pop(sha256)['documents'], sha256, list(rows))
+                copied += 1
+
+        extracted = failed = 0
+        if jobs:
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                futures = {
+                    pool.submit(extract_worker, job['path'], options['timeout'], job['name']): sha256
+                    for sha256, job in jobs.items()
+                }
+                for future in as_completed(futures):
+                    sha256 = futures[future]
+                    try:
+                        rows = future.result()
+                        extracted += 1
+                    except ExtractionTimeout:
+                        logger.warning('Timed out extracting text from %s', jobs[sha256]['path'])
+                        rows, failed = [], failed + 1
+                    except Exception:
+                        logger.exception('Could not extract text from %s', jobs[sha256]['path'])
+                        rows, failed = [], failed + 1
+                    # Failures are recorded too so unchanged files are not retried
+                    store_segments(jobs[sha256]['documents'], sha256, rows)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Extracted {extracted} files, reused {copied}, failed {failed}'
+        ))
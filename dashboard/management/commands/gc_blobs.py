@@ -0,0 +1,58 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dashboard.models import Blob
+from dashboard.storage import document_storage
+
+
+class Command(BaseCommand):
+    help = 'Delete document blobs that are no longer referenced by any document'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=int, default=60,
+            help='Leave blobs younger than this alone so in-flight uploads are not collected (default: 60)',
+        )
+        parser.add_argument(
+            '--orphans', action='store_true',
+            help='Also remove blob files on disk that have no Blob row (e.g. from rolled-back uploads)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting')
+
+    def handle(self, *args, **options):
+        storage = document_storage()
+        cutoff = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        dry_run = options['dry_run']
+        removed = freed = 0
+
+        for blob in Blob.objects.filter(ref_count=0, created_at__lt=cutoff).iterator():
+            if not dry_run:
+                # Conditional delete: a concurrent upload may have re-acquired it
+                deleted, _ = Blob.objects.filter(pk=blob.pk, ref_count=0).delete()
+                if not deleted:
+                    continue
+                if storage.exists(blob.name):
+                    storage.delete(blob.name)
+            removed += 1
+            freed += blob.size
+
+        if options['orphans']:
+            known = set(Blob.objects.values_list('name', flat=True))
+            root = storage.path('documents/blobs')
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                    if name in known or os.path.getmtime(path) > time.time() - options['grace_minutes'] * 60:
+                        continue
+                    freed += os.path.getsize(path)
+                    removed += 1
+                    if not dry_run:
+                        os.remove(path)
+
+        verb = 'Would remove' if dry_run else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {removed} blobs ({freed / 1024:.1f} KB)'))
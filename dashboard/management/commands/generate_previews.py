@@ -0,0 +1,87 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dashboard import auth_cache
+from dashboard.models import Document, UserProfile
+from dashboard.previews import IMAGE_EXTENSIONS, is_image, preview_sizes, render_previews
+from dashboard.storage import extension_filter, file_digest
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnail previews for image documents and profile pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Size of the process pool')
+        parser.add_argument('--watch', type=int, default=0, metavar='SECONDS',
+                            help='Keep running and poll for new images every SECONDS')
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                rendered = self.run_once(pool)
+                if rendered or options['verbosity'] > 1:
+                    self.stdout.write(self.style.SUCCESS(f'Rendered previews for {rendered} images'))
+                if not options['watch']:
+                    break
+                time.sleep(options['watch'])
+
+    def pending_jobs(self):
+        """Map each content hash to its source file and the rows waiting on it"""
+        jobs = {}
+        images = Document.objects.filter(extension_filter(IMAGE_EXTENSIONS), preview_ready=False, preview_failed=False)
+        for document in images.only('file', 'sha256'):
+            if not document.sha256:
+                # Legacy upload stored before content hashing
+                with document.file.open('rb') as source:
+                    document.sha256 = file_digest(source)
+                Document.objects.filter(pk=document.pk).update(sha256=document.sha256)
+            job = jobs.setdefault(document.sha256, {'path': document.file.path, 'documents': [], 'profiles': []})
+            job['documents'].append(document.pk)
+
+        profiles = UserProfile.objects.filter(preview_ready=False, preview_failed=False).exclude(profile_picture='')
+        for profile in profiles.exclude(profile_picture__isnull=True).only('profile_picture', 'picture_sha256'):
+            if not is_image(profile.profile_picture.name):
+                continue
+            if not profile.picture_sha256:
+                with profile.profile_picture.open('rb') as source:
+                    profile.picture_sha256 = file_digest(source)
+                UserProfile.objects.filter(pk=profile.pk).update(picture_sha256=profile.picture_sha256)
+            job = jobs.setdefault(profile.picture_sha256, {'path': profile.profile_picture.path, 'documents': [], 'profiles': []})
+            job['profiles'].append(profile.pk)
+        return jobs
+
+    def run_once(self, pool):
+        jobs = self.pending_jobs()
+        futures = {
+            pool.submit(render_previews, job['path'], sha256, str(settings.MEDIA_ROOT), preview_sizes()): sha256
+            for sha256, job in jobs.items()
+        }
+        rendered = 0
+        for future in as_completed(futures):
+            sha256 = futures[future]
+            documents = Document.objects.filter(pk__in=jobs[sha256]['documents'])
+            profiles = UserProfile.objects.filter(pk__in=jobs[sha256]['profiles'])
+            try:
+                future.result()
+            except Exception:
+                # Not retried until the file is replaced (save() clears the flag)
+                logger.exception('Could not render previews for %s', jobs[sha256]['path'])
+                documents.update(preview_failed=True)
+                profiles.update(preview_failed=True)
+                continue
+            # update() keeps preview bookkeeping out of the activity stream.
+            # No fragment cache holds previews (document lists and user pages
+            # are not fragment-cached); only the session snapshots of the
+            # profiles' users copy preview_ready, so those are dropped here.
+            documents.update(preview_ready=True)
+            profiles.update(preview_ready=True)
+            auth_cache.invalidate(*profiles.values_list('user_id', flat=True))
+            rendered += 1
+        return rendered
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dashboard.sync import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than --days; clients with older cursors resync from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SYNC_TOMBSTONE_DAYS,
+                            help=f'Keep this many days of tombstones (default: {settings.SYNC_TOMBSTONE_DAYS})')
+
+    def handle(self, *args, **options):
+        removed = prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Pruned {removed} tombstones older than {options["days"]} days'))
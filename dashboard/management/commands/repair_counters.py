@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from dashboard.models import Initiative
+
+
+class Command(BaseCommand):
+    help = "Verify the denormalized Initiative counters and fix any that drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        mismatch = Q()
+        for field in Initiative.COUNTER_FIELDS:
+            mismatch |= ~Q(**{field: F(f'actual_{field}')})
+        drifted = Initiative.objects.with_actual_counts().filter(mismatch).order_by('pk')
+
+        ids = []
+        for initiative in drifted:
+            ids.append(initiative.pk)
+            changes = ', '.join(
+                f'{field} {getattr(initiative, field)} -> {getattr(initiative, f"actual_{field}")}'
+                for field in Initiative.COUNTER_FIELDS
+                if getattr(initiative, field) != getattr(initiative, f'actual_{field}')
+            )
+            self.stdout.write(f'Initiative {initiative.pk}: {changes}')
+        if ids and not options['dry_run']:
+            Initiative.objects.filter(pk__in=ids).refresh_counters()
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(ids)} initiatives with drifted counters'))
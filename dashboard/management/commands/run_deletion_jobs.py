@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.deletion import run_job
+from dashboard.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = 'Delete the districts, initiatives and users queued for background deletion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', type=int, default=0, metavar='SECONDS',
+                            help='Keep running and poll for new jobs every SECONDS')
+
+    def handle(self, *args, **options):
+        while True:
+            for job in DeletionJob.objects.filter(status='pending').order_by('created_at'):
+                if not run_job(job):
+                    continue
+                job.refresh_from_db()
+                style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+                self.stdout.write(style(f'{job}: {job.deleted} rows removed'))
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import kpis
+
+
+class Command(BaseCommand):
+    help = "Record today's KPI snapshot per district, or rebuild past days with --backfill"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help='Reconstruct days before today from task history')
+        parser.add_argument('--since', type=date.fromisoformat, help='First day to backfill (default: first task)')
+
+    def handle(self, *args, **options):
+        if options['since'] and not options['backfill']:
+            raise CommandError('--since only applies with --backfill')
+        if options['backfill']:
+            rows = kpis.backfill(since=options['since'])
+            self.stdout.write(self.style.SUCCESS(f'Reconstructed {rows} snapshot rows'))
+        rows = kpis.take_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Recorded today's snapshot for {rows} districts"))
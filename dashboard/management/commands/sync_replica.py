@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from dashboard.db import snapshot_sqlite
+
+
+class Command(BaseCommand):
+    help = 'Refresh the SQLite read replica with a snapshot of the primary database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--replica', default=getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica'),
+            help='Database alias of the replica (default: DATABASE_REPLICA_ALIAS)',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running and take a snapshot every INTERVAL seconds. Keep it below '
+                 'REPLICA_LAG_TOLERANCE so pinned users never see stale data.',
+        )
+
+    def handle(self, *args, **options):
+        alias = options['replica']
+        if alias not in settings.DATABASES:
+            raise CommandError(f'No "{alias}" database configured; set DB_REPLICA_PATH.')
+        source, target = settings.DATABASES[DEFAULT_DB_ALIAS], settings.DATABASES[alias]
+        for db in (source, target):
+            if db['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('sync_replica only copies SQLite databases; use native replication elsewhere.')
+
+        while True:
+            started = time.monotonic()
+            pages = snapshot_sqlite(source['NAME'], target['NAME'])
+            self.stdout.write(f'Copied {pages} pages to {alias} in {time.monotonic() - started:.2f}s')
+            if not options['interval']:
+                break
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
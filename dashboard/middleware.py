@@ -0,0 +1,93 @@
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+from . import auth_cache, routers
+
+_current_request = ContextVar('dashboard_current_request', default=None)
+
+
+def get_current_request():
+    """Return the request being served on this thread/task, if any"""
+    return _current_request.get()
+
+
+class HybridMiddleware:
+    """Middleware that runs natively under both WSGI and ASGI, so async views
+    are not pushed into a thread on their way through it. Subclasses define
+    ``handle`` and its coroutine twin ``__acall__``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class CurrentRequestMiddleware(HybridMiddleware):
+    """Expose the current request to signal handlers (e.g. to record the actor
+    of an activity) without resolving the user up front"""
+
+    def handle(self, request):
+        token = _current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+
+class PrimaryPinMiddleware(HybridMiddleware):
+    """After a successful write, keep the user's reads on the primary database
+    until the replica has had time to catch up (see dashboard.routers)"""
+
+    def handle(self, request):
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if (
+            request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+            and response.status_code < 400
+            and routers.replica_alias()
+        ):
+            routers.pin_to_primary(request, response)
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware whose request.user (with profile and district)
+    comes from the session snapshot kept by dashboard.auth_cache"""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: auth_cache.get_user(request))
+
+        async def auser():
+            if not hasattr(request, '_acached_user'):
+                request._acached_user = await sync_to_async(auth_cache.get_user)(request)
+            return request._acached_user
+
+        request.auser = auser
+
+    async def __acall__(self, request):
+        # Only lazy objects are set up here, so no thread is needed for it
+        self.process_request(request)
+        return await self.get_response(request)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_previews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='text_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('page', models.PositiveIntegerField(default=1)),
+                ('offset', models.PositiveIntegerField(default=0)),
+                ('text', models.TextField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='text_segments', to='dashboard.document')),
+            ],
+            options={
+                'ordering': ['document', 'page', 'offset'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_document_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('tasks_total', models.PositiveIntegerField(default=0)),
+                ('not_started', models.PositiveIntegerField(default=0)),
+                ('in_progress', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('on_hold', models.PositiveIntegerField(default=0)),
+                ('overdue', models.PositiveIntegerField(default=0)),
+                ('completed_today', models.PositiveIntegerField(default=0)),
+                ('tasks_created', models.PositiveIntegerField(default=0)),
+                ('initiatives_created', models.PositiveIntegerField(default=0)),
+                ('avg_progress', models.FloatField(blank=True, null=True)),
+                ('reconstructed', models.BooleanField(default=False)),
+                ('district', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kpi_snapshots', to='dashboard.district')),
+            ],
+            options={
+                'ordering': ['date', 'district'],
+                'indexes': [models.Index(fields=['date'], name='kpi_snapshot_date')],
+                'unique_together': {('district', 'date')},
+            },
+        ),
+    ]
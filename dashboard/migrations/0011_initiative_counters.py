@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Initiative = apps.get_model('dashboard', 'Initiative')
+
+    def count(model_name, **filters):
+        model = apps.get_model('dashboard', model_name)
+        rows = model.objects.filter(initiative=OuterRef('pk'), **filters).order_by().values('initiative')
+        return Coalesce(Subquery(rows.annotate(n=Count('pk')).values('n')), 0)
+
+    Initiative.objects.update(
+        tasks_count=count('Task'),
+        completed_tasks_count=count('Task', status='completed'),
+        notes_count=count('Note'),
+        documents_count=count('Document'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_kpi_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='initiative',
+            name='completed_tasks_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='initiative',
+            name='documents_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='initiative',
+            name='notes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='initiative',
+            name='tasks_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:29
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_summaries(apps, schema_editor):
+    # Historical models have no save() logic, so compute what Summarized.save would
+    for model_name, source in (('Initiative', 'description'), ('Task', 'description'), ('Note', 'content')):
+        model = apps.get_model('dashboard', model_name)
+        batch = []
+        for obj in model.objects.only('pk', source).iterator(chunk_size=500):
+            obj.summary = Truncator(getattr(obj, source)).chars(200)
+            batch.append(obj)
+            if len(batch) == 500:
+                model.objects.bulk_update(batch, ['summary'])
+                batch = []
+        model.objects.bulk_update(batch, ['summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_initiative_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='initiative',
+            name='summary',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='summary',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='summary',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
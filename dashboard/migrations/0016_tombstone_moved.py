@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='moved',
+            field=models.BooleanField(default=False),
+        ),
+    ]
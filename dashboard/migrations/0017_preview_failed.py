@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_tombstone_moved'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='preview_failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='documentarchive',
+            name='preview_failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='preview_failed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,7 +1,13 @@
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.text import Truncator
 from django.core.validators import FileExtensionValidator, MinValueValidator, MaxValueValidator
+from .storage import document_storage, file_digest
+import os
+import uuid
 
 class District(models.Model):
     """Model for representing districts"""
@@ -30,14 +36,81 @@ class UserProfile(models.Model):
     phone = models.CharField(max_length=20, blank=True)
     bio = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    picture_sha256 = models.CharField(max_length=64, blank=True)
+    preview_ready = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # The preview worker could not render this picture; cleared with a new
+    # one. Last, so session snapshots taken before it was added still load.
+    preview_failed = models.BooleanField(default=False)
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.get_role_display()}"
 
-class Initiative(models.Model):
-    """Model for representing initiatives"""
+    def save(self, *args, **kwargs):
+        # A new picture needs new renditions from the preview worker
+        if self.profile_picture and not self.profile_picture._committed:
+            self.picture_sha256 = file_digest(self.profile_picture.file)
+            self.preview_ready = self.preview_failed = False
+        elif not self.profile_picture:
+            self.picture_sha256 = ''
+            self.preview_ready = self.preview_failed = False
+        super().save(*args, **kwargs)
+
+SUMMARY_LENGTH = 200
+
+class Summarized(models.Model):
+    """Keeps ``summary`` as the card-sized snippet of ``summary_source``, so
+    lists can defer the full text"""
+    summary_source = None
+    summary = models.CharField(max_length=SUMMARY_LENGTH, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Same text truncatechars:200 would render; skipped if the source is deferred
+        if self.summary_source in self.__dict__:
+            self.summary = Truncator(getattr(self, self.summary_source)).chars(SUMMARY_LENGTH)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and self.summary_source in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'summary'}
+        super().save(*args, **kwargs)
+
+def related_count(model, **filters):
+    """Correlated COUNT of ``model`` rows belonging to the outer initiative.
+
+    Each count is its own subquery, so counting tasks and notes together never
+    joins them against each other (tasks x notes rows per initiative).
+    """
+    rows = model.objects.filter(initiative=OuterRef('pk'), **filters).order_by().values('initiative')
+    return Coalesce(Subquery(rows.annotate(n=Count('pk')).values('n')), 0)
+
+class InitiativeQuerySet(models.QuerySet):
+    @staticmethod
+    def counter_expressions():
+        return {
+            'tasks_count': related_count(Task),
+            'completed_tasks_count': related_count(Task, status='completed'),
+            'notes_count': related_count(Note),
+            'documents_count': related_count(Document),
+        }
+
+    def with_actual_counts(self):
+        """Annotate ``actual_<counter>`` with live counts from the related tables"""
+        return self.annotate(**{f'actual_{field}': expr for field, expr in self.counter_expressions().items()})
+
+    def refresh_counters(self):
+        """Recompute the denormalized counters from the related tables and
+        stamp the initiatives as changed"""
+        return self.update(updated_at=timezone.now(), **self.counter_expressions())
+
+class InitiativeBase(Summarized):
+    """Fields shared by live initiatives and their archived copies"""
+    summary_source = 'description'
+    # Maintained by signal handlers with F() updates; never written by save()
+    COUNTER_FIELDS = ('tasks_count', 'completed_tasks_count', 'notes_count', 'documents_count')
+
     STATUS_CHOICES = [
         ('active', 'Active'),
         ('completed', 'Completed'),
@@ -64,17 +137,65 @@ class Initiative(models.Model):
     end_date = models.DateField(null=True, blank=True)
     budget = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     kpi_target = models.TextField(blank=True)
+    tasks_count = models.IntegerField(default=0, editable=False)
+    completed_tasks_count = models.IntegerField(default=0, editable=False)
+    notes_count = models.IntegerField(default=0, editable=False)
+    documents_count = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
+        abstract = True
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.title} - {self.district.name}"
 
-class Task(models.Model):
-    """Model for representing tasks"""
+class SyncLocated:
+    """Remembers where a loaded row sat, so moving it to another district can
+    leave a sync tombstone in the old one (see dashboard.sync)"""
+    location_field = 'initiative_id'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_location = instance.__dict__.get(cls.location_field)
+        return instance
+
+class Initiative(SyncLocated, InitiativeBase):
+    """Model for representing initiatives"""
+    location_field = 'district_id'
+    objects = InitiativeQuerySet.as_manager()
+
+    class Meta(InitiativeBase.Meta):
+        # Keyset order of the sync API (dashboard.sync)
+        indexes = [models.Index(fields=['updated_at', 'id'], name='initiative_sync')]
+
+    def save(self, *args, **kwargs):
+        # A stale in-memory counter must not overwrite concurrent increments
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS and f.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+class CountedOnInitiative:
+    """Remembers what a loaded row contributes to its initiative's counters,
+    so the signal handlers can move them when it changes"""
+    counted_fields = ('initiative_id',)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in instance.__dict__ for field in cls.counted_fields):
+            instance._counted = tuple(instance.__dict__[field] for field in cls.counted_fields)
+        return instance
+
+class TaskBase(Summarized):
+    """Fields shared by live tasks and their archived copies"""
+    summary_source = 'description'
     PRIORITY_CHOICES = [
         ('low', 'Low'),
         ('medium', 'Medium'),
@@ -103,6 +224,7 @@ class Task(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
+        abstract = True
         ordering = ['-due_date', '-priority']
     
     def __str__(self):
@@ -111,8 +233,16 @@ class Task(models.Model):
     def is_overdue(self):
         return self.due_date < timezone.now() and self.status != 'completed'
 
-class Note(models.Model):
-    """Model for representing notes and comments"""
+class Task(SyncLocated, CountedOnInitiative, TaskBase):
+    """Model for representing tasks"""
+    counted_fields = ('initiative_id', 'status')
+
+    class Meta(TaskBase.Meta):
+        indexes = [models.Index(fields=['updated_at', 'id'], name='task_sync')]
+
+class NoteBase(Summarized):
+    """Fields shared by live notes and their archived copies"""
+    summary_source = 'content'
     NOTE_TYPE_CHOICES = [
         ('meeting', 'Meeting Notes'),
         ('workshop', 'Workshop Summary'),
@@ -132,38 +262,127 @@ class Note(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
+        abstract = True
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.title} - {self.initiative.title}"
 
-class Document(models.Model):
-    """Model for file uploads"""
+class Note(SyncLocated, CountedOnInitiative, NoteBase):
+    """Model for representing notes and comments"""
+
+    class Meta(NoteBase.Meta):
+        indexes = [models.Index(fields=['updated_at', 'id'], name='note_sync')]
+
+class BlobManager(models.Manager):
+    def acquire(self, sha256, name, size):
+        """Add a reference to the blob, creating its row on first use"""
+        self.get_or_create(sha256=sha256, defaults={'name': name, 'size': size})
+        self.filter(pk=sha256).update(ref_count=F('ref_count') + 1)
+
+    def release(self, sha256):
+        """Drop a reference; unreferenced blobs are removed by gc_blobs"""
+        self.filter(pk=sha256, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+class Blob(models.Model):
+    """A stored file, shared by every document with the same content"""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = BlobManager()
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+class DocumentBase(models.Model):
+    """Fields shared by live documents and their archived copies"""
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     file = models.FileField(
         upload_to='documents/',
+        storage=document_storage,
         validators=[FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt', 'jpg', 'jpeg', 'png', 'gif'])]
     )
     initiative = models.ForeignKey(Initiative, on_delete=models.CASCADE, related_name='documents')
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='documents', null=True, blank=True)
     uploaded_by = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='uploaded_documents')
     file_size = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    original_name = models.CharField(max_length=255, blank=True)
+    preview_ready = models.BooleanField(default=False)
+    # The preview worker could not render this file; cleared with new content
+    preview_failed = models.BooleanField(default=False)
+    text_sha256 = models.CharField(max_length=64, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
+        abstract = True
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.title} - {self.initiative.title}"
+
+class Document(CountedOnInitiative, DocumentBase):
+    """Model for file uploads"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored digest so blob references can be moved on change
+        instance._loaded_sha256 = instance.__dict__.get('sha256', '')
+        return instance
     
     def save(self, *args, **kwargs):
-        if self.file:
+        # Only a freshly assigned file needs measuring and hashing
+        if self.file and not self.file._committed:
             self.file_size = self.file.size
+            self.sha256 = file_digest(self.file.file)
+            self.original_name = os.path.basename(self.file.name)[:255]
+            self.preview_ready = self.preview_failed = False
         super().save(*args, **kwargs)
 
-class InitiativeSheet(models.Model):
-    """Coordinator-specific Google Sheet link for an initiative"""
+class DocumentText(models.Model):
+    """Plain text extracted from a document, one row per page segment"""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='text_segments')
+    sha256 = models.CharField(max_length=64, db_index=True)
+    page = models.PositiveIntegerField(default=1)
+    offset = models.PositiveIntegerField(default=0)
+    text = models.TextField()
+
+    class Meta:
+        ordering = ['document', 'page', 'offset']
+
+    def __str__(self):
+        return f"{self.document_id} p{self.page}@{self.offset}"
+
+class UploadSession(models.Model):
+    """Resumable chunked upload that becomes a Document once finalized"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='upload_sessions')
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    initiative = models.ForeignKey(Initiative, on_delete=models.CASCADE, related_name='+')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(validators=[MinValueValidator(1)])
+    received = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    document = models.ForeignKey(Document, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.total_size})"
+
+    @property
+    def is_complete(self):
+        return self.received >= self.total_size
+
+class InitiativeSheetBase(models.Model):
+    """Fields shared by live sheet links and their archived copies"""
     initiative = models.ForeignKey(Initiative, on_delete=models.CASCADE, related_name='sheets')
     coordinator = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='initiative_sheets')
     sheet_url = models.URLField(max_length=500)
@@ -171,14 +390,18 @@ class InitiativeSheet(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        abstract = True
         unique_together = ('initiative', 'coordinator')
         ordering = ['-updated_at']
 
     def __str__(self):
         return f"{self.initiative.title} - {self.coordinator.user.get_full_name()}"
 
-class Event(models.Model):
-    """Calendar event for initiatives including optional Google Meet link"""
+class InitiativeSheet(InitiativeSheetBase):
+    """Coordinator-specific Google Sheet link for an initiative"""
+
+class EventBase(models.Model):
+    """Fields shared by live events and their archived copies"""
     initiative = models.ForeignKey(Initiative, on_delete=models.CASCADE, related_name='events')
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -188,9 +411,204 @@ class Event(models.Model):
     meet_link = models.URLField(max_length=500, blank=True)
     location = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        abstract = True
         ordering = ['start_datetime']
 
     def __str__(self):
         return f"{self.title} ({self.initiative.title})"
+
+class Event(SyncLocated, EventBase):
+    """Calendar event for initiatives including optional Google Meet link"""
+
+    class Meta(EventBase.Meta):
+        indexes = [models.Index(fields=['updated_at', 'id'], name='event_sync')]
+
+# Archived copies, moved out of the live tables by dashboard.archive. Rows keep
+# their ids, and links to districts, people and other archive tables are
+# unchecked ids. dashboard.deletion removes the archived rows of a district
+# or person along with the live ones, but a plain ORM or admin delete leaves
+# them pointing at nothing, so readers allow for a missing district or person.
+
+class InitiativeArchive(InitiativeBase):
+    """Completed or cancelled initiative moved out of the live tables"""
+    district = models.ForeignKey(District, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    coordinator = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta(InitiativeBase.Meta):
+        verbose_name = 'archived initiative'
+
+class TaskArchive(TaskBase):
+    initiative = models.ForeignKey(InitiativeArchive, on_delete=models.DO_NOTHING, db_constraint=False, related_name='tasks')
+    assigned_to = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    created_by = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta(TaskBase.Meta):
+        verbose_name = 'archived task'
+
+class NoteArchive(NoteBase):
+    initiative = models.ForeignKey(InitiativeArchive, on_delete=models.DO_NOTHING, db_constraint=False, related_name='notes')
+    task = models.ForeignKey(TaskArchive, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='notes')
+    author = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta(NoteBase.Meta):
+        verbose_name = 'archived note'
+
+class DocumentArchive(DocumentBase):
+    """Archived document metadata; the stored file keeps its blob reference"""
+    initiative = models.ForeignKey(InitiativeArchive, on_delete=models.DO_NOTHING, db_constraint=False, related_name='documents')
+    task = models.ForeignKey(TaskArchive, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='documents')
+    uploaded_by = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta(DocumentBase.Meta):
+        verbose_name = 'archived document'
+
+class InitiativeSheetArchive(InitiativeSheetBase):
+    initiative = models.ForeignKey(InitiativeArchive, on_delete=models.DO_NOTHING, db_constraint=False, related_name='sheets')
+    coordinator = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta(InitiativeSheetBase.Meta):
+        verbose_name = 'archived sheet link'
+
+class EventArchive(EventBase):
+    initiative = models.ForeignKey(InitiativeArchive, on_delete=models.DO_NOTHING, db_constraint=False, related_name='events')
+    organizer = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta(EventBase.Meta):
+        verbose_name = 'archived event'
+
+class ActivityBase(models.Model):
+    """Denormalized activity entry; district and actor are stored by id and
+    name so reads never join, and deleting them never touches the stream"""
+    VERB_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+
+    district = models.ForeignKey(District, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    actor = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    actor_name = models.CharField(max_length=150, blank=True)
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    object_type = models.CharField(max_length=30)
+    object_id = models.PositiveBigIntegerField()
+    summary = models.CharField(max_length=255)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        return self.summary
+
+    def get_absolute_url(self):
+        from django.urls import reverse
+        url_names = {'initiative': 'initiative_detail', 'task': 'task_detail'}
+        if self.verb == 'deleted' or self.object_type not in url_names:
+            return ''
+        return reverse(url_names[self.object_type], args=[self.object_id])
+
+class Activity(ActivityBase):
+    """Append-only activity stream powering the timeline"""
+
+    class Meta(ActivityBase.Meta):
+        verbose_name_plural = 'activities'
+        indexes = [
+            models.Index(fields=['district', 'created_at'], name='activity_district_created'),
+            models.Index(fields=['created_at'], name='activity_created'),
+        ]
+
+class ActivityArchive(ActivityBase):
+    """Activity rolled out of the hot stream by the archive_activity command"""
+
+    class Meta(ActivityBase.Meta):
+        verbose_name_plural = 'archived activities'
+
+class Tombstone(models.Model):
+    """A synced row that left the live tables (deleted or archived) or its
+    district, kept so sync clients can drop their copy; pruned by the
+    prune_tombstones command"""
+    object_type = models.CharField(max_length=30)
+    object_id = models.PositiveBigIntegerField()
+    district = models.ForeignKey(District, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    # The row still exists in another district; admins, who see both, skip it
+    moved = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted'),
+            models.Index(fields=['district', 'deleted_at', 'id'], name='tombstone_district_deleted'),
+        ]
+
+    def __str__(self):
+        return f"{self.object_type} {self.object_id}"
+
+class KpiSnapshot(models.Model):
+    """End-of-day task KPIs for one district, written by the snapshot_kpis command"""
+    date = models.DateField()
+    district = models.ForeignKey(District, on_delete=models.CASCADE, related_name='kpi_snapshots')
+    tasks_total = models.PositiveIntegerField(default=0)
+    not_started = models.PositiveIntegerField(default=0)
+    in_progress = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    on_hold = models.PositiveIntegerField(default=0)
+    overdue = models.PositiveIntegerField(default=0)
+    completed_today = models.PositiveIntegerField(default=0)
+    tasks_created = models.PositiveIntegerField(default=0)
+    initiatives_created = models.PositiveIntegerField(default=0)
+    # Unknown for reconstructed days: past progress values are not recorded
+    avg_progress = models.FloatField(null=True, blank=True)
+    reconstructed = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('district', 'date')
+        ordering = ['date', 'district']
+        indexes = [
+            models.Index(fields=['date'], name='kpi_snapshot_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.district_id} @ {self.date}"
+
+class DeletionJob(models.Model):
+    """A district, initiative or user queued for deletion by the run_deletion_jobs command"""
+    TARGET_CHOICES = [
+        ('district', 'District'),
+        ('initiative', 'Initiative'),
+        ('user', 'User'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    target_type = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    target_id = models.PositiveIntegerField()
+    target_label = models.CharField(max_length=200)
+    requested_by = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Rows to remove (counted when queued) and rows removed so far
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Delete {self.get_target_type_display()} {self.target_label} ({self.get_status_display()})"
@@ -0,0 +1,72 @@
+"""Downscaled previews for image documents and profile pictures.
+
+Renditions are written by the ``generate_previews`` worker command to
+``<MEDIA_ROOT>/previews/<aa>/<sha256>-<size>.<format>``. Keying them by the
+content hash means identical images share renditions and a re-upload never
+needs re-rendering. They are served through the permission-checked
+``document_preview`` and ``profile_picture_preview`` views, never straight
+from ``MEDIA_URL``.
+"""
+import os
+
+from django.conf import settings
+from django.urls import reverse
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+PREVIEW_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+
+
+def is_image(name):
+    return os.path.splitext(name or '')[1].lower() in IMAGE_EXTENSIONS
+
+
+def preview_name(sha256, size, fmt):
+    return f'previews/{sha256[:2]}/{sha256}-{size}.{fmt}'
+
+
+def preview_url(obj, size, fmt='webp'):
+    """URL of a rendition of a document or profile picture"""
+    if hasattr(obj, 'picture_sha256'):
+        return reverse('profile_picture_preview', args=[obj.user_id, size, fmt])
+    return reverse('document_preview', args=[obj.pk, size, fmt])
+
+
+def render_previews(source_path, sha256, media_root, sizes):
+    """Render every size/format rendition of one image.
+
+    Runs inside a worker process, so it only takes and returns plain values.
+    Existing renditions are left alone. Returns the number of files written.
+    """
+    from PIL import Image, ImageOps
+
+    targets = [
+        (label, edge, fmt)
+        for label, edge in sizes.items()
+        for fmt in PREVIEW_FORMATS
+        if not os.path.exists(os.path.join(media_root, preview_name(sha256, label, fmt)))
+    ]
+    if not targets:
+        return 0
+
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+        for label, edge, fmt in targets:
+            rendition = image.copy()
+            rendition.thumbnail((edge, edge), Image.LANCZOS)
+            if fmt == 'jpg' and rendition.mode != 'RGB':
+                background = Image.new('RGB', rendition.size, (255, 255, 255))
+                background.paste(rendition, mask=rendition.getchannel('A'))
+                rendition = background
+            path = os.path.join(media_root, preview_name(sha256, label, fmt))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            tmp_path = f'{path}.tmp{os.getpid()}'
+            rendition.save(tmp_path, PREVIEW_FORMATS[fmt], quality=80, optimize=True)
+            os.replace(tmp_path, path)
+    return len(targets)
+
+
+def preview_sizes():
+    return getattr(settings, 'PREVIEW_SIZES', {'sm': 160, 'md': 480})
@@ -0,0 +1,260 @@
+"""Pivot reports over initiatives and tasks.
+
+A report is a subject (``initiatives`` or ``tasks``), up to three dimensions
+and any number of measures. It compiles to one ``GROUP BY`` query. Subtotals
+for every leading subset of the dimensions and the grand total are rolled up
+in Python from those groups, like SQL's ``ROLLUP``. Each measure is built
+from additive parts (sums and counts), so an average subtotal is the true
+average of its rows, not an average of averages.
+
+Reports cover archived initiatives and tasks too: the same query runs on
+the archive tables and its groups are merged into the live ones before the
+roll-up.
+
+Results are cached under the report spec, the viewer's scope and a change
+stamp of the scoped rows, so repeated slices cost one cheap aggregate.
+"""
+import hashlib
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim, TruncMonth
+from django.utils import timezone
+
+from .fragments import change_stamp
+from .models import Initiative, InitiativeArchive, Task, TaskArchive
+
+MAX_DIMENSIONS = 3
+OPEN_STATUSES = ['not_started', 'in_progress']
+
+
+class ReportError(ValueError):
+    """Raised for a report spec naming unknown dimensions or measures."""
+
+
+class Dimension:
+    def __init__(self, label, expression, choices=None, fmt=None):
+        self.label = label
+        self.expression = F(expression) if isinstance(expression, str) else expression
+        self.choices = dict(choices or ())
+        self.fmt = fmt
+
+    def display(self, value):
+        if value is None:
+            return '(none)'
+        if self.fmt:
+            return value.strftime(self.fmt)
+        return str(self.choices.get(value, value))
+
+
+class Measure:
+    """A measure computed from additive ``parts``; ``ratio`` names a (sum, count) pair."""
+
+    def __init__(self, label, parts, ratio=None):
+        self.label = label
+        self.parts = parts
+        self.ratio = ratio
+
+    def value(self, totals):
+        if self.ratio:
+            total, n = (totals[part] for part in self.ratio)
+            return round(total / n, 1) if n else None
+        return totals[next(iter(self.parts))]
+
+
+def _full_name(prefix):
+    name = Trim(Concat(f'{prefix}__user__first_name', Value(' '), f'{prefix}__user__last_name'))
+    return Coalesce(NullIf(name, Value('')), f'{prefix}__user__username')
+
+
+def _per_initiative(aggregate, task_model=Task):
+    """A correlated per-initiative subquery over its tasks.
+
+    Aggregating these instead of joining tasks keeps budget sums from being
+    multiplied by the number of tasks.
+    """
+    tasks = task_model.objects.filter(initiative=OuterRef('pk')).order_by().values('initiative')
+    return Subquery(tasks.annotate(v=aggregate).values('v'), output_field=IntegerField())
+
+
+def _overdue():
+    return Q(due_date__lt=timezone.now(), status__in=OPEN_STATUSES)
+
+
+def _initiative_spec(archived=False):
+    task_model = TaskArchive if archived else Task
+    dimensions = {
+        'district': Dimension('District', 'district__name'),
+        'status': Dimension('Status', 'status', Initiative.STATUS_CHOICES),
+        'type': Dimension('Type', 'initiative_type', Initiative.TYPE_CHOICES),
+        'coordinator': Dimension('Coordinator', _full_name('coordinator')),
+        'month': Dimension('Start month', TruncMonth('start_date'), fmt='%Y-%m'),
+    }
+    measures = {
+        'count': Measure('Initiatives', {'n': Count('pk')}),
+        'budget': Measure('Budget', {'budget': Sum('budget')}),
+        # Task-weighted, so subtotals stay exact
+        'avg_progress': Measure('Avg. progress %', {
+            'progress': Sum(_per_initiative(Sum('progress_percentage'), task_model)),
+            'task_n': Sum(_per_initiative(Count('pk'), task_model)),
+        }, ratio=('progress', 'task_n')),
+        'overdue': Measure('Overdue tasks', {
+            'overdue': Sum(_per_initiative(Count('pk', filter=_overdue()), task_model)),
+        }),
+    }
+    return dimensions, measures
+
+
+def _task_spec(archived=False):
+    dimensions = {
+        'district': Dimension('District', 'initiative__district__name'),
+        'status': Dimension('Status', 'status', Task.STATUS_CHOICES),
+        'type': Dimension('Initiative type', 'initiative__initiative_type', Initiative.TYPE_CHOICES),
+        'priority': Dimension('Priority', 'priority', Task.PRIORITY_CHOICES),
+        'coordinator': Dimension('Assigned to', _full_name('assigned_to')),
+        'month': Dimension('Due month', TruncMonth('due_date'), fmt='%Y-%m'),
+    }
+    measures = {
+        'count': Measure('Tasks', {'n': Count('pk')}),
+        'avg_progress': Measure('Avg. progress %', {
+            'progress': Sum('progress_percentage'), 'task_n': Count('pk'),
+        }, ratio=('progress', 'task_n')),
+        'overdue': Measure('Overdue', {'overdue': Count('pk', filter=_overdue())}),
+    }
+    return dimensions, measures
+
+
+SUBJECTS = {
+    'initiatives': (_initiative_spec, ['district', 'status'], ['count', 'budget', 'avg_progress', 'overdue']),
+    'tasks': (_task_spec, ['district', 'status'], ['count', 'avg_progress', 'overdue']),
+}
+
+
+def subject_options(subject):
+    """Return ``(dimensions, measures)`` as ``[(name, label)]`` for the report form."""
+    dimensions, measures = SUBJECTS[subject][0]()
+    return (
+        [(name, d.label) for name, d in dimensions.items()],
+        [(name, m.label) for name, m in measures.items()],
+    )
+
+
+def scoped_queryset(subject, user_profile, archived=False):
+    if subject == 'initiatives':
+        queryset = (InitiativeArchive if archived else Initiative).objects.all()
+        return queryset if user_profile.role == 'admin' else queryset.filter(district_id=user_profile.district_id)
+    queryset = (TaskArchive if archived else Task).objects.all()
+    return queryset if user_profile.role == 'admin' else queryset.filter(initiative__district_id=user_profile.district_id)
+
+
+def data_version(subject, queryset):
+    """A stamp that changes whenever any row the report reads changes."""
+    if subject == 'initiatives':
+        return change_stamp(
+            queryset, task_n=Count('tasks', distinct=True), last_task=Max('tasks__updated_at'),
+            overdue=Count('tasks', filter=Q(tasks__due_date__lt=timezone.now(), tasks__status__in=OPEN_STATUSES), distinct=True),
+        )
+    return change_stamp(queryset, last_initiative=Max('initiative__updated_at'), overdue=Count('pk', filter=_overdue()))
+
+
+def build_report(subject, user_profile, dimensions=None, measures=None):
+    """Run (or fetch from cache) a report and return it as a dict.
+
+    ``rows`` lists detail rows with their subtotals after each group and the
+    grand total last. ``level`` is the number of dimensions a row is grouped
+    by, so detail rows have ``level == len(dimensions)``.
+    """
+    if subject not in SUBJECTS:
+        raise ReportError(f'Unknown report "{subject}"')
+    spec, default_dimensions, default_measures = SUBJECTS[subject]
+    all_dimensions, all_measures = spec()
+    dimensions = list(dict.fromkeys(dimensions or default_dimensions))
+    measures = list(dict.fromkeys(measures or default_measures))
+    unknown = [name for name in dimensions if name not in all_dimensions]
+    unknown += [name for name in measures if name not in all_measures]
+    if unknown:
+        raise ReportError(f'Unknown report fields: {", ".join(unknown)}')
+    if len(dimensions) > MAX_DIMENSIONS:
+        raise ReportError(f'At most {MAX_DIMENSIONS} dimensions are supported')
+
+    queryset = scoped_queryset(subject, user_profile)
+    archived_queryset = scoped_queryset(subject, user_profile, archived=True)
+    scope = 'all' if user_profile.role == 'admin' else f'district-{user_profile.district_id}'
+    # Archived rows never change in place, they only move in or out
+    archived_n = archived_queryset.count()
+    version = f'{data_version(subject, queryset)}-{archived_n}'
+    raw_key = f'{subject}|{",".join(dimensions)}|{",".join(measures)}|{scope}|{version}'
+    key = 'dashboard:report:' + hashlib.md5(raw_key.encode(), usedforsecurity=False).hexdigest()
+    report = cache.get(key)
+    if report is None:
+        groups = list(_groups(queryset, [all_dimensions[n] for n in dimensions], [all_measures[n] for n in measures]))
+        if archived_n:
+            archived_dimensions, archived_measures = spec(archived=True)
+            groups += _groups(
+                archived_queryset, [archived_dimensions[n] for n in dimensions], [archived_measures[n] for n in measures],
+            )
+        report = _run(groups, [all_dimensions[n] for n in dimensions], [all_measures[n] for n in measures])
+        report.update(subject=subject, dimension_names=dimensions, measure_names=measures)
+        cache.set(key, report, getattr(settings, 'REPORT_CACHE_TIMEOUT', 3600))
+    return report
+
+
+def _groups(queryset, dimensions, measures):
+    """Yield ``(key, parts)`` for each group of the report's ``GROUP BY``"""
+    keys = {f'd{i}': d.expression for i, d in enumerate(dimensions)}
+    parts = {}
+    for measure in measures:
+        parts.update(measure.parts)
+    # Meta.ordering would otherwise be added to the GROUP BY
+    for group in queryset.order_by().values(**keys).annotate(**parts):
+        yield tuple(group[k] for k in keys), {p: group[p] or 0 for p in parts}
+
+
+def _run(groups, dimensions, measures):
+    parts = {}
+    for measure in measures:
+        parts.update(measure.parts)
+    # The same key can come from the live and the archive tables
+    merged = {}
+    for key, row_parts in groups:
+        totals = merged.setdefault(key, dict.fromkeys(parts, 0))
+        for part, value in row_parts.items():
+            totals[part] += value
+    rows = sorted(merged.items(), key=lambda row: tuple((v is None, v) for v in row[0]))
+
+    def emit(key, totals, level):
+        return {
+            'keys': [d.display(v) for d, v in zip(dimensions, key[:level])] + (
+                ['Total'] + [''] * (len(dimensions) - level - 1) if level < len(dimensions) else []
+            ),
+            'level': level,
+            'values': [m.value(totals) for m in measures],
+        }
+
+    def add(rows):
+        totals = dict.fromkeys(parts, 0)
+        for _, row_parts in rows:
+            for part, value in row_parts.items():
+                totals[part] += value
+        return totals
+
+    def rollup(rows, depth):
+        if depth == len(dimensions):
+            for key, totals in rows:
+                yield emit(key, totals, depth)
+            return
+        for _, group in groupby(rows, key=lambda row: row[0][depth]):
+            group = list(group)
+            yield from rollup(group, depth + 1)
+            if depth + 1 < len(dimensions):
+                yield emit(group[0][0], add(group), depth + 1)
+
+    output = list(rollup(rows, 0))
+    output.append(emit((), add(rows), 0))
+    return {
+        'dimensions': [d.label for d in dimensions],
+        'measures': [m.label for m in measures],
+        'rows': output,
+    }
@@ -0,0 +1,98 @@
+"""Primary/replica database routing.
+
+Everything reads from and writes to ``default`` unless a view opts in with
+``@replica_reads``. Such views send their ORM reads to the replica named by
+``settings.DATABASE_REPLICA_ALIAS`` for safe requests, unless the user wrote
+something in the last ``REPLICA_LAG_TOLERANCE`` seconds. In that case they
+stay on the primary so they see their own changes.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_PIN_COOKIE = 'primary_pin'
+
+# Session and login state must never lag behind the write that created it
+PRIMARY_ONLY_APPS = {'sessions', 'auth', 'account', 'socialaccount', 'contenttypes'}
+
+_read_alias = ContextVar('dashboard_read_alias', default=None)
+
+
+def replica_alias():
+    """Return the configured replica alias, or None when running without one."""
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+def is_pinned_to_primary(request):
+    """True when the user wrote recently enough that the replica may be behind."""
+    try:
+        return float(request.COOKIES.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin_to_primary(request, response):
+    """Keep this browser's reads on the primary for the lag tolerance window."""
+    tolerance = getattr(settings, 'REPLICA_LAG_TOLERANCE', 10)
+    response.set_cookie(
+        PRIMARY_PIN_COOKIE, f'{time.time() + tolerance:.0f}', max_age=tolerance,
+        httponly=True, samesite='Lax', secure=request.is_secure(),
+    )
+
+
+def replica_reads(view_func):
+    """Route the view's reads to the replica for safe, unpinned requests.
+
+    Work done after the view returns (e.g. iterating a streaming response)
+    falls back to the primary.
+    """
+    def _alias_for(request):
+        alias = replica_alias()
+        if alias is None or request.method not in ('GET', 'HEAD') or is_pinned_to_primary(request):
+            return None
+        return alias
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped(request, *args, **kwargs):
+            # The async ORM's worker threads inherit this context
+            token = _read_alias.set(_alias_for(request))
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+    else:
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            token = _read_alias.set(_alias_for(request))
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+    return _wrapped
+
+
+class PrimaryReplicaRouter:
+    """Send hinted reads to the replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so objects from either relate
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica's schema arrives with its snapshot
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,114 @@
+"""Hand protected file transfers to the front-end server.
+
+``DOCUMENT_SERVE_MODE`` selects how the bytes leave the building once a view
+has checked permissions:
+
+* ``'nginx'``: an ``X-Accel-Redirect`` to ``DOCUMENT_ACCEL_PREFIX`` + the
+  storage name; the prefix must be an ``internal`` location aliasing
+  ``MEDIA_ROOT``.
+* ``'apache'``: an ``X-Sendfile`` header carrying the absolute path
+  (mod_xsendfile).
+* ``'django'`` (default): Django answers itself. Whole files go through
+  ``FileResponse`` so the WSGI server's ``wsgi.file_wrapper`` can use
+  ``sendfile``; single byte ranges are streamed in fixed-size blocks.
+
+In every mode the front-end server or Django honours Range and If-Range, so
+resumed downloads do not start over.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` (inclusive) for a single satisfiable range,
+    ``None`` when the header should be ignored, or ``False`` when it cannot
+    be satisfied"""
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        # Absent, malformed or multi-range: serve the whole file
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a Range request may be answered partially (RFC 9110 13.1.5)"""
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    if validator.startswith('"') or validator.startswith('W/'):
+        return validator == etag
+    return parse_http_date_safe(validator) == last_modified
+
+
+def _iter_range(path, start, length):
+    with open(path, 'rb') as source:
+        source.seek(start)
+        while length > 0:
+            data = source.read(min(BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def serve_file(request, path, name, filename, etag=None, as_attachment=True):
+    """Serve the file at ``path`` (storage name ``name``) after the caller
+    has checked permissions"""
+    mode = getattr(settings, 'DOCUMENT_SERVE_MODE', 'django')
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if mode in ('nginx', 'apache'):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'nginx':
+            prefix = getattr(settings, 'DOCUMENT_ACCEL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = quote(prefix + name)
+        else:
+            response['X-Sendfile'] = path
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        return response
+
+    stat = os.stat(path)
+    size, last_modified = stat.st_size, int(stat.st_mtime)
+    etag = etag or f'"{last_modified:x}-{size:x}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = parse_range(request.headers.get('Range'), size)
+        if byte_range is not None and not if_range_matches(request, etag, last_modified):
+            byte_range = None
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(_iter_range(path, start, end - start + 1), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
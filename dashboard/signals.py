@@ -0,0 +1,199 @@
+from collections import Counter, defaultdict
+
+from django.contrib.auth.models import User
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.utils import timezone
+
+from . import auth_cache, sync
+from .middleware import get_current_request
+from .models import District, UserProfile, Initiative, Task, Note, Document, InitiativeSheet, Event, Activity, Blob, Tombstone
+
+
+def _initiative_district_id(instance):
+    return instance.initiative.district_id if instance.initiative_id else None
+
+
+# model -> (object_type, label, district_id getter, owner field, title getter)
+ACTIVITY_SOURCES = {
+    District: ('district', 'District', lambda o: o.pk, None, lambda o: o.name),
+    UserProfile: ('profile', 'Profile', lambda o: o.district_id, None, lambda o: o.user.get_full_name() or o.user.username),
+    Initiative: ('initiative', 'Initiative', lambda o: o.district_id, 'coordinator', lambda o: o.title),
+    Task: ('task', 'Task', _initiative_district_id, 'assigned_to', lambda o: o.title),
+    Note: ('note', 'Note', _initiative_district_id, 'author', lambda o: o.title),
+    Document: ('document', 'Document', _initiative_district_id, 'uploaded_by', lambda o: o.title),
+    InitiativeSheet: ('sheet', 'Sheet link', _initiative_district_id, 'coordinator', lambda o: o.initiative.title),
+    Event: ('event', 'Event', _initiative_district_id, 'organizer', lambda o: o.title),
+}
+
+
+def _actor(instance, owner_field):
+    """Prefer the logged-in user of the current request; fall back to the
+    profile that owns the object (management commands, shell)"""
+    request = get_current_request()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        profile = getattr(user, 'profile', None)
+        if profile is not None:
+            return profile, user.get_full_name() or user.username
+    if owner_field and getattr(instance, f'{owner_field}_id', None):
+        profile = getattr(instance, owner_field)
+        return profile, profile.user.get_full_name() or profile.user.username
+    return None, ''
+
+
+def build_activity(instance, verb):
+    """Return an unsaved Activity describing ``verb`` on ``instance``"""
+    object_type, label, district_id, owner_field, title = ACTIVITY_SOURCES[type(instance)]
+    actor, actor_name = _actor(instance, owner_field)
+    summary = f'{label} {verb}: {title(instance)}'
+    if isinstance(instance, Task) and verb == 'updated':
+        summary = f'{summary} ({instance.get_status_display()}, {instance.progress_percentage}%)'
+    return Activity(
+        district_id=district_id(instance),
+        actor=actor,
+        actor_name=actor_name,
+        verb=verb,
+        object_type=object_type,
+        object_id=instance.pk,
+        summary=summary[:255],
+    )
+
+
+def record_activity(sender, instance, created=None, raw=False, **kwargs):
+    if raw:
+        return
+    verb = 'deleted' if created is None else ('created' if created else 'updated')
+    build_activity(instance, verb).save()
+
+
+for model in ACTIVITY_SOURCES:
+    post_save.connect(record_activity, sender=model, dispatch_uid=f'activity_save_{model.__name__}')
+    post_delete.connect(record_activity, sender=model, dispatch_uid=f'activity_delete_{model.__name__}')
+
+
+def bury_deleted(sender, instance, **kwargs):
+    """Leave a tombstone so sync clients drop their copy"""
+    Tombstone.objects.create(
+        object_type=sync.OBJECT_TYPES[sender], object_id=instance.pk, district_id=ACTIVITY_SOURCES[sender][2](instance),
+    )
+
+
+def bury_moved(sender, instance, raw=False, **kwargs):
+    """Leave a tombstone in the old district of a row moved to another one,
+    while the database still has it there"""
+    previous = getattr(instance, '_loaded_location', None)
+    current = instance.__dict__.get(sender.location_field)
+    if not raw and previous is not None and previous != current:
+        if sender is Initiative:
+            sync.bury_initiatives([instance.pk], moved=True)
+        else:
+            new_district = Initiative.objects.filter(pk=current).values('district_id')
+            sync.bury(sender.objects.filter(pk=instance.pk).exclude(initiative__district_id__in=new_district), moved=True)
+    instance._loaded_location = current
+
+
+for model in sync.OBJECT_TYPES:
+    post_delete.connect(bury_deleted, sender=model, dispatch_uid=f'tombstone_{model.__name__}')
+    pre_save.connect(bury_moved, sender=model, dispatch_uid=f'tombstone_move_{model.__name__}')
+
+
+def track_document_blob(sender, instance, raw=False, **kwargs):
+    """Move the blob reference when a document gets new content"""
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_sha256', '')
+    if instance.sha256 != previous:
+        if instance.sha256:
+            Blob.objects.acquire(instance.sha256, instance.file.name, instance.file_size)
+        if previous:
+            Blob.objects.release(previous)
+        instance._loaded_sha256 = instance.sha256
+
+
+def release_document_blob(sender, instance, **kwargs):
+    if instance.sha256:
+        Blob.objects.release(instance.sha256)
+
+
+post_save.connect(track_document_blob, sender=Document, dispatch_uid='document_blob_save')
+post_delete.connect(release_document_blob, sender=Document, dispatch_uid='document_blob_delete')
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Make the affected users reload their session snapshot"""
+    if sender is User:
+        auth_cache.invalidate(instance.pk)
+    elif sender is UserProfile:
+        auth_cache.invalidate(instance.user_id)
+    else:
+        auth_cache.invalidate(*UserProfile.objects.filter(district=instance).values_list('user_id', flat=True))
+
+
+for model in (User, UserProfile, District):
+    post_save.connect(invalidate_cached_user, sender=model, dispatch_uid=f'auth_cache_save_{model.__name__}')
+    # pre_delete: a district's profiles are detached before post_delete fires
+    pre_delete.connect(invalidate_cached_user, sender=model, dispatch_uid=f'auth_cache_delete_{model.__name__}')
+
+
+# model -> Initiative counter each row adds one to
+COUNTED_MODELS = {Task: 'tasks_count', Note: 'notes_count', Document: 'documents_count'}
+
+
+def _contribution(model, counted, sign=1):
+    """Counter deltas for a row whose ``counted_fields`` hold ``counted``"""
+    initiative_id, status = (tuple(counted) + (None,))[:2]
+    deltas = Counter()
+    if initiative_id:
+        deltas[initiative_id, COUNTED_MODELS[model]] += sign
+        if status == 'completed':
+            deltas[initiative_id, 'completed_tasks_count'] += sign
+    return deltas
+
+
+def _apply_counter_deltas(deltas):
+    updates = defaultdict(dict)
+    for (initiative_id, field), delta in deltas.items():
+        if delta:
+            updates[initiative_id][field] = F(field) + delta
+    # Stamped so sync clients and the cached cards pick up the new counts
+    now = timezone.now()
+    for initiative_id, fields in updates.items():
+        Initiative.objects.filter(pk=initiative_id).update(updated_at=now, **fields)
+
+
+def _counted(instance):
+    return tuple(getattr(instance, field) for field in type(instance).counted_fields)
+
+
+def count_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Move the initiative counters when a row is added, moved or (for tasks)
+    completed or reopened"""
+    if raw:
+        return
+    if update_fields is not None and not {f.removesuffix('_id') for f in sender.counted_fields} & set(update_fields):
+        return
+    current = _counted(instance)
+    if created:
+        _apply_counter_deltas(_contribution(sender, current))
+    elif hasattr(instance, '_counted'):
+        if instance._counted != current:
+            deltas = _contribution(sender, current)
+            deltas.update(_contribution(sender, instance._counted, sign=-1))
+            _apply_counter_deltas(deltas)
+    else:
+        # Built by hand rather than loaded, so its previous state is unknown
+        Initiative.objects.filter(pk=instance.initiative_id).refresh_counters()
+    instance._counted = current
+
+
+def count_on_delete(sender, instance, origin=None, **kwargs):
+    # Rows removed along with their initiative have no counters left to update
+    if isinstance(origin, Initiative) or (isinstance(origin, QuerySet) and origin.model is Initiative):
+        return
+    _apply_counter_deltas(_contribution(sender, getattr(instance, '_counted', None) or _counted(instance), sign=-1))
+
+
+for model in COUNTED_MODELS:
+    post_save.connect(count_on_save, sender=model, dispatch_uid=f'initiative_counters_save_{model.__name__}')
+    post_delete.connect(count_on_delete, sender=model, dispatch_uid=f'initiative_counters_delete_{model.__name__}')
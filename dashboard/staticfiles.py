@@ -0,0 +1,241 @@
+"""Production static files: hashed names, minified and precompressed.
+
+``collectstatic`` with ``CompressedManifestStaticFilesStorage`` lets the
+manifest storage copy every file to ``name.<md5>.ext``, then minifies the CSS
+and JavaScript (comments and whitespace only, never inside string, template
+or regex literals) and writes ``.gz`` and (when the optional ``brotli`` package is
+installed) ``.br`` siblings next to each compressible file. The hash is taken
+from the source file, so it still changes exactly when the output does. A hashed URL's content can never change, so ``serve_static`` (or the
+front-end server, see SETUP.md) marks those responses immutable. Browsers
+then never revalidate them; repeat page loads fetch no static bytes.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # optional: gzip alone still covers every browser
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.map', '.txt', '.json', '.html', '.xml', '.ico')
+# Below this, compression saves less than the Content-Encoding header costs
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE = 'public, max-age=31536000, immutable'
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+# Strings first, so comment markers and spacing inside them are never touched
+_CSS_TOKEN_RE = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')|/\*.*?\*/', re.S)
+# Not ':' - a space before it is a descendant combinator ('.nav :hover')
+_CSS_SPACE_RE = re.compile(r'\s*([{};,])\s*')
+# A '/' after one of these (or at the start) opens a regex literal, not a division
+_JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_JS_REGEX_KEYWORDS = {
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'instanceof', 'new', 'void', 'delete', 'throw', 'yield', 'await',
+}
+
+
+def _squeeze_css(text):
+    text = _CSS_SPACE_RE.sub(r'\1', text)
+    return re.sub(r'\s+', ' ', text).replace(';}', '}')
+
+
+def minify_css(source):
+    """Drop comments and collapse whitespace outside quoted strings."""
+    parts, text, pos = [], '', 0
+    for match in _CSS_TOKEN_RE.finditer(source):
+        text += source[pos:match.start()]
+        if match.group(1):
+            parts += [_squeeze_css(text), match.group(1)]
+            text = ''
+        pos = match.end()
+    parts.append(_squeeze_css(text + source[pos:]))
+    return ''.join(parts).replace(';}', '}').strip()
+
+
+def _skip_quoted(source, i, quote):
+    """Index just past the string or regex body opened at ``i``"""
+    i += 1
+    in_class = False
+    while i < len(source) and source[i] != '\n':
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if quote == '/' and char in '[]':
+            in_class = char == '['
+        elif char == quote and not in_class:
+            return i + 1
+        i += 1
+    return i
+
+
+def _regex_allowed(source, i, last):
+    if last == '' or last in _JS_REGEX_AFTER:
+        return True
+    word = re.search(r'([A-Za-z_$][\w$]*)\s*$', source[max(0, i - 20):i])
+    return bool(word) and word.group(1) in _JS_REGEX_KEYWORDS
+
+
+def minify_js(source):
+    """Conservative JavaScript minification with a small tokenizer.
+
+    Comments and indentation are removed only outside string, template and
+    regex literals, which are copied as written. Newlines are kept (a comment
+    spanning lines becomes one), so automatic semicolon insertion is
+    unaffected.
+    """
+    out = []
+    templates = []  # brace depth of the code around each open ``${``
+    braces = 0
+    last = ''  # last significant code character
+    in_template = False
+    i, n = 0, len(source)
+    while i < n:
+        char = source[i]
+        if in_template:
+            start = i
+            while i < n and source[i] != '`' and not source.startswith('${', i):
+                i += 2 if source[i] == '\\' else 1
+            if source.startswith('${', i):
+                out.append(source[start:i + 2])
+                templates.append(braces)
+                braces, last, in_template = 0, '{', False
+                i += 2
+            else:
+                out.append(source[start:i + 1])
+                last, in_template = '`', False
+                i += 1
+            continue
+        if char == '`':
+            out.append(char)
+            in_template = True
+            i += 1
+        elif char in '\'"':
+            end = _skip_quoted(source, i, char)
+            out.append(source[i:end])
+            last, i = char, end
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end < 0 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            out.append('\n' if '\n' in source[i:end] else ' ')
+            i = end
+        elif char == '/' and _regex_allowed(source, i, last):
+            end = _skip_quoted(source, i, '/')
+            out.append(source[i:end])
+            last, i = '/', end
+        elif char == '\n':
+            while out and out[-1] in (' ', '\t'):
+                out.pop()
+            if out and not out[-1].endswith('\n'):
+                out.append('\n')
+            i += 1
+            while i < n and source[i] in ' \t':
+                i += 1
+        else:
+            if char == '}' and braces == 0 and templates:
+                # End of a ``${...}``: back inside the template literal
+                braces = templates.pop()
+                in_template = True
+            elif char == '{':
+                braces += 1
+            elif char == '}':
+                braces -= 1
+            out.append(char)
+            if not char.isspace():
+                last = char
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def write_compressed_variants(path):
+    """Write ``path.gz`` (and ``path.br``) unless compression does not pay."""
+    with open(path, 'rb') as source:
+        data = source.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that minifies and precompresses what it collected."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in set(paths) | set(self.hashed_files.values()):
+            path = self.path(name)
+            minify = MINIFIERS.get(os.path.splitext(name)[1])
+            # Both minifiers are idempotent, so re-running collectstatic is safe
+            if minify and not name.endswith(('.min.js', '.min.css')):
+                with open(path, encoding='utf-8') as source:
+                    minified = minify(source.read())
+                with open(path, 'w', encoding='utf-8') as target:
+                    target.write(minified)
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                write_compressed_variants(path)
+
+
+def _accepts(request, coding):
+    return any(part.split(';')[0].strip() == coding for part in request.headers.get('Accept-Encoding', '').split(','))
+
+
+def serve_static(request, path):
+    """Serve a collected static file, preferring its precompressed variant.
+
+    Used in production when no front-end server sits in front of Django.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404('Invalid path')
+    if not os.path.isfile(full_path):
+        raise Http404(f'"{path}" does not exist')
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    encoding = None
+    for coding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if _accepts(request, coding) and os.path.isfile(full_path + suffix):
+            encoding, full_path = coding, full_path + suffix
+            break
+
+    stat = os.stat(full_path)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if HASHED_NAME_RE.search(path):
+        response['Cache-Control'] = IMMUTABLE
+    else:
+        # Unhashed aliases (e.g. css/style.css) must be revalidated
+        response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,99 @@
+"""Content-addressed storage for uploaded documents.
+
+Uploads are hashed with SHA-256 while the chunks arrive (see the upload
+handlers below), then stored once under ``<upload_to>/blobs/<aa>/<digest>``.
+A second upload of the same bytes resolves to the existing blob and skips the
+write entirely, whatever it is called; ``Blob`` rows reference-count each
+digest across documents. The name a file was uploaded under is kept in
+``Document.original_name``, so file types are told by that
+(``extension_filter``). Documents stored before hashing are brought in by
+``manage.py backfill_blobs``.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage, storages
+from django.db.models import Q
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+def file_digest(content):
+    """Return the SHA-256 hex digest of ``content``.
+
+    Uses the digest computed by the upload handlers when available, otherwise
+    streams the file once and remembers the result on the object.
+    """
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    content.sha256 = hasher.hexdigest()
+    return content.sha256
+
+
+def blob_name(directory, digest):
+    """Storage name of the blob for ``digest``"""
+    return os.path.join(directory, 'blobs', digest[:2], digest)
+
+
+def extension_filter(extensions):
+    """Q for documents uploaded with one of ``extensions``; documents from
+    before ``original_name`` was recorded still have it in their file name"""
+    q = Q()
+    for extension in extensions:
+        q |= Q(original_name__iendswith=extension) | Q(original_name='', file__iendswith=extension)
+    return q
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by the SHA-256 of their content"""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save; identical
+        # content maps to the identical name, so there is nothing to avoid.
+        return name
+
+    def _save(self, name, content):
+        target = blob_name(os.path.dirname(name), file_digest(content))
+        if self.exists(target):
+            return target
+        return super()._save(target, content)
+
+
+def document_storage():
+    return storages['documents']
+
+
+class HashingUploadHandlerMixin:
+    """Hash each uploaded file incrementally as its chunks are received"""
+
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            # This handler consumed the chunk
+            self.hasher.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.hasher.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
@@ -0,0 +1,159 @@
+"""Incremental sync of initiatives, tasks, notes and events for offline clients.
+
+A client keeps a local copy and sends back the cursor of its last response.
+It gets the rows of its scope changed since then, in ``(updated_at, id)``
+order (read from the ``*_sync`` indexes), and the ids of rows that left the
+live tables or its district since then, from ``Tombstone``. The cursor is one keyset position
+per stream. A response holds at most ``limit`` rows per stream, and
+``has_more`` tells the client to ask again straight away.
+
+Rows changed in the last ``SETTLE`` are held back to the next request, so a
+transaction that commits a little after stamping its rows is not skipped.
+Tombstones are kept for ``settings.SYNC_TOMBSTONE_DAYS``. A client that has
+not synced for that long gets ``reset`` and a sync from scratch. Rows moved to
+another district get a ``moved`` tombstone in the old one, which admins skip,
+and restored archive rows lose their tombstones and are stamped as changed.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q, Value
+from django.utils import timezone
+
+from .db import insert_select
+from .models import Event, Initiative, Note, Task, Tombstone
+
+# response key -> (model, tombstone object_type)
+STREAMS = {
+    'initiatives': (Initiative, 'initiative'),
+    'tasks': (Task, 'task'),
+    'notes': (Note, 'note'),
+    'events': (Event, 'event'),
+}
+OBJECT_TYPES = {model: object_type for model, object_type in STREAMS.values()}
+SETTLE = timedelta(seconds=2)
+
+
+def _district_field(model):
+    return 'district_id' if model is Initiative else 'initiative__district_id'
+
+
+def _fields(model):
+    # The summary is derived from the text the client already gets
+    return [f.attname for f in model._meta.concrete_fields if f.attname != 'summary']
+
+
+def scoped(model, profile):
+    """Synced rows of ``model`` visible to ``profile``, as in the list views"""
+    if profile.role == 'admin':
+        return model.objects.all()
+    return model.objects.filter(**{_district_field(model): profile.district_id})
+
+
+def _filed_under(model, initiative_ids):
+    return model.objects.filter(**{'pk__in' if model is Initiative else 'initiative_id__in': initiative_ids})
+
+
+def bury(rows, moved=False):
+    """Record tombstones for ``rows`` of a synced model before they are removed,
+    or, with ``moved``, before they leave their district"""
+    insert_select(Tombstone, ['object_type', 'object_id', 'district_id', 'moved', 'deleted_at'], rows.values_list(
+        Value(OBJECT_TYPES[rows.model]), 'pk', _district_field(rows.model), Value(moved), Value(timezone.now()),
+    ))
+
+
+def bury_initiatives(initiative_ids, moved=False):
+    """``bury`` initiatives and the synced rows filed under them"""
+    for model in OBJECT_TYPES:
+        bury(_filed_under(model, initiative_ids), moved)
+
+
+def revive_initiatives(initiative_ids):
+    """Send restored initiatives and their rows to clients again: drop their
+    tombstones and stamp them as changed"""
+    now = timezone.now()
+    for model, object_type in OBJECT_TYPES.items():
+        rows = _filed_under(model, initiative_ids)
+        Tombstone.objects.filter(object_type=object_type, object_id__in=rows.values('pk')).delete()
+        rows.update(updated_at=now)
+
+
+def encode_cursor(positions):
+    """Opaque cursor for ``[(stamp, pk) or None]``, one per stream plus tombstones"""
+    return '_'.join(
+        f"{int(stamp.timestamp()) * 1000000 + stamp.microsecond}.{pk}" if stamp else '0.0'
+        for stamp, pk in ((position or (None, 0)) for position in positions)
+    )
+
+
+def decode_cursor(cursor):
+    """Return the positions of a cursor, or None if it is missing or malformed"""
+    try:
+        parts = [tuple(int(value) for value in part.split('.')) for part in cursor.split('_')]
+        positions = [
+            (datetime.fromtimestamp(stamp // 1000000, tz=dt_timezone.utc).replace(microsecond=stamp % 1000000), pk)
+            if stamp else None
+            for stamp, pk in parts
+        ]
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return None
+    return positions if len(positions) == len(STREAMS) + 1 and positions[-1] else None
+
+
+def _after(queryset, field, position):
+    if position is None:
+        return queryset
+    stamp, pk = position
+    return queryset.filter(Q(**{f'{field}__gt': stamp}) | Q(**{field: stamp, 'pk__gt': pk}))
+
+
+def changes(profile, cursor='', limit=None):
+    """Return the sync payload for ``profile`` from ``cursor``"""
+    limit = max(1, min(limit or settings.SYNC_PAGE_SIZE, settings.SYNC_PAGE_SIZE))
+    now = timezone.now()
+    until = now - SETTLE
+    positions = decode_cursor(cursor)
+    reset = bool(positions) and positions[-1][0] < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    if positions is None or reset:
+        # A fresh copy only needs the deletions that happen while it downloads
+        positions = [None] * len(STREAMS) + [(until, 0)]
+
+    payload = {'reset': reset, 'has_more': False}
+    for index, (key, (model, _)) in enumerate(STREAMS.items()):
+        rows = _after(scoped(model, profile).filter(updated_at__lt=until), 'updated_at', positions[index])
+        rows = list(rows.order_by('updated_at', 'id').values(*_fields(model))[:limit + 1])
+        if len(rows) > limit:
+            rows = rows[:limit]
+            payload['has_more'] = True
+        if rows:
+            positions[index] = (rows[-1]['updated_at'], rows[-1]['id'])
+        payload[key] = rows
+
+    tombstones = Tombstone.objects.filter(deleted_at__lt=until)
+    if profile.role == 'admin':
+        tombstones = tombstones.filter(moved=False)
+    else:
+        tombstones = tombstones.filter(district_id=profile.district_id)
+    tombstones = list(
+        _after(tombstones, 'deleted_at', positions[-1]).order_by('deleted_at', 'id')
+        .values_list('object_type', 'object_id', 'deleted_at', 'id')[:limit + 1]
+    )
+    if len(tombstones) > limit:
+        tombstones = tombstones[:limit]
+        payload['has_more'] = True
+        positions[-1] = tombstones[-1][2:]
+    else:
+        # Everything before ``until`` has been seen, deletions or not, so the
+        # cursor stays fresh and only goes stale when the client does
+        positions[-1] = (until, 0)
+    payload['deleted'] = {object_type: [] for _, object_type in STREAMS.values()}
+    for object_type, object_id, _, _ in tombstones:
+        payload['deleted'][object_type].append(object_id)
+
+    payload['cursor'] = encode_cursor(positions)
+    return payload
+
+
+def prune(days):
+    """Delete tombstones older than ``days``; returns the number removed"""
+    return Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()[0]
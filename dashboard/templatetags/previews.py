@@ -0,0 +1,31 @@
+from django import template
+from django.utils.html import format_html
+
+from dashboard.models import UserProfile
+from dashboard.previews import preview_url
+
+register = template.Library()
+
+
+def _preview_hash(obj):
+    if not obj or not getattr(obj, 'preview_ready', False):
+        return ''
+    return obj.picture_sha256 if isinstance(obj, UserProfile) else obj.sha256
+
+
+@register.simple_tag
+def preview_src(obj, size='sm', fmt='webp'):
+    """URL of a rendition, or '' while the preview worker has not run yet"""
+    return preview_url(obj, size, fmt) if _preview_hash(obj) else ''
+
+
+@register.simple_tag
+def preview_picture(obj, size='sm', alt='', css_class='', **attrs):
+    """<picture> element serving WebP with a JPEG fallback"""
+    if not _preview_hash(obj):
+        return ''
+    extra = format_html(''.join(f' {key.replace("_", "-")}="{{}}"' for key in attrs), *attrs.values())
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp"><img src="{}" alt="{}" class="{}" loading="lazy"{}></picture>',
+        preview_url(obj, size, 'webp'), preview_url(obj, size, 'jpg'), alt, css_class, extra,
+    )
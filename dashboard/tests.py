@@ -1,8 +1,33 @@
-from django.test import TestCase, Client
+import hashlib
+import zipfile
+import zlib
+import io
+import os
+from io import StringIO
+import shutil
+import sqlite3
+import tempfile
+import json
+import threading
+import time
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from unittest import mock
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import District, UserProfile, Initiative, Task
+from django.contrib.sessions.models import Session
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models import Count, Q
+from django.core.cache import cache
+from django.core.management import call_command
+from .models import District, UserProfile, Initiative, Task, Event, Note, Activity, ActivityArchive, Document, Blob, UploadSession, DocumentText, KpiSnapshot, DeletionJob, InitiativeSheet, InitiativeArchive, TaskArchive, NoteArchive, DocumentArchive, EventArchive, InitiativeSheetArchive, Tombstone
+from . import admin as dashboard_admin, api, archive, bulk, calendar_feeds, db, deletion, extraction, fragments, kpis, listapi, middleware, reports, routers, staticfiles, sync, views
 
 
 class AuthAndPermissionsTests(TestCase):
@@ -118,4 +143,1795 @@ class AuthAndPermissionsTests(TestCase):
         self.assertFalse(Task.objects.filter(pk=task.pk).exists())
 
 
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.district = District.objects.create(name="Jaffna")
+        self.other = District.objects.create(name="Mannar")
+        self.user = User.objects.create_user("coord", password="pw", first_name="Kavi")
+        self.profile = UserProfile.objects.create(user=self.user, role="coordinator", district=self.district)
+        self.initiative = Initiative.objects.create(
+            title="Code Club",
+            description="desc",
+            district=self.district,
+            coordinator=self.profile,
+            start_date=timezone.now().date(),
+        )
+        now = timezone.now()
+        Event.objects.create(
+            initiative=self.initiative,
+            title="Kickoff, day one",
+            start_datetime=now + timezone.timedelta(days=2),
+            end_datetime=now + timezone.timedelta(days=2, hours=1),
+            organizer=self.profile,
+        )
+        # Outside the feed window
+        Event.objects.create(
+            initiative=self.initiative,
+            title="Ancient history",
+            start_datetime=now - timezone.timedelta(days=400),
+            end_datetime=now - timezone.timedelta(days=400),
+            organizer=self.profile,
+        )
+        Task.objects.create(
+            title="Book venue",
+            description="d",
+            initiative=self.initiative,
+            assigned_to=self.profile,
+            created_by=self.profile,
+            due_date=now + timezone.timedelta(days=1),
+        )
+
+    def feed_url(self, scope, pk):
+        return reverse("calendar_feed", args=[calendar_feeds.make_feed_token(self.user, scope, pk)])
+
+    def test_district_feed_renders_window(self):
+        resp = self.client.get(self.feed_url("district", self.district.pk))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "text/calendar; charset=utf-8")
+        body = b"".join(resp.streaming_content).decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertIn("SUMMARY:Kickoff\\, day one", body)
+        self.assertIn("SUMMARY:Due: Book venue", body)
+        self.assertNotIn("Ancient history", body)
+
+    def test_repeat_poll_is_not_modified(self):
+        url = self.feed_url("user", self.profile.pk)
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp.status_code, 304)
+        # Any change in scope produces a new ETag
+        etag = resp["ETag"]
+        task = Task.objects.get()
+        task.title = "Book a bigger venue"
+        task.save()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_feed_scoping(self):
+        self.assertEqual(self.client.get(self.feed_url("district", self.other.pk)).status_code, 404)
+        self.assertEqual(self.client.get(reverse("calendar_feed", args=["forged"])).status_code, 404)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.feed_url("district", self.district.pk)).status_code, 404)
+
+
+class ActivityStreamTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.d1 = District.objects.create(name="Vavuniya")
+        self.d2 = District.objects.create(name="Kilinochchi")
+        self.user = User.objects.create_user("coord", password="pw")
+        self.profile = UserProfile.objects.create(user=self.user, role="coordinator", district=self.d1)
+        self.initiative = Initiative.objects.create(
+            title="Girls in ICT",
+            description="desc",
+            district=self.d1,
+            coordinator=self.profile,
+            start_date=timezone.now().date(),
+        )
+        self.task = Task.objects.create(
+            title="Plan workshop",
+            description="d",
+            initiative=self.initiative,
+            assigned_to=self.profile,
+            created_by=self.profile,
+            due_date=timezone.now() + timezone.timedelta(days=1),
+        )
+
+    def test_writes_are_recorded(self):
+        self.client.login(username="coord", password="pw")
+        self.client.post(reverse("update_task_status", args=[self.task.pk]), {"status": "in_progress", "progress": 40})
+        Note.objects.create(title="Minutes", content="c", initiative=self.initiative, author=self.profile)
+        self.task.delete()
+        summaries = list(Activity.objects.filter(district=self.d1).values_list("verb", "object_type"))
+        self.assertEqual(summaries[:3], [("deleted", "task"), ("created", "note"), ("updated", "task")])
+        update = Activity.objects.get(verb="updated", object_type="task")
+        self.assertEqual(update.actor, self.profile)
+        self.assertIn("In Progress, 40%", update.summary)
+
+    def test_timeline_keyset_pagination_and_scoping(self):
+        for i in range(25):
+            Note.objects.create(title=f"Note {i}", content="c", initiative=self.initiative, author=self.profile)
+        other = UserProfile.objects.create(user=User.objects.create_user("other"), district=self.d2)
+        Initiative.objects.create(
+            title="Hidden", description="d", district=self.d2, coordinator=other, start_date=timezone.now().date()
+        )
+        self.client.login(username="coord", password="pw")
+        resp = self.client.get(reverse("timeline"))
+        self.assertEqual(len(resp.context["activities"]), 20)
+        self.assertNotContains(resp, "Hidden")
+        resp = self.client.get(reverse("timeline"), {"before": resp.context["next_cursor"]})
+        # 25 notes plus the district, profile, initiative and task of setUp
+        self.assertEqual(len(resp.context["activities"]), 9)
+        self.assertIsNone(resp.context["next_cursor"])
+
+    def test_out_of_range_cursor_starts_from_the_top(self):
+        self.client.login(username="coord", password="pw")
+        for cursor in (f"{10 ** 40}.1", f"{-10 ** 20}.1", "1.x"):
+            resp = self.client.get(reverse("timeline"), {"before": cursor})
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.context["is_first_page"])
+
+    def test_archive_moves_old_rows(self):
+        Activity.objects.update(created_at=timezone.now() - timezone.timedelta(days=400))
+        Note.objects.create(title="Fresh", content="c", initiative=self.initiative, author=self.profile)
+        call_command("archive_activity", days=180, batch_size=1, stdout=StringIO())
+        self.assertEqual(Activity.objects.count(), 1)
+        self.assertEqual(ActivityArchive.objects.count(), 5)
+
+
+class DocumentTestMixin:
+    """Coordinator, initiative and a throwaway MEDIA_ROOT for upload tests"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = Client()
+        district = District.objects.create(name="Mullaitivu")
+        self.user = User.objects.create_user("coord", password="pw")
+        self.profile = UserProfile.objects.create(user=self.user, role="coordinator", district=district)
+        self.initiative = Initiative.objects.create(
+            title="Uki", description="d", district=district, coordinator=self.profile, start_date=timezone.now().date()
+        )
+
+    def upload(self, title, content=b"same bytes"):
+        return self.client.post(reverse("document_create"), {
+            "title": title,
+            "initiative": self.initiative.pk,
+            "file": SimpleUploadedFile(f"{title}.pdf", content, content_type="application/pdf"),
+        })
+
+
+class ContentAddressedDocumentTests(DocumentTestMixin, TestCase):
+    def test_duplicate_uploads_share_one_blob(self):
+        self.client.login(username="coord", password="pw")
+        self.assertEqual(self.upload("first").status_code, 302)
+        self.assertEqual(self.upload("second").status_code, 302)
+        first, second = Document.objects.order_by("pk")
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(first.original_name, "first.pdf")
+        self.assertEqual(first.sha256, hashlib.sha256(b"same bytes").hexdigest())
+        self.assertEqual(first.file.name, f"documents/blobs/{first.sha256[:2]}/{first.sha256}")
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        blob_dir = os.path.join(self.media_root, "documents", "blobs", first.sha256[:2])
+        self.assertEqual(len(os.listdir(blob_dir)), 1)
+        # The digest alone names the blob, whatever the upload was called
+        Document.objects.create(
+            title="renamed", initiative=self.initiative, uploaded_by=self.profile,
+            file=SimpleUploadedFile("third.txt", b"same bytes"),
+        )
+        self.assertEqual((len(os.listdir(blob_dir)), Blob.objects.get().ref_count), (1, 3))
+
+    def test_backfill_hashes_legacy_documents(self):
+        os.makedirs(os.path.join(self.media_root, "documents"))
+        for name in ("old.pdf", "older.pdf"):
+            with open(os.path.join(self.media_root, "documents", name), "wb") as f:
+                f.write(b"legacy bytes")
+        Document.objects.bulk_create([  # as stored before hashing: no signals, no Blob rows
+            Document(title=name, file=f"documents/{name}", initiative=self.initiative, uploaded_by=self.profile)
+            for name in ("old.pdf", "older.pdf")
+        ])
+        out = StringIO()
+        call_command("backfill_blobs", "--dry-run", stdout=out)
+        self.assertIn("Would hash 2 documents", out.getvalue())
+        self.assertFalse(Blob.objects.exists())
+
+        call_command("backfill_blobs", stdout=StringIO())
+        sha256 = hashlib.sha256(b"legacy bytes").hexdigest()
+        self.assertEqual(set(Document.objects.values_list("sha256", "original_name", "file_size")), {
+            (sha256, "old.pdf", 12), (sha256, "older.pdf", 12),
+        })
+        blob = Blob.objects.get()
+        self.assertEqual((blob.pk, blob.ref_count, blob.name), (sha256, 2, "documents/old.pdf"))
+        out = StringIO()
+        call_command("backfill_blobs", stdout=out)
+        self.assertIn("Hashed 0 documents, created 0 blobs and corrected 0", out.getvalue())
+
+    def test_unreferenced_blobs_are_collected(self):
+        self.client.login(username="coord", password="pw")
+        self.upload("first")
+        self.upload("other", b"other bytes")
+        doc = Document.objects.get(title="first")
+        path = doc.file.path
+        doc.delete()
+        self.assertEqual(Blob.objects.get(pk=doc.sha256).ref_count, 0)
+        call_command("gc_blobs", grace_minutes=-1, stdout=StringIO())
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.filter(pk=doc.sha256).exists())
+        self.assertEqual(Blob.objects.count(), 1)
+        # Saving metadata again must not touch the reference count
+        other = Document.objects.get()
+        other.title = "renamed"
+        other.save()
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=4)
+class ChunkedUploadTests(DocumentTestMixin, TestCase):
+    payload = b"0123456789"
+
+    def init_upload(self, **extra):
+        data = {"title": "Budget", "initiative": self.initiative.pk, "filename": "budget.xlsx", "total_size": len(self.payload)}
+        data.update(extra)
+        return self.client.post(reverse("upload_init"), data)
+
+    def put(self, session_id, offset, data):
+        return self.client.put(
+            reverse("upload_chunk", args=[session_id]), data,
+            content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_interrupted_upload_resumes_and_finalizes(self):
+        self.client.login(username="coord", password="pw")
+        status = self.init_upload().json()
+        self.assertEqual((status["offset"], status["chunk_size"]), (0, 4))
+        # Chunks are capped at the advertised chunk size
+        self.assertEqual(self.put(status["id"], 0, self.payload).json()["offset"], 4)
+        # A retry of a stale chunk is rejected with the acknowledged offset
+        resp = self.put(status["id"], 0, self.payload[:4])
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()["offset"], 4)
+        # Finalizing early is refused
+        self.assertEqual(self.client.post(reverse("upload_finalize", args=[status["id"]])).status_code, 409)
+        offset = self.client.get(reverse("upload_chunk", args=[status["id"]])).json()["offset"]
+        while offset < len(self.payload):
+            offset = self.put(status["id"], offset, self.payload[offset:offset + 4]).json()["offset"]
+        resp = self.client.post(reverse("upload_finalize", args=[status["id"]]))
+        self.assertEqual(resp.status_code, 201)
+        document = Document.objects.get(pk=resp.json()["document"])
+        self.assertEqual(document.file_size, len(self.payload))
+        self.assertEqual(document.original_name, "budget.xlsx")
+        with document.file.open("rb") as stored:
+            self.assertEqual(stored.read(), self.payload)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "uploads", "partial", f"{status['id']}.part")))
+
+    def test_known_content_skips_the_transfer(self):
+        self.client.login(username="coord", password="pw")
+        self.upload("original", self.payload)
+        resp = self.init_upload(sha256=hashlib.sha256(self.payload).hexdigest())
+        self.assertEqual(resp.status_code, 201)
+        self.assertTrue(resp.json()["complete"])
+        self.assertEqual(Document.objects.count(), 2)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+
+    def test_known_content_elsewhere_still_needs_the_bytes(self):
+        self.client.login(username="coord", password="pw")
+        self.upload("original", self.payload)
+        outsider = User.objects.create_user("outsider", password="pw")
+        UserProfile.objects.create(user=outsider, role="coordinator", district=District.objects.create(name="Ampara"))
+        self.client.login(username="outsider", password="pw")
+        other = Initiative.objects.create(
+            title="Other", description="d", district=outsider.profile.district, coordinator=outsider.profile,
+            start_date=timezone.now().date(),
+        )
+        resp = self.init_upload(sha256=hashlib.sha256(self.payload).hexdigest(), initiative=other.pk)
+        self.assertEqual(resp.status_code, 201)
+        self.assertFalse(resp.json()["complete"])
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_sessions_are_private_and_validated(self):
+        self.client.login(username="coord", password="pw")
+        self.assertEqual(self.init_upload(filename="run.exe").status_code, 400)
+        session_id = self.init_upload().json()["id"]
+        User.objects.create_user("intruder", password="pw")
+        UserProfile.objects.create(user=User.objects.get(username="intruder"), role="coordinator")
+        self.client.login(username="intruder", password="pw")
+        self.assertEqual(self.put(session_id, 0, b"evil").status_code, 404)
+        self.assertEqual(UploadSession.objects.get().received, 0)
+
+
+class PreviewGenerationTests(DocumentTestMixin, TestCase):
+    def image_bytes(self, size=(1200, 800), fmt="PNG"):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGB", size, (200, 30, 30)).save(buffer, fmt)
+        return buffer.getvalue()
+
+    def test_worker_renders_shared_renditions(self):
+        self.client.login(username="coord", password="pw")
+        image = self.image_bytes()
+        for title in ("poster", "poster-copy"):
+            self.client.post(reverse("document_create"), {
+                "title": title,
+                "initiative": self.initiative.pk,
+                "file": SimpleUploadedFile(f"{title}.png", image, content_type="image/png"),
+            })
+        self.profile.profile_picture = SimpleUploadedFile("me.jpg", self.image_bytes((300, 300), "JPEG"))
+        self.profile.save()
+        self.assertFalse(Document.objects.filter(preview_ready=True).exists())
+
+        call_command("generate_previews", workers=1, stdout=StringIO())
+
+        self.assertEqual(Document.objects.filter(preview_ready=True).count(), 2)
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.preview_ready)
+        sha256 = Document.objects.first().sha256
+        from PIL import Image
+        with Image.open(os.path.join(self.media_root, "previews", sha256[:2], f"{sha256}-sm.webp")) as thumb:
+            self.assertEqual(thumb.size, (160, 107))
+        document = Document.objects.first()
+        url = reverse("document_preview", args=[document.pk, "sm", "webp"])
+        resp = self.client.get(reverse("documents_list"))
+        self.assertContains(resp, url)
+        self.assertNotContains(resp, "/media/previews/")
+        self.assertNotContains(resp, f'src="{document.file.url}"')
+        resp = self.client.get(url)
+        self.assertEqual((resp.status_code, resp["Content-Type"]), (200, "image/webp"))
+        self.assertEqual(self.client.get(reverse("document_preview", args=[document.pk, "xl", "webp"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("profile_picture_preview", args=[self.user.pk, "md", "jpg"])).status_code, 200)
+
+        # Outside the document's district the preview is not there
+        UserProfile.objects.create(user=User.objects.create_user("intruder", password="pw"), role="coordinator")
+        self.client.login(username="intruder", password="pw")
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(reverse("profile_picture_preview", args=[self.user.pk, "md", "jpg"])).status_code, 404)
+
+
+    def test_failed_render_is_not_retried_until_the_content_changes(self):
+        from dashboard.management.commands.generate_previews import Command
+        document = Document.objects.create(
+            title="broken", file=SimpleUploadedFile("broken.png", b"not an image"),
+            initiative=self.initiative, uploaded_by=self.profile,
+        )
+        with self.assertLogs("dashboard.management.commands.generate_previews", "ERROR"):
+            call_command("generate_previews", workers=1, stdout=StringIO())
+        document.refresh_from_db()
+        self.assertEqual((document.preview_ready, document.preview_failed), (False, True))
+        self.assertEqual(Command().pending_jobs(), {})
+
+        document.file = SimpleUploadedFile("fixed.png", self.image_bytes())
+        document.save()
+        self.assertFalse(Document.objects.get(pk=document.pk).preview_failed)
+        call_command("generate_previews", workers=1, stdout=StringIO())
+        self.assertTrue(Document.objects.get(pk=document.pk).preview_ready)
+
+def build_docx(paragraphs_by_page):
+    ns = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    pages = ["".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in page) for page in paragraphs_by_page]
+    body = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'.join(pages)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", f"<w:document {ns}><w:body>{body}</w:body></w:document>")
+    return buffer.getvalue()
+
+
+def build_xlsx():
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("xl/sharedStrings.xml", f"<sst {ns}><si><t>Budget</t></si><si><t>Laptops</t></si></sst>")
+        archive.writestr(
+            "xl/worksheets/sheet1.xml",
+            f'<worksheet {ns}><sheetData><row><c t="s"><v>0</v></c></row>'
+            f'<row><c t="s"><v>1</v></c><c><v>42</v></c></row></sheetData></worksheet>',
+        )
+    return buffer.getvalue()
+
+
+def build_pdf(text):
+    stream = zlib.compress(f"BT /F1 12 Tf 72 712 Td ({text}) Tj ET".encode("latin-1"))
+    return (
+        b"%PDF-1.4\n1 0 obj\n<< /Length " + str(len(stream)).encode() + b" /Filter /FlateDecode >>\nstream\n"
+        + stream + b"\nendstream\nendobj\n%%EOF"
+    )
+
+
+class TextExtractionTests(DocumentTestMixin, TestCase):
+    def add(self, name, content):
+        return Document.objects.create(
+            title=name, initiative=self.initiative, uploaded_by=self.profile,
+            file=SimpleUploadedFile(name, content),
+        )
+
+    def test_extractors(self):
+        path = os.path.join(self.media_root, "sample.docx")
+        with open(path, "wb") as f:
+            f.write(build_docx([["Agenda", "Welcome"], ["Budget review"]]))
+        self.assertEqual(extraction.extract_docx(path), ["Agenda\nWelcome", "Budget review"])
+        with open(path, "wb") as f:
+            f.write(build_xlsx())
+        self.assertEqual(extraction.extract_xlsx(path), ["Budget\nLaptops\t42"])
+        with open(path, "wb") as f:
+            f.write(build_pdf(r"Hello \(PDF\) world"))
+        self.assertEqual(extraction.extract_pdf(path), ["Hello (PDF) world"])
+
+    def test_incremental_extraction_and_search(self):
+        minutes = build_docx([["Solar panels for the lab"]])
+        self.add("minutes.docx", minutes)
+        self.add("copy.docx", minutes)
+        self.add("costs.xlsx", build_xlsx())
+        self.add("photo.png", b"not text")
+        out = StringIO()
+        call_command("extract_document_text", workers=1, stdout=out)
+        self.assertIn("Extracted 2 files, reused 0", out.getvalue())
+        self.assertEqual(DocumentText.objects.filter(text__contains="Solar").count(), 2)
+        segment = DocumentText.objects.get(document__title="costs.xlsx")
+        self.assertEqual((segment.page, segment.offset), (1, 0))
+
+        # Nothing changed: the re-run does no work; a new duplicate is copied
+        self.add("again.docx", minutes)
+        out = StringIO()
+        call_command("extract_document_text", workers=1, stdout=out)
+        self.assertIn("Extracted 0 files, reused 1, failed 0", out.getvalue())
+
+        self.client.login(username="coord", password="pw")
+        resp = self.client.get(reverse("documents_list"), {"search": "laptops"})
+        self.assertContains(resp, "costs.xlsx")
+        self.assertNotContains(resp, "minutes.docx")
+
+
+class DocumentDownloadTests(DocumentTestMixin, TestCase):
+    payload = b"0123456789abcdef"
+
+    def setUp(self):
+        super().setUp()
+        self.document = Document.objects.create(
+            title="Plan", initiative=self.initiative, uploaded_by=self.profile,
+            file=SimpleUploadedFile("plan.txt", self.payload),
+        )
+        self.url = reverse("document_download", args=[self.document.pk])
+        self.client.login(username="coord", password="pw")
+
+    def test_full_and_ranged_downloads(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(b"".join(resp.streaming_content), self.payload)
+        self.assertEqual(resp["Content-Disposition"], 'attachment; filename="plan.txt"')
+        self.assertEqual(resp["ETag"], f'"{self.document.sha256}"')
+        self.assertEqual(resp["Accept-Ranges"], "bytes")
+
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=4-7", HTTP_IF_RANGE=f'"{self.document.sha256}"')
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp["Content-Range"], "bytes 4-7/16")
+        self.assertEqual(b"".join(resp.streaming_content), b"4567")
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=-3")
+        self.assertEqual(b"".join(resp.streaming_content), b"def")
+        # A stale If-Range validator gets the whole, current file
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=4-7", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE="bytes=99-").status_code, 416)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 304)
+
+    @override_settings(DOCUMENT_SERVE_MODE="nginx")
+    def test_accel_redirect(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp["X-Accel-Redirect"], f"/protected-media/{self.document.file.name}")
+        self.assertEqual(resp.content, b"")
+
+    def test_filename_is_escaped(self):
+        Document.objects.filter(pk=self.document.pk).update(original_name='a"b.txt')
+        self.assertEqual(self.client.get(self.url)["Content-Disposition"], 'attachment; filename="a\\"b.txt"')
+        Document.objects.filter(pk=self.document.pk).update(original_name="x\r\nSet-Cookie: y.txt")
+        self.assertNotIn("\n", self.client.get(self.url)["Content-Disposition"])
+
+    def test_district_scoping(self):
+        outsider = User.objects.create_user("outsider", password="pw")
+        UserProfile.objects.create(user=outsider, role="coordinator", district=District.objects.create(name="Galle"))
+        self.client.login(username="outsider", password="pw")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class SQLiteWriteQueueTests(TestCase):
+    def setUp(self):
+        district = District.objects.create(name="Batticaloa")
+        self.user = User.objects.create_user("coord", password="pw")
+        self.profile = UserProfile.objects.create(user=self.user, role="coordinator", district=district)
+        self.initiative = Initiative.objects.create(
+            title="Makerspace", description="d", initiative_type="other", status="active",
+            district=district, coordinator=self.profile, start_date=timezone.now().date(),
+        )
+        self.task = Task.objects.create(
+            title="Kickoff", description="d", initiative=self.initiative, assigned_to=self.profile,
+            created_by=self.profile, due_date=timezone.now() + timezone.timedelta(days=1),
+        )
+        self.client.login(username="coord", password="pw")
+
+    def hold_write_lock(self):
+        acquired, release = threading.Event(), threading.Event()
+
+        def holder():
+            with db._write_lock:
+                acquired.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=holder)
+        thread.start()
+        acquired.wait(5)
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    @override_settings(SQLITE_WRITE_LOCK_TIMEOUT=0.05)
+    def test_busy_writes_are_refused_cleanly(self):
+        self.hold_write_lock()
+        resp = self.client.post(reverse("update_task_status", args=[self.task.pk]), {"status": "completed", "progress": 100})
+        self.assertEqual(resp.status_code, 503)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, "not_started")
+
+        resp = self.client.post(reverse("task_create"), {
+            "title": "Queued", "description": "d", "initiative": self.initiative.pk,
+            "assigned_to": self.profile.pk, "priority": "low", "status": "not_started",
+            "due_date": "2030-01-01T10:00", "progress_percentage": 0,
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'value="Queued"')
+        self.assertFalse(Task.objects.filter(title="Queued").exists())
+        self.assertEqual([m.level_tag for m in resp.context["messages"]], ["error"])
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(routers, "replica_alias", return_value="replica")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def route(self, request):
+        @routers.replica_reads
+        def view(request):
+            return self.router.db_for_read(Task), self.router.db_for_read(Session)
+        return view(request)
+
+    def test_hinted_reads_use_replica_unless_pinned(self):
+        self.assertEqual(self.router.db_for_read(Task), "default")
+        self.assertEqual(self.route(self.factory.get("/")), ("replica", "default"))
+        self.assertEqual(self.route(self.factory.post("/")), ("default", "default"))
+        self.assertEqual(self.router.db_for_write(Task), "default")
+
+        response = HttpResponse()
+        routers.pin_to_primary(self.factory.post("/"), response)
+        request = self.factory.get("/")
+        request.COOKIES[routers.PRIMARY_PIN_COOKIE] = response.cookies[routers.PRIMARY_PIN_COOKIE].value
+        self.assertEqual(self.route(request), ("default", "default"))
+        request.COOKIES[routers.PRIMARY_PIN_COOKIE] = "1"
+        self.assertEqual(self.route(request), ("replica", "default"))
+
+    def test_middleware_runs_natively_under_asgi(self):
+        seen = []
+
+        async def view(request):
+            seen.append((middleware.get_current_request(), await request.auser()))
+            return HttpResponse()
+
+        chain = middleware.CachedAuthenticationMiddleware(
+            middleware.PrimaryPinMiddleware(middleware.CurrentRequestMiddleware(view))
+        )
+        self.assertTrue(iscoroutinefunction(chain))
+        request = self.factory.post("/")
+        request.session = {}
+        response = async_to_sync(chain)(request)
+        self.assertIn(routers.PRIMARY_PIN_COOKIE, response.cookies)
+        self.assertEqual(seen[0][0], request)
+        self.assertFalse(seen[0][1].is_authenticated)
+
+    def test_writes_pin_the_user(self):
+        district = District.objects.create(name="Batticaloa")
+        user = User.objects.create_user("coord", password="pw")
+        UserProfile.objects.create(user=user, role="coordinator", district=district)
+        self.client.login(username="coord", password="pw")
+        self.assertNotIn(routers.PRIMARY_PIN_COOKIE, self.client.get(reverse("dashboard_home")).cookies)
+        resp = self.client.post(reverse("note_create"), {})
+        self.assertIn(routers.PRIMARY_PIN_COOKIE, resp.cookies)
+
+    def test_snapshot_copies_database(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        source, target = os.path.join(tmp, "primary.sqlite3"), os.path.join(tmp, "replica.sqlite3")
+        with sqlite3.connect(source) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE t (v TEXT)")
+            conn.execute("INSERT INTO t VALUES ('first')")
+        db.snapshot_sqlite(source, target)
+        with sqlite3.connect(source) as conn:
+            conn.execute("INSERT INTO t VALUES ('second')")
+        db.snapshot_sqlite(source, target)
+        replica = sqlite3.connect(target)
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute("SELECT COUNT(*) FROM t").fetchone()[0], 2)
+
+
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        self.district = District.objects.create(name="Batticaloa")
+        self.user = User.objects.create_user("coord", password="pw")
+        self.profile = UserProfile.objects.create(user=self.user, role="coordinator", district=self.district)
+        self.client.login(username="coord", password="pw")
+
+    def test_polling_runs_no_auth_queries(self):
+        self.client.get(reverse("notifications"))
+        # Only the overdue task lookup itself
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse("notifications")).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("ai_summary"))
+        auth_tables = ("django_session", "auth_user", "dashboard_userprofile", 'FROM "dashboard_district"')
+        self.assertFalse([q["sql"] for q in ctx.captured_queries if any(t in q["sql"] for t in auth_tables)])
+
+    def test_profile_and_password_changes_invalidate(self):
+        self.assertEqual(self.client.get(reverse("users_list")).status_code, 302)
+        self.profile.role = "admin"
+        self.profile.save()
+        self.assertEqual(self.client.get(reverse("users_list")).status_code, 200)
+
+        self.district.name = "Ampara"
+        self.district.save()
+        resp = self.client.get(reverse("notifications"))
+        self.assertEqual(resp.wsgi_request.user.profile.district.name, "Ampara")
+
+        self.user.set_password("new")
+        self.user.save()
+        resp = self.client.get(reverse("notifications"))
+        self.assertEqual(resp.status_code, 302)
+
+    def test_snapshot_expires_where_invalidation_does_not_reach(self):
+        self.client.get(reverse("notifications"))
+        # Changed by another worker whose cache deletion never arrives here
+        UserProfile.objects.filter(pk=self.profile.pk).update(role="admin")
+        self.assertEqual(self.client.get(reverse("users_list")).status_code, 302)
+        later = time.time() + settings.AUTH_SNAPSHOT_TTL + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=later):
+            self.assertEqual(self.client.get(reverse("users_list")).status_code, 200)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        district = District.objects.create(name="Batticaloa")
+        self.user = User.objects.create_user("coord", password="pw")
+        self.profile = UserProfile.objects.create(user=self.user, role="coordinator", district=district)
+        initiative = Initiative.objects.create(
+            title="Makerspace", description="d", initiative_type="other", status="active",
+            district=district, coordinator=self.profile, start_date=timezone.now().date(),
+        )
+        self.tasks = [
+            Task.objects.create(
+                title=f"Task {n}", description="d", initiative=initiative, assigned_to=self.profile,
+                created_by=self.profile, due_date=timezone.now() + timezone.timedelta(days=n + 1),
+            )
+            for n in range(3)
+        ]
+        self.client.login(username="coord", password="pw")
+
+    def card_renders(self, url):
+        with mock.patch.object(cache, "set", wraps=cache.set) as spy:
+            resp = self.client.get(url)
+        return resp, [c.args[0] for c in spy.call_args_list if c.args[0].startswith("template.cache.task_card")]
+
+    def test_unchanged_list_skips_query_and_edit_rerenders_one_card(self):
+        url = reverse("tasks_list")
+        _, rendered = self.card_renders(url)
+        self.assertEqual(len(rendered), 3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp, rendered = self.card_renders(url)
+        self.assertContains(resp, "Task 2")
+        self.assertEqual(rendered, [])
+        self.assertFalse([q for q in ctx.captured_queries if '"dashboard_task"."title"' in q["sql"]])
+
+        self.tasks[1].title = "Renamed"
+        self.tasks[1].save()
+        resp, rendered = self.card_renders(url)
+        self.assertContains(resp, "Renamed")
+        self.assertEqual(len(rendered), 1)
+
+        # Another viewer role never gets the coordinator's edit controls
+        admin = User.objects.create_user("boss", password="pw")
+        UserProfile.objects.create(user=admin, role="admin")
+        self.client.login(username="boss", password="pw")
+        _, rendered = self.card_renders(url)
+        self.assertEqual(len(rendered), 3)
+        self.assertContains(self.client.get(reverse("dashboard_home")), "Batticaloa")
+
+
+class AsyncApiTests(TestCase):
+    def setUp(self):
+        d1, d2 = District.objects.create(name="Batticaloa"), District.objects.create(name="Ampara")
+        self.admin = User.objects.create_user("boss", password="pw")
+        UserProfile.objects.create(user=self.admin, role="admin")
+        self.coord = User.objects.create_user("coord", password="pw")
+        UserProfile.objects.create(user=self.coord, role="coordinator", district=d1)
+        now = timezone.now()
+        for n, district in enumerate([d1, d1, d2]):
+            initiative = Initiative.objects.create(
+                title=f"Initiative {n}", description="d", initiative_type="other", status="active" if n else "planning",
+                district=district, coordinator=self.coord.profile, start_date=now.date(),
+            )
+            for days, status, progress in [(-2, "in_progress", 10), (3, "completed", 100), (-1, "not_started", 0)]:
+                Task.objects.create(
+                    title=f"Task {n}{days}", description="d", initiative=initiative, assigned_to=self.coord.profile,
+                    created_by=self.coord.profile, due_date=now + timezone.timedelta(days=days),
+                    status=status, progress_percentage=progress * (n + 1) // 3,
+                    completed_at=now if status == "completed" else None,
+                )
+            Note.objects.create(title=f"Note {n}", content="c", initiative=initiative, author=self.coord.profile)
+
+    def request_as(self, user):
+        request = RequestFactory().get("/api/")
+        request.user = user
+
+        async def auser():
+            return user
+        request.auser = auser
+        return request
+
+    def test_async_endpoints_match_sync_views(self):
+        for user in (self.admin, self.coord):
+            for name in ("get_dashboard_stats", "get_chart_data", "get_notifications", "ai_summary", "ai_suggestions"):
+                expected = json.loads(getattr(views, name)(self.request_as(user)).content)
+                actual = json.loads(async_to_sync(getattr(api, name))(self.request_as(user)).content)
+                self.assertEqual(actual, expected, f"{name} as {user.username}")
+
+
+class StaticPipelineTests(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        storages = {
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "dashboard.staticfiles.CompressedManifestStaticFilesStorage"},
+        }
+        overrides = override_settings(STATIC_ROOT=self.static_root, STORAGES=storages)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_collectstatic_minifies_hashes_and_compresses(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        name = staticfiles_storage.stored_name("css/style.css")
+        self.assertRegex(name, r"^css/style\.[0-9a-f]{12}\.css$")
+        path = os.path.join(self.static_root, name)
+        with open(path) as minified, open(os.path.join("static", "css", "style.css")) as original:
+            self.assertLess(len(minified.read()), len(original.read()))
+        self.assertTrue(os.path.exists(path + ".gz"))
+
+        request = RequestFactory().get("/static/" + name, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        resp = staticfiles.serve_static(request, name)
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(resp["Cache-Control"], staticfiles.IMMUTABLE)
+        self.assertIn("Accept-Encoding", resp["Vary"])
+        with open(path, "rb") as f:
+            self.assertEqual(zlib.decompress(b"".join(resp.streaming_content), 16 + zlib.MAX_WBITS), f.read())
+
+        request = RequestFactory().get("/static/css/style.css", HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(staticfiles.serve_static(request, "css/style.css")["Cache-Control"], "public, max-age=0, must-revalidate")
+
+    def test_minifiers_keep_meaning(self):
+        self.assertEqual(staticfiles.minify_css("/* c */\n.nav :hover {\n  color: red;\n}\n"), ".nav :hover{color: red}")
+        css = 'a::after { content: "a , b;  c /* x */"; }\n/* c */\n.b { }'
+        self.assertEqual(staticfiles.minify_css(css), 'a::after{content: "a , b;  c /* x */"}.b{}')
+        js = "// top\nvar url = 'http://x';  // gone\n    /* block */\nfoo();\n"
+        self.assertEqual(staticfiles.minify_js(js), "var url = 'http://x';\nfoo();\n")
+        js = "/* header */ var x = 1;\nfoo(); /* trailing */\nbar();"
+        self.assertEqual(staticfiles.minify_js(js), "var x = 1;\nfoo();\nbar();\n")
+        js = "var t = `a\n  // kept ${b + `c ${d}`} /* kept */`;\nvar r = /\\/\\*x/g, q = a / b; // gone\n"
+        self.assertEqual(staticfiles.minify_js(js), "var t = `a\n  // kept ${b + `c ${d}`} /* kept */`;\nvar r = /\\/\\*x/g, q = a / b;\n")
+
+
+class ObjectPermissionTests(TestCase):
+    def setUp(self):
+        self.d1 = District.objects.create(name="Batticaloa")
+        self.d2 = District.objects.create(name="Ampara")
+        self.owner = User.objects.create_user("owner", password="pw")
+        UserProfile.objects.create(user=self.owner, role="coordinator", district=self.d1)
+        for username, district in (("colleague", self.d1), ("outsider", self.d2)):
+            user = User.objects.create_user(username, password="pw")
+            UserProfile.objects.create(user=user, role="coordinator", district=district)
+        self.initiative = Initiative.objects.create(
+            title="Makerspace", description="d", initiative_type="other", status="active",
+            district=self.d1, coordinator=self.owner.profile, start_date=timezone.now().date(),
+        )
+        self.task = Task.objects.create(
+            title="Kickoff", description="d", initiative=self.initiative, assigned_to=self.owner.profile,
+            created_by=self.owner.profile, due_date=timezone.now() + timezone.timedelta(days=1),
+        )
+
+    def test_object_fetched_once_for_check_and_view(self):
+        self.client.login(username="owner", password="pw")
+        self.client.get(reverse("dashboard_home"))
+        for url in (reverse("task_update", args=[self.task.pk]), reverse("task_delete", args=[self.task.pk])):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            task_reads = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('SELECT "dashboard_task"')]
+            self.assertEqual(len(task_reads), 1, task_reads)
+            self.assertIn('"dashboard_initiative"', task_reads[0])
+
+    def test_district_scoping_and_ownership(self):
+        update_url = reverse("initiative_update", args=[self.initiative.pk])
+        self.client.login(username="colleague", password="pw")
+        self.assertEqual(self.client.get(update_url).status_code, 403)
+        self.client.login(username="outsider", password="pw")
+        self.assertEqual(self.client.get(update_url).status_code, 404)
+        self.assertEqual(self.client.post(reverse("task_delete", args=[self.task.pk])).status_code, 404)
+        self.assertTrue(Task.objects.filter(pk=self.task.pk).exists())
+
+        # Owners keep access to their objects even outside their own district
+        self.owner.profile.district = self.d2
+        self.owner.profile.save()
+        self.client.login(username="owner", password="pw")
+        self.assertEqual(self.client.get(update_url).status_code, 200)
+
+
+class PivotReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.d1 = District.objects.create(name="Ampara")
+        self.d2 = District.objects.create(name="Batticaloa")
+        self.admin = User.objects.create_user("admin1", password="pw")
+        UserProfile.objects.create(user=self.admin, role="admin")
+        self.coord = User.objects.create_user("coord1", password="pw")
+        UserProfile.objects.create(user=self.coord, role="coordinator", district=self.d1)
+        overdue = timezone.now() - timezone.timedelta(days=1)
+        for district, status, budget, progresses in (
+            (self.d1, "active", 100, [10, 30]),
+            (self.d1, "completed", 50, [100]),
+            (self.d2, "active", 25, []),
+        ):
+            initiative = Initiative.objects.create(
+                title=f"{district} {status}", description="d", initiative_type="workshop", status=status,
+                district=district, coordinator=self.coord.profile, start_date=timezone.now().date(), budget=budget,
+            )
+            for progress in progresses:
+                Task.objects.create(
+                    title="t", description="d", initiative=initiative, assigned_to=self.coord.profile,
+                    created_by=self.coord.profile, due_date=overdue, progress_percentage=progress,
+                    status="completed" if progress == 100 else "in_progress",
+                )
+
+    def test_rollup_subtotals_and_cache(self):
+        with CaptureQueriesContext(connection) as ctx:
+            report = reports.build_report("initiatives", self.admin.profile)
+        self.assertEqual(len(ctx.captured_queries), 3)  # change stamp + archive count + one GROUP BY
+        self.assertEqual(report["dimensions"], ["District", "Status"])
+        rows = [(row["keys"], row["level"], row["values"]) for row in report["rows"]]
+        self.assertEqual(rows, [
+            (["Ampara", "Active"], 2, [1, 100, 20.0, 2]),
+            (["Ampara", "Completed"], 2, [1, 50, 100.0, 0]),
+            (["Ampara", "Total"], 1, [2, 150, 46.7, 2]),
+            (["Batticaloa", "Active"], 2, [1, 25, None, 0]),
+            (["Batticaloa", "Total"], 1, [1, 25, None, 0]),
+            (["Total", ""], 0, [3, 175, 46.7, 2]),
+        ])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(reports.build_report("initiatives", self.admin.profile), report)
+        self.assertEqual(len(ctx.captured_queries), 2)  # change stamp + archive count
+
+        Task.objects.filter(progress_percentage=10).first().save()
+        with CaptureQueriesContext(connection) as ctx:
+            reports.build_report("initiatives", self.admin.profile)
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+    def test_views_scope_and_formats(self):
+        self.client.login(username="coord1", password="pw")
+        url = reverse("tasks_report")
+        resp = self.client.get(url, {"dim": ["status", ""], "measure": ["count", "overdue"], "format": "json"})
+        self.assertEqual(resp.json()["rows"], [
+            {"keys": ["Completed"], "level": 1, "values": [1, 0]},
+            {"keys": ["In Progress"], "level": 1, "values": [2, 2]},
+            {"keys": ["Total"], "level": 0, "values": [3, 2]},
+        ])
+        resp = self.client.get(reverse("initiatives_report"), {"dim": "district", "format": "csv"})
+        lines = resp.content.decode().splitlines()
+        self.assertEqual(lines[0], "District,Initiatives,Budget,Avg. progress %,Overdue tasks")
+        self.assertNotIn("Batticaloa", resp.content.decode())
+        resp = self.client.get(url, {"dim": ["priority", "month"]})
+        self.assertContains(resp, "Due month")
+        self.assertEqual(self.client.get(url, {"dim": "budget"}).status_code, 400)
+
+
+class KpiSnapshotTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.district = District.objects.create(name="Batticaloa")
+        self.user = User.objects.create_user("coord1", password="pw")
+        profile = UserProfile.objects.create(user=self.user, role="coordinator", district=self.district)
+        initiative = Initiative.objects.create(
+            title="Makerspace", description="d", initiative_type="other", status="active",
+            district=self.district, coordinator=profile, start_date=self.today,
+        )
+        for title, created, due, status, completed, progress in (
+            ("done", -5, -3, "completed", -2, 100),
+            ("late", -4, -1, "in_progress", None, 40),
+            ("paused", -4, 5, "on_hold", None, 10),
+        ):
+            task = Task.objects.create(
+                title=title, description="d", initiative=initiative, assigned_to=profile, created_by=profile,
+                due_date=self.at(due), status=status, progress_percentage=progress,
+                completed_at=self.at(completed) if completed is not None else None,
+            )
+            Task.objects.filter(pk=task.pk).update(created_at=self.at(created))
+        Initiative.objects.filter(pk=initiative.pk).update(created_at=self.at(-5))
+
+    def at(self, days):
+        day = self.today + timezone.timedelta(days=days)
+        return timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time()).replace(hour=12))
+
+    def test_backfill_reconstructs_history_and_snapshot_records_today(self):
+        out = StringIO()
+        call_command("snapshot_kpis", "--backfill", stdout=out)
+        self.assertIn("Reconstructed 5 snapshot rows", out.getvalue())
+        rows = KpiSnapshot.objects.order_by("date").values_list(
+            "tasks_total", "in_progress", "on_hold", "completed", "overdue", "completed_today",
+            "tasks_created", "initiatives_created", "reconstructed",
+        )
+        self.assertEqual(list(rows), [
+            (1, 1, 0, 0, 0, 0, 1, 1, True),
+            (3, 2, 1, 0, 0, 0, 2, 0, True),
+            (3, 2, 1, 0, 1, 0, 0, 0, True),
+            (3, 1, 1, 1, 0, 1, 0, 0, True),
+            (3, 1, 1, 1, 1, 0, 0, 0, True),
+            (3, 1, 1, 1, 1, 0, 0, 0, False),
+        ])
+        self.assertEqual(KpiSnapshot.objects.get(date=self.today).avg_progress, 50.0)
+
+        # Re-running the nightly job overwrites today's row
+        kpis.take_snapshot()
+        self.assertEqual(KpiSnapshot.objects.count(), 6)
+
+    def test_backfill_keeps_real_snapshots(self):
+        KpiSnapshot.objects.create(date=self.today - timezone.timedelta(days=2), district=self.district, tasks_total=7, avg_progress=55)
+        self.assertEqual(kpis.backfill(), 4)
+        self.assertEqual(kpis.backfill(), 4)
+        real = KpiSnapshot.objects.get(reconstructed=False)
+        self.assertEqual((real.tasks_total, real.avg_progress), (7, 55))
+        self.assertEqual(KpiSnapshot.objects.count(), 5)
+
+    def test_trend_apis_read_snapshots(self):
+        KpiSnapshot.objects.create(date=self.today, district=self.district, tasks_total=9, overdue=2, avg_progress=30)
+        self.client.login(username="coord1", password="pw")
+        series = self.client.get(reverse("kpi_trend"), {"days": 7}).json()["series"]
+        self.assertEqual(series, [{
+            "date": self.today.isoformat(), "tasks": 9, "overdue": 2, "completed": 0, "completed_today": 0, "avg_progress": 30.0,
+        }])
+
+        months = kpis.chart_months()
+        KpiSnapshot.objects.filter(date=self.today).update(date=timezone.datetime(months[-1][1], months[-1][2], 1).date(), tasks_created=4)
+        Task.objects.filter(title="done").update(created_at=timezone.make_aware(timezone.datetime(months[0][1], months[0][2], 2)))
+        # Months before the first snapshot are counted from the live tables
+        self.assertEqual(self.client.get(reverse("chart_data")).json()["datasets"][1]["data"], [1, 0, 0, 0, 0, 4])
+
+        KpiSnapshot.objects.create(date=timezone.datetime(months[0][1], months[0][2], 1).date(), district=self.district)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(reverse("chart_data")).json()
+        self.assertEqual(data["datasets"][1]["data"], [0, 0, 0, 0, 0, 4])
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "dashboard_task"' in q["sql"]])
+
+
+class InitiativeCounterTests(TestCase):
+    def setUp(self):
+        district = District.objects.create(name="Batticaloa")
+        self.user = User.objects.create_user("coord1", password="pw")
+        self.profile = UserProfile.objects.create(user=self.user, role="coordinator", district=district)
+        self.a, self.b = (
+            Initiative.objects.create(
+                title=title, description="d", initiative_type="other", status="active",
+                district=district, coordinator=self.profile, start_date=timezone.now().date(),
+            )
+            for title in ("A", "B")
+        )
+
+    def counters(self, initiative):
+        initiative.refresh_from_db()
+        return [getattr(initiative, field) for field in Initiative.COUNTER_FIELDS]
+
+    def make_task(self, initiative, status="not_started"):
+        return Task.objects.create(
+            title="t", description="d", initiative=initiative, assigned_to=self.profile, created_by=self.profile,
+            due_date=timezone.now(), status=status,
+        )
+
+    def test_counters_follow_creates_transitions_moves_and_deletes(self):
+        task = self.make_task(self.a)
+        self.make_task(self.a, status="completed")
+        Note.objects.create(title="n", content="c", initiative=self.a, task=task, author=self.profile)
+        self.assertEqual(self.counters(self.a), [2, 1, 1, 0])
+
+        task = Task.objects.get(pk=task.pk)
+        task.status = "completed"
+        task.save()
+        self.assertEqual(self.counters(self.a), [2, 2, 1, 0])
+
+        task.initiative = self.b
+        task.save()
+        self.assertEqual(self.counters(self.a), [1, 1, 1, 0])
+        self.assertEqual(self.counters(self.b), [1, 1, 0, 0])
+
+        # A stale form save of the initiative leaves the counters alone
+        stale = Initiative.objects.get(pk=self.a.pk)
+        self.make_task(self.a)
+        stale.title = "Renamed"
+        stale.save()
+        self.assertEqual(self.counters(self.a), [2, 1, 1, 0])
+
+        task.delete()  # cascades to its note
+        self.assertEqual(self.counters(self.a), [2, 1, 0, 0])
+        self.assertEqual(self.counters(self.b), [0, 0, 0, 0])
+
+    def test_update_view_reads_counters_and_repair_fixes_drift(self):
+        self.make_task(self.a)
+        Task.objects.bulk_create([  # bypasses the signal handlers
+            Task(title="bulk", description="d", initiative=self.a, assigned_to=self.profile,
+                 created_by=self.profile, due_date=timezone.now(), status="completed")
+        ])
+        out = StringIO()
+        call_command("repair_counters", "--dry-run", stdout=out)
+        self.assertIn(f"Initiative {self.a.pk}: tasks_count 1 -> 2, completed_tasks_count 0 -> 1", out.getvalue())
+        self.assertEqual(self.counters(self.a), [1, 0, 0, 0])
+        call_command("repair_counters", stdout=StringIO())
+        self.assertEqual(self.counters(self.a), [2, 1, 0, 0])
+
+        self.client.login(username="coord1", password="pw")
+        self.client.get(reverse("dashboard_home"))
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse("initiative_update", args=[self.a.pk]))
+        self.assertEqual(resp.context["total_tasks_count"], 2)
+        self.assertFalse([q for q in ctx.captured_queries if "COUNT(" in q["sql"]])
+
+    def test_list_stamp_sees_counter_moves_that_offset(self):
+        task = self.make_task(self.a)
+        stamp = fragments.change_stamp(Initiative.objects.all())
+        task.initiative = self.b
+        task.save()  # same totals as before
+        self.assertNotEqual(fragments.change_stamp(Initiative.objects.all()), stamp)
+        with CaptureQueriesContext(connection) as ctx:
+            fragments.change_stamp(Initiative.objects.all())
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class InitiativeCountQueryTests(TestCase):
+    def setUp(self):
+        district = District.objects.create(name="Batticaloa")
+        self.user = User.objects.create_user("coord1", password="pw")
+        profile = UserProfile.objects.create(user=self.user, role="coordinator", district=district)
+        self.initiative = Initiative.objects.create(
+            title="Makerspace", description="d", initiative_type="other", status="active",
+            district=district, coordinator=profile, start_date=timezone.now().date(),
+        )
+        Initiative.objects.create(
+            title="Empty", description="d", initiative_type="other", status="active",
+            district=district, coordinator=profile, start_date=timezone.now().date(),
+        )
+        for status in ("completed", "in_progress", "not_started"):
+            Task.objects.create(
+                title="t", description="d", initiative=self.initiative, assigned_to=profile,
+                created_by=profile, due_date=timezone.now(), status=status,
+            )
+        for _ in range(2):
+            Note.objects.create(title="n", content="c", initiative=self.initiative, author=profile)
+
+    def test_subquery_counts_do_not_fan_out(self):
+        joined = Initiative.objects.annotate(
+            total_tasks=Count("tasks"), completed=Count("tasks", filter=Q(tasks__status="completed")), total_notes=Count("notes"),
+        ).get(pk=self.initiative.pk)
+        self.assertEqual((joined.total_tasks, joined.completed, joined.total_notes), (6, 2, 6))
+
+        counted = Initiative.objects.with_actual_counts().order_by("title")
+        self.assertNotIn("JOIN", str(counted.query))
+        self.assertEqual(
+            [(i.title, i.actual_tasks_count, i.actual_completed_tasks_count, i.actual_notes_count) for i in counted],
+            [("Empty", 0, 0, 0), ("Makerspace", 3, 1, 2)],
+        )
+
+    def test_list_cards_show_exact_counts(self):
+        self.client.login(username="coord1", password="pw")
+        resp = self.client.get(reverse("initiatives_list"))
+        initiative = next(i for i in resp.context["initiatives"] if i.pk == self.initiative.pk)
+        self.assertEqual((initiative.tasks_count, initiative.completed_tasks_count, initiative.notes_count), (3, 1, 2))
+
+
+class ListProjectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        district = District.objects.create(name="Batticaloa")
+        self.user = User.objects.create_user("coord1", password="pw")
+        self.profile = UserProfile.objects.create(user=self.user, role="coordinator", district=district)
+        self.initiative = Initiative.objects.create(
+            title="Makerspace", description="d" * 500, initiative_type="other", status="active",
+            district=district, coordinator=self.profile, start_date=timezone.now().date(),
+        )
+        self.note = Note.objects.create(
+            title="Minutes", content="word " * 2000, initiative=self.initiative, author=self.profile,
+        )
+
+    def test_summary_follows_source_text(self):
+        self.assertEqual(len(self.note.summary), 200)
+        self.assertTrue(self.note.summary.endswith("…"))
+        self.note.content = "short"
+        self.note.save(update_fields=["content"])
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.summary, "short")
+
+        # Saving without the source loaded leaves the summary alone
+        note = Note.objects.only("title").get(pk=self.note.pk)
+        note.title = "Renamed"
+        note.save()
+        self.assertEqual(Note.objects.get(pk=self.note.pk).summary, "short")
+
+    def test_list_queries_skip_full_text(self):
+        Task.objects.create(
+            title="t", description="x" * 5000, initiative=self.initiative, assigned_to=self.profile,
+            created_by=self.profile, due_date=timezone.now(),
+        )
+        self.client.login(username="coord1", password="pw")
+        for name, column in (("notes_list", '"dashboard_note"."content"'), ("tasks_list", '"dashboard_task"."description"')):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(reverse(name))
+            self.assertEqual(resp.status_code, 200)
+            self.assertFalse([q for q in ctx.captured_queries if column in q["sql"]], name)
+        self.assertContains(resp, "x" * 90)
+
+    def test_note_modal_loads_full_content(self):
+        self.client.login(username="coord1", password="pw")
+        resp = self.client.get(reverse("notes_list"))
+        self.assertContains(resp, f'data-note-content="{reverse("note_detail", args=[self.note.pk])}"')
+        self.assertNotContains(resp, "word " * 100)
+
+        resp = self.client.get(reverse("note_detail", args=[self.note.pk]), HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertContains(resp, "word " * 100)
+
+
+class InitiativeTestMixin:
+    """Two districts and profile, initiative and task helpers for the bulk, archive and sync tests"""
+
+    def setUp(self):
+        cache.clear()
+        self.district = District.objects.create(name="Batticaloa")
+        self.other_district = District.objects.create(name="Ampara")
+
+    def make_profile(self, username, role="coordinator", district=None, **user_fields):
+        user = User.objects.create_user(username, password="pw", **user_fields)
+        return UserProfile.objects.create(user=user, role=role, district=district or self.district)
+
+    def make_initiative(self, title, coordinator, district=None, status="active"):
+        return Initiative.objects.create(
+            title=title, description="d", initiative_type="other", status=status,
+            district=district or self.district, coordinator=coordinator, start_date=timezone.now().date(),
+        )
+
+    def make_task(self, title, initiative, assignee, created_by=None, due_date=None, **fields):
+        return Task.objects.create(
+            title=title, description="d", initiative=initiative, assigned_to=assignee,
+            created_by=created_by or assignee, due_date=due_date or timezone.now(), **fields,
+        )
+
+
+class BulkDeletionTests(InitiativeTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_profile("admin1", role="admin", district=self.other_district)
+        self.coord = self.make_profile("coord1")
+        self.initiative = self.make_initiative("Batticaloa hub", self.coord)
+        self.other = self.make_initiative("Ampara hub", self.admin, self.other_district)
+        now = timezone.now()
+        for i in range(5):
+            task = self.make_task(f"t{i}", self.initiative, self.coord, due_date=now)
+            Note.objects.create(title="n", content="c", initiative=self.initiative, task=task, author=self.coord)
+        # Work the coordinator owns in another district's initiative
+        self.make_task("elsewhere", self.other, self.coord, created_by=self.admin, due_date=now, status="completed")
+        self.make_task("kept", self.other, self.admin, due_date=now)
+        document = Document.objects.create(
+            title="doc", file="documents/a.txt", sha256="a" * 64, initiative=self.initiative, uploaded_by=self.coord,
+        )
+        DocumentText.objects.create(document=document, sha256="a" * 64, text="hello")
+        UploadSession.objects.create(
+            owner=self.coord, title="u", initiative=self.initiative, filename="u.txt", total_size=10,
+        )
+        Event.objects.create(
+            initiative=self.initiative, title="e", start_datetime=now, end_datetime=now, organizer=self.coord,
+        )
+        InitiativeSheet.objects.create(initiative=self.initiative, coordinator=self.coord, sheet_url="https://example.com/s")
+        KpiSnapshot.objects.create(date=now.date(), district=self.district)
+
+    def test_district_delete_removes_dependents_bottom_up(self):
+        with CaptureQueriesContext(connection) as ctx:
+            removed = deletion.delete_target(self.district, batch_size=2)
+        self.assertEqual(removed["Task"], 5)
+        self.assertEqual(removed["Note"], 5)
+        self.assertEqual((removed["District"], removed["KpiSnapshot"]), (1, 1))
+        # The children were never loaded as model instances
+        self.assertFalse([q for q in ctx.captured_queries if '"dashboard_note"."content"' in q["sql"]])
+
+        self.assertFalse(District.objects.filter(pk=self.district.pk).exists())
+        for model in (Task, Note, Document, DocumentText, UploadSession, Event, InitiativeSheet):
+            self.assertFalse(model.objects.filter(pk__gt=0).exclude(**(
+                {"initiative": self.other} if model is Task else {}
+            )).exists(), model.__name__)
+        self.assertEqual(Task.objects.filter(initiative=self.other).count(), 2)
+        self.assertEqual(Blob.objects.get(pk="a" * 64).ref_count, 0)
+        self.coord.refresh_from_db()
+        self.assertIsNone(self.coord.district_id)
+        self.assertEqual(Activity.objects.filter(verb="deleted", object_type="district").count(), 1)
+
+    def test_user_delete_keeps_surviving_counters_exact(self):
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.tasks_count, self.other.completed_tasks_count), (2, 1))
+        deletion.delete_target(self.coord.user)
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.tasks_count, self.other.completed_tasks_count), (1, 0))
+        self.assertFalse(User.objects.filter(pk=self.coord.user_id).exists())
+        self.assertFalse(Initiative.objects.filter(pk=self.initiative.pk).exists())
+        self.assertTrue(District.objects.filter(pk=self.district.pk).exists())
+
+    def test_small_delete_runs_in_the_request(self):
+        self.client.login(username="coord1", password="pw")
+        resp = self.client.post(reverse("initiative_delete", args=[self.initiative.pk]))
+        self.assertRedirects(resp, reverse("initiatives_list"), fetch_redirect_response=False)
+        self.assertFalse(Initiative.objects.filter(pk=self.initiative.pk).exists())
+        self.assertFalse(DeletionJob.objects.exists())
+
+    @override_settings(DELETE_INLINE_LIMIT=3)
+    def test_large_delete_is_queued_for_the_worker(self):
+        self.client.login(username="admin1", password="pw")
+        self.client.post(reverse("district_delete", args=[self.district.pk]))
+        self.client.post(reverse("district_delete", args=[self.district.pk]))
+        job = DeletionJob.objects.get()
+        self.assertEqual((job.status, job.requested_by, job.total), ("pending", self.admin, 16))
+        self.assertTrue(District.objects.filter(pk=self.district.pk).exists())
+
+        seen, delete_batch = [], deletion._delete_batch
+
+        def watch(*args):
+            # What another process would see between batches
+            seen.append(self.client.get(reverse("deletion_job_status", args=[job.pk])).json()["deleted"])
+            return delete_batch(*args)
+
+        out = StringIO()
+        with mock.patch.object(deletion, "_delete_batch", watch):
+            call_command("run_deletion_jobs", stdout=out)
+        self.assertIn("rows removed", out.getvalue())
+        self.assertEqual(seen, sorted(seen))
+        self.assertGreater(seen[-1], 0)
+        self.assertFalse(District.objects.filter(pk=self.district.pk).exists())
+        data = self.client.get(reverse("deletion_job_status", args=[job.pk])).json()
+        self.assertEqual(data["status"], "done")
+        self.assertGreaterEqual(data["deleted"], data["total"])
+
+        self.client.login(username="coord1", password="pw")
+        self.assertEqual(self.client.get(reverse("deletion_job_status", args=[job.pk])).status_code, 404)
+
+
+class ArchiveTests(InitiativeTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile = self.make_profile("admin1", role="admin")
+        self.user = self.profile.user
+        now = timezone.now()
+        self.old = now - timezone.timedelta(days=400)
+        self.finished = self.make_initiative("Finished", self.profile, status="completed")
+        self.live = self.make_initiative("Live", self.profile)
+        self.task = self.make_task("Wrap up", self.finished, self.profile, due_date=now, status="completed")
+        self.make_task("Ongoing", self.live, self.profile, due_date=now)
+        Note.objects.create(title="n", content="c", initiative=self.finished, task=self.task, author=self.profile)
+        self.document = Document.objects.create(
+            title="report", file="documents/r.txt", sha256="b" * 64, text_sha256="b" * 64,
+            initiative=self.finished, uploaded_by=self.profile,
+        )
+        DocumentText.objects.create(document=self.document, sha256="b" * 64, text="hello")
+        Event.objects.create(initiative=self.finished, title="e", start_datetime=now, end_datetime=now, organizer=self.profile)
+        InitiativeSheet.objects.create(initiative=self.finished, coordinator=self.profile, sheet_url="https://example.com/s")
+        for model in (Initiative, Task):
+            model.objects.update(updated_at=self.old)
+        self.created_at = Task.objects.get(pk=self.task.pk).created_at
+
+    def test_archive_and_restore_round_trip(self):
+        out = StringIO()
+        call_command("archive_initiatives", stdout=out)
+        self.assertIn("Archived 1 initiatives (6 rows)", out.getvalue())
+        self.assertEqual(list(Initiative.objects.values_list("title", flat=True)), ["Live"])
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+        self.assertFalse(DocumentText.objects.exists())
+        for model in (InitiativeArchive, TaskArchive, NoteArchive, DocumentArchive, EventArchive, InitiativeSheetArchive):
+            self.assertEqual(model.objects.count(), 1, model.__name__)
+        archived_task = TaskArchive.objects.get()
+        self.assertEqual((archived_task.pk, archived_task.created_at, archived_task.updated_at), (self.task.pk, self.created_at, self.old))
+        self.assertEqual(archived_task.initiative.title, "Finished")
+        self.assertEqual(Blob.objects.get(pk="b" * 64).ref_count, 1)
+
+        self.client.login(username="admin1", password="pw")
+        self.assertEqual(self.client.get(reverse("initiative_detail", args=[self.finished.pk])).status_code, 404)
+        self.assertNotContains(self.client.get(reverse("tasks_list")), "Wrap up")
+
+        call_command("archive_initiatives", "--restore", str(self.finished.pk), stdout=StringIO())
+        self.assertFalse(InitiativeArchive.objects.exists() or TaskArchive.objects.exists())
+        restored = Initiative.objects.get(pk=self.finished.pk)
+        self.assertEqual((restored.tasks_count, restored.notes_count, restored.documents_count), (1, 1, 1))
+        self.assertEqual(Task.objects.get(pk=self.task.pk).created_at, self.created_at)
+        self.assertEqual(Document.objects.get(pk=self.document.pk).text_sha256, "")
+
+    def test_rows_linked_across_the_archive_line_stay_filed_where_they_are(self):
+        live_task = Task.objects.get(title="Ongoing")
+        kept = Note.objects.create(title="kept", content="c", initiative=self.live, task=self.task, author=self.profile)
+        Document.objects.create(
+            title="kept", file="documents/k.txt", initiative=self.live, task=self.task, uploaded_by=self.profile,
+        )
+        Note.objects.create(title="gone", content="c", initiative=self.finished, task=live_task, author=self.profile)
+        archive.archive_initiatives([self.finished.pk])
+        self.assertEqual(Note.objects.get().pk, kept.pk)
+        self.assertEqual((Note.objects.get().task, Document.objects.get().task), (None, None))
+        self.assertEqual(NoteArchive.objects.filter(task__isnull=True).count(), 1)
+        live = Initiative.objects.get(pk=self.live.pk)
+        self.assertEqual((live.tasks_count, live.notes_count, live.documents_count), (1, 1, 1))
+
+        archive.restore_initiatives([self.finished.pk])
+        restored = Initiative.objects.get(pk=self.finished.pk)
+        self.assertEqual((restored.tasks_count, restored.notes_count, restored.documents_count), (1, 2, 1))
+
+    def test_only_finished_and_idle_initiatives_are_archivable(self):
+        self.assertEqual(list(archive.archivable(365)), [self.finished])
+        Task.objects.filter(pk=self.task.pk).update(updated_at=timezone.now())
+        self.assertFalse(archive.archivable(365).exists())
+
+    def test_reports_and_exports_include_archived_rows(self):
+        archive.archive_initiatives([self.finished.pk])
+        report = reports.build_report("tasks", self.profile, ["status"], ["count"])
+        self.assertEqual(report["rows"][-1]["values"], [2])
+        report = reports.build_report("initiatives", self.profile, ["status"], ["count", "avg_progress"])
+        self.assertEqual([row["keys"][0] for row in report["rows"]], ["Active", "Completed", "Total"])
+
+        self.client.login(username="admin1", password="pw")
+        csv_text = self.client.get(reverse("export_data") + "?type=tasks").content.decode()
+        self.assertIn("Wrap up", csv_text)
+        self.assertIn("Ongoing", csv_text)
+
+    def test_archived_rows_outliving_their_people_are_exported_and_restored(self):
+        other = self.make_profile("admin2", role="admin")
+        peer = self.make_profile("peer")
+        Task.objects.filter(pk=self.task.pk).update(assigned_to=peer)
+        kept = self.make_initiative("Kept", other, status="completed")
+        archive.archive_initiatives([self.finished.pk, kept.pk])
+        # Plain ORM deletes leave the archive pointing at nothing
+        peer.user.delete()
+        self.client.login(username="admin2", password="pw")
+        for export_type, title in (("initiatives", "Finished"), ("tasks", "Wrap up")):
+            resp = self.client.get(reverse("export_data") + f"?type={export_type}")
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn(title, resp.content.decode())
+
+        self.user.delete()
+        csv_text = self.client.get(reverse("export_data") + "?type=initiatives").content.decode()
+        self.assertIn("Finished,Batticaloa,,", csv_text)
+        report = reports.build_report("initiatives", other, ["coordinator"], ["count"])
+        self.assertEqual([row["keys"][0] for row in report["rows"]], ["admin2", "(none)", "Total"])
+
+        archive.restore_initiatives([self.finished.pk, kept.pk])
+        self.assertEqual(list(InitiativeArchive.objects.values_list("title", flat=True)), ["Finished"])
+        self.assertTrue(Initiative.objects.filter(pk=kept.pk).exists())
+
+    def test_restored_rows_of_deleted_people_go_to_the_coordinator(self):
+        peer = self.make_profile("peer")
+        Task.objects.filter(pk=self.task.pk).update(assigned_to=peer, created_by=peer)
+        archive.archive_initiatives([self.finished.pk])
+        peer.user.delete()
+        archive.restore_initiatives([self.finished.pk])
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual((task.assigned_to, task.created_by), (self.profile, self.profile))
+
+    def test_deleting_the_district_removes_its_archive(self):
+        archive.archive_initiatives([self.finished.pk])
+        deletion.delete_target(self.district)
+        for model in (InitiativeArchive, TaskArchive, NoteArchive, DocumentArchive, EventArchive, InitiativeSheetArchive):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertEqual(Blob.objects.get(pk="b" * 64).ref_count, 0)
+
+
+class AdminScalingTests(TestCase):
+    def setUp(self):
+        self.district = District.objects.create(name="Batticaloa")
+        self.admin_user = User.objects.create_superuser("root", "root@example.com", "pw")
+        UserProfile.objects.create(user=self.admin_user, role="admin", district=self.district)
+        self.initiative = Initiative.objects.create(
+            title="Makerspace", description="d", initiative_type="other", status="active",
+            district=self.district, coordinator=self.admin_user.profile, start_date=timezone.now().date(),
+        )
+        self.people = []
+        for i in range(4):
+            user = User.objects.create_user(f"coord{i}", password="pw")
+            self.people.append(UserProfile.objects.create(user=user, role="coordinator", district=self.district))
+        self.client.force_login(self.admin_user)
+
+    def add_tasks(self, n, due_days=1):
+        for i in range(n):
+            person = self.people[i % len(self.people)]
+            Task.objects.create(
+                title=f"task {i}", description="d", initiative=self.initiative, assigned_to=person,
+                created_by=person, due_date=timezone.now() + timezone.timedelta(days=due_days),
+            )
+            Note.objects.create(title=f"note {i}", content="c", initiative=self.initiative, author=person)
+
+    def changelist_queries(self, name):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse(f"admin:dashboard_{name}_changelist"))
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_tasks(2)
+        self.client.get(reverse("admin:index"))
+        before = {name: self.changelist_queries(name) for name in ("task", "note", "document", "event", "initiativesheet")}
+        self.add_tasks(10)
+        after = {name: self.changelist_queries(name) for name in before}
+        self.assertEqual(before, after)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("admin:auth_user_changelist"))
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "dashboard_userprofile"' in q["sql"]])
+
+    def test_people_filters_take_a_username(self):
+        self.add_tasks(4)
+        url = reverse("admin:dashboard_task_changelist")
+        resp = self.client.get(url)
+        self.assertNotContains(resp, "coord3 -")  # profiles are not listed as options
+        resp = self.client.get(url, {"assigned_to": "coord1", "status__exact": "not_started"})
+        self.assertEqual([task.assigned_to_id for task in resp.context["cl"].result_list], [self.people[1].pk])
+        self.assertContains(resp, 'type="hidden" name="status__exact" value="not_started"')
+
+    def test_overdue_is_annotated_and_sortable(self):
+        self.add_tasks(1, due_days=-1)
+        self.add_tasks(1, due_days=3)
+        resp = self.client.get(reverse("admin:dashboard_task_changelist"), {"o": "8"})
+        self.assertEqual([task.overdue for task in resp.context["cl"].result_list], [False, True])
+
+    def test_paginator_estimates_large_unfiltered_tables(self):
+        self.add_tasks(5)
+        with mock.patch.object(dashboard_admin.EstimatedCountPaginator, "COUNT_LIMIT", 3):
+            paginator = dashboard_admin.EstimatedCountPaginator(Task.objects.all(), 100)
+            self.assertEqual(paginator.count, Task.objects.order_by("-pk").first().pk)
+            paginator = dashboard_admin.EstimatedCountPaginator(Task.objects.filter(status="not_started"), 100)
+            self.assertEqual(paginator.count, 3)
+        paginator = dashboard_admin.EstimatedCountPaginator(Task.objects.all(), 100)
+        self.assertEqual(paginator.count, 5)
+
+
+class BulkTaskActionTests(InitiativeTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_profile("root", role="admin", email="root@example.com", is_staff=True, is_superuser=True)
+        self.coord = self.make_profile("coord", first_name="Nila")
+        self.peer = self.make_profile("peer")
+        self.outsider = self.make_profile("outsider", district=self.other_district)
+        self.initiative = self.make_initiative("Makerspace", self.admin)
+        self.target = self.make_initiative("Bootcamp", self.admin)
+        self.foreign = self.make_initiative("Elsewhere", self.admin, self.other_district)
+        self.due = timezone.now().replace(microsecond=0)
+
+    def add_tasks(self, n, assignee=None, initiative=None):
+        assignee = assignee or self.coord
+        return [
+            self.make_task(f"task {i}", initiative or self.initiative, assignee, due_date=self.due)
+            for i in range(n)
+        ]
+
+    def post(self, user, tasks=(), **data):
+        self.client.force_login(user.user)
+        data.setdefault("tasks", [task.pk for task in tasks])
+        return self.client.post(reverse("tasks_bulk_action"), data)
+
+    def test_complete_updates_counters_and_activity(self):
+        tasks = self.add_tasks(3)
+        Activity.objects.all().delete()
+        resp = self.post(self.coord, tasks[:2], action="complete")
+        self.assertRedirects(resp, reverse("tasks_list"), fetch_redirect_response=False)
+        done = Task.objects.filter(status="completed")
+        self.assertEqual(done.count(), 2)
+        self.assertFalse(done.filter(completed_at=None).exists())
+        self.assertEqual(set(done.values_list("progress_percentage", flat=True)), {100})
+        self.initiative.refresh_from_db()
+        self.assertEqual((self.initiative.tasks_count, self.initiative.completed_tasks_count), (3, 2))
+        entries = Activity.objects.order_by("object_id")
+        self.assertEqual([e.object_id for e in entries], [tasks[0].pk, tasks[1].pk])
+        self.assertEqual(entries[0].summary, "Task updated: task 0 (marked completed)")
+        self.assertEqual((entries[0].actor, entries[0].district_id), (self.coord, self.district.pk))
+        # Already completed tasks are left alone
+        self.assertEqual(bulk.apply(Task.objects.all(), "complete", profile=self.admin), 1)
+
+    def test_priority_reassign_and_shift_due(self):
+        tasks = self.add_tasks(2)
+        stale = Task.objects.get(pk=tasks[0].pk).updated_at
+        self.post(self.admin, tasks, action="priority", value="urgent")
+        self.assertEqual(set(Task.objects.values_list("priority", flat=True)), {"urgent"})
+        self.assertGreater(Task.objects.get(pk=tasks[0].pk).updated_at, stale)
+        self.post(self.admin, tasks, action="shift_due", value="-3")
+        self.assertEqual(set(Task.objects.values_list("due_date", flat=True)), {self.due - timezone.timedelta(days=3)})
+        self.post(self.admin, tasks, action="reassign", value=str(self.peer.pk))
+        self.assertEqual(set(Task.objects.values_list("assigned_to", flat=True)), {self.peer.pk})
+
+    def test_move_recounts_both_initiatives(self):
+        tasks = self.add_tasks(3)
+        Task.objects.filter(pk=tasks[0].pk).update(status="completed")
+        self.post(self.coord, tasks[:2], action="move", value=str(self.target.pk))
+        counts = dict(Initiative.objects.values_list("title", "tasks_count"))
+        self.assertEqual((counts["Makerspace"], counts["Bootcamp"]), (1, 2))
+        self.assertEqual(Initiative.objects.get(pk=self.target.pk).completed_tasks_count, 1)
+
+    def test_scoping(self):
+        own = self.add_tasks(1)
+        theirs = self.add_tasks(1, assignee=self.peer)
+        self.post(self.coord, own + theirs, action="priority", value="high")
+        self.assertEqual(dict(Task.objects.values_list("pk", "priority")), {own[0].pk: "high", theirs[0].pk: "medium"})
+        # Targets outside the coordinator's district are refused
+        self.post(self.coord, own, action="move", value=str(self.foreign.pk))
+        self.post(self.coord, own, action="reassign", value=str(self.outsider.pk))
+        task = Task.objects.get(pk=own[0].pk)
+        self.assertEqual((task.initiative_id, task.assigned_to_id), (self.initiative.pk, self.coord.pk))
+        readonly = UserProfile.objects.create(
+            user=User.objects.create_user("viewer", password="pw"), role="readonly", district=self.district,
+        )
+        self.post(readonly, theirs, action="complete")
+        self.assertFalse(Task.objects.filter(status="completed").exists())
+
+    def test_filtered_scope_applies_to_every_matching_task(self):
+        self.add_tasks(3)
+        Task.objects.filter(pk=Task.objects.first().pk).update(priority="low")
+        resp = self.post(self.coord, action="complete", scope="filtered", query="priority=medium")
+        self.assertRedirects(resp, reverse("tasks_list") + "?priority=medium", fetch_redirect_response=False)
+        self.assertEqual(Task.objects.filter(status="completed").count(), 2)
+
+    def test_queries_do_not_grow_with_selection(self):
+        def queries(n):
+            Task.objects.all().delete()
+            self.add_tasks(n)
+            with CaptureQueriesContext(connection) as ctx:
+                bulk.apply(Task.objects.all(), "move", self.target.pk, self.admin)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(2), queries(20))
+
+    def test_admin_actions(self):
+        tasks = self.add_tasks(2)
+        self.client.force_login(self.admin.user)
+        url = reverse("admin:dashboard_task_changelist")
+        ids = [task.pk for task in tasks]
+        self.client.post(url, {"action": "reassign", "_selected_action": ids, "value": "peer"})
+        self.assertEqual(set(Task.objects.values_list("assigned_to", flat=True)), {self.peer.pk})
+        self.client.post(url, {"action": "mark_completed", "_selected_action": ids})
+        self.initiative.refresh_from_db()
+        self.assertEqual(self.initiative.completed_tasks_count, 2)
+        resp = self.client.post(url, {"action": "set_priority", "_selected_action": ids, "value": "bogus"}, follow=True)
+        self.assertContains(resp, "Choose a priority.")
+        with mock.patch.object(bulk, "serialized_write", side_effect=db.WriteQueueTimeout):
+            resp = self.client.post(url, {"action": "mark_completed", "_selected_action": ids}, follow=True)
+        self.assertContains(resp, "The server is busy")
+
+    def test_due_date_shift_is_bounded(self):
+        tasks = self.add_tasks(1)
+        with self.assertRaisesMessage(bulk.BulkActionError, "up to 3650"):
+            bulk.apply(Task.objects.all(), "shift_due", "1000000", self.admin)
+        self.post(self.admin, tasks, action="shift_due", value="-3651")
+        self.assertEqual(Task.objects.get().due_date, self.due)
+
+
+class SyncApiTests(InitiativeTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(sync, "SETTLE", timezone.timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.profile = self.make_profile("coord")
+        self.user = self.profile.user
+        self.initiative = self.make_initiative("Makerspace", self.profile, status="completed")
+        self.foreign = self.make_initiative("Elsewhere", self.profile, self.other_district, status="completed")
+        self.tasks = [self.make_task(f"task {i}", self.initiative, self.profile) for i in range(3)]
+        self.make_task("foreign", self.foreign, self.profile)
+        self.note = Note.objects.create(title="n", content="c", initiative=self.initiative, author=self.profile)
+        now = timezone.now()
+        Event.objects.create(initiative=self.initiative, title="e", start_datetime=now, end_datetime=now, organizer=self.profile)
+        self.client.force_login(self.user)
+
+    def sync(self, cursor="", **params):
+        resp = self.client.get(reverse("sync_changes"), {"cursor": cursor, **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_full_then_incremental_sync(self):
+        data = self.sync()
+        self.assertEqual([row["title"] for row in data["tasks"]], ["task 0", "task 1", "task 2"])
+        self.assertEqual([row["title"] for row in data["initiatives"]], ["Makerspace"])
+        self.assertEqual((len(data["notes"]), len(data["events"]), data["has_more"]), (1, 1, False))
+        self.assertNotIn("summary", data["tasks"][0])
+
+        self.assertEqual(self.sync(data["cursor"])["tasks"], [])
+        Task.objects.filter(pk=self.tasks[1].pk).update(title="renamed", updated_at=timezone.now())
+        deleted_pk = self.tasks[2].pk
+        self.tasks[2].delete()
+        data = self.sync(data["cursor"])
+        self.assertEqual([row["title"] for row in data["tasks"]], ["renamed"])
+        self.assertEqual(data["deleted"]["task"], [deleted_pk])
+        self.assertEqual(self.sync(data["cursor"])["deleted"]["task"], [])
+
+    def test_counter_changes_resend_the_initiative(self):
+        cursor = self.sync()["cursor"]
+        self.make_task("added", self.initiative, self.profile, status="completed")
+        data = self.sync(cursor)
+        self.assertEqual([row["title"] for row in data["initiatives"]], ["Makerspace"])
+        self.assertEqual((data["initiatives"][0]["tasks_count"], data["initiatives"][0]["completed_tasks_count"]), (4, 1))
+        Initiative.objects.filter(pk=self.initiative.pk).refresh_counters()
+        self.assertEqual(len(self.sync(data["cursor"])["initiatives"]), 1)
+
+    def test_pages_follow_the_cursor(self):
+        stamp = timezone.now() - timezone.timedelta(minutes=1)
+        Task.objects.update(updated_at=stamp)  # same stamp: the id breaks the tie
+        seen, cursor = [], ""
+        for _ in range(4):
+            data = self.sync(cursor, limit=1)
+            seen += [row["title"] for row in data["tasks"]]
+            cursor = data["cursor"]
+            if not data["has_more"]:
+                break
+        self.assertEqual(seen, ["task 0", "task 1", "task 2"])
+
+    def test_bulk_deletions_and_archiving_leave_tombstones(self):
+        cursor = self.sync()["cursor"]
+        deletion.delete_target(self.foreign)
+        archive.archive_initiatives([self.initiative.pk])
+        data = self.sync(cursor)
+        self.assertEqual(sorted(data["deleted"]["task"]), [task.pk for task in self.tasks])
+        self.assertEqual(data["deleted"]["initiative"], [self.initiative.pk])
+        self.assertEqual(data["deleted"]["note"], [self.note.pk])
+        # The other district's deletions are not sent
+        self.assertEqual(Tombstone.objects.exclude(district=self.district).count(), 3)
+
+    def test_expired_cursor_resets(self):
+        cursor = self.sync()["cursor"]
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now() + timezone.timedelta(days=91)):
+            data = self.sync(cursor)
+        self.assertTrue(data["reset"])
+        self.assertEqual(len(data["tasks"]), 3)
+        self.assertFalse(self.sync("garbage")["reset"])
+        self.assertFalse(self.sync("_".join([f"{10 ** 40}.1"] * 5))["reset"])
+
+    def test_cursor_of_an_active_client_stays_fresh(self):
+        cursor = self.sync()["cursor"]
+        for days in (60, 120):
+            with mock.patch("django.utils.timezone.now", return_value=timezone.now() + timezone.timedelta(days=days)):
+                data = self.sync(cursor)
+            self.assertFalse(data["reset"])
+            cursor = data["cursor"]
+
+    def test_restored_rows_are_sent_again(self):
+        cursor = self.sync()["cursor"]
+        archive.archive_initiatives([self.initiative.pk])
+        cursor = self.sync(cursor)["cursor"]
+        archive.restore_initiatives([self.initiative.pk])
+        data = self.sync(cursor)
+        self.assertEqual(len(data["tasks"]), 3)
+        self.assertEqual([row["title"] for row in data["initiatives"]], ["Makerspace"])
+        self.assertFalse(Tombstone.objects.filter(object_id=self.initiative.pk, object_type="initiative").exists())
+
+    def test_moves_to_another_district_leave_tombstones(self):
+        cursor = self.sync()["cursor"]
+        self.tasks[0].initiative = self.foreign
+        self.tasks[0].save()
+        bulk.apply(Task.objects.filter(pk=self.tasks[1].pk), "move", self.foreign.pk)
+        bulk.apply(Task.objects.filter(pk=self.tasks[2].pk), "move", self.initiative.pk)  # same district
+        self.note.initiative = self.foreign
+        self.note.save(update_fields=["initiative"])
+        data = self.sync(cursor)
+        self.assertEqual(sorted(data["deleted"]["task"]), [self.tasks[0].pk, self.tasks[1].pk])
+        self.assertEqual(data["deleted"]["note"], [self.note.pk])
+        # Admins see both districts, so nothing was removed for them
+        self.profile.role = "admin"
+        self.profile.save()
+        self.assertEqual(self.sync(cursor)["deleted"]["task"], [])
+
+    def test_initiative_moved_to_another_district_takes_its_rows(self):
+        cursor = self.sync()["cursor"]
+        initiative = Initiative.objects.get(pk=self.initiative.pk)
+        initiative.district = self.foreign.district
+        initiative.save()
+        data = self.sync(cursor)
+        self.assertEqual(data["deleted"]["initiative"], [self.initiative.pk])
+        self.assertEqual(len(data["deleted"]["task"]), 3)
+        self.assertEqual((data["deleted"]["note"], len(data["deleted"]["event"])), ([self.note.pk], 1))
+
+    def test_response_is_compressed(self):
+        resp = self.client.get(reverse("sync_changes"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(zlib.decompress(resp.content, 16 + zlib.MAX_WBITS))["tasks"]), 3)
+
+
+@override_settings(API_PAGE_SIZE=2)
+class ListApiTests(TestCase):
+    def setUp(self):
+        self.district = District.objects.create(name="Batticaloa")
+        other = District.objects.create(name="Ampara")
+        self.user = User.objects.create_user("coord", password="pw")
+        self.profile = UserProfile.objects.create(user=self.user, role="coordinator", district=self.district)
+        self.initiative = Initiative.objects.create(
+            title="Makerspace", description="d", initiative_type="workshop", status="active",
+            district=self.district, coordinator=self.profile, start_date=timezone.now().date(),
+        )
+        foreign = Initiative.objects.create(
+            title="Elsewhere", description="d", initiative_type="other", status="active",
+            district=other, coordinator=self.profile, start_date=timezone.now().date(),
+        )
+        for i, status in enumerate(["not_started", "completed", "completed", "completed"]):
+            Task.objects.create(
+                title=f"task {i}", description="long text " * 50, initiative=self.initiative, status=status,
+                assigned_to=self.profile, created_by=self.profile, due_date=timezone.now(),
+            )
+        Task.objects.create(
+            title="foreign", description="d", initiative=foreign, status="completed",
+            assigned_to=self.profile, created_by=self.profile, due_date=timezone.now(),
+        )
+        Note.objects.create(title="n", content="c", note_type="meeting", initiative=self.initiative, author=self.profile)
+        self.client.force_login(self.user)
+
+    def get(self, name, **params):
+        return self.client.get(reverse(name), params)
+
+    def test_sparse_fields_filters_and_cursor(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.get("tasks_api", status="completed", fields="id,title,initiative_title").json()
+        ids = dict(Task.objects.values_list("title", "pk"))
+        self.assertEqual(data["results"], [
+            {"id": ids["task 3"], "title": "task 3", "initiative_title": "Makerspace"},
+            {"id": ids["task 2"], "title": "task 2", "initiative_title": "Makerspace"},
+        ])
+        self.assertNotIn("description", ctx.captured_queries[-1]["sql"])
+        data = self.get("tasks_api", status="completed", fields="title", cursor=data["next"]).json()
+        self.assertEqual(data, {"results": [{"title": "task 1"}], "next": None})
+
+    def test_compact_format_and_defaults(self):
+        data = self.get("tasks_api", format="compact", limit=1).json()
+        self.assertEqual(data["fields"], listapi.DEFAULT_FIELDS[Task])
+        self.assertEqual(data["rows"][0][:2], [Task.objects.get(title="task 3").pk, "task 3"])
+        data = self.get("initiatives_api", type="workshop", format="compact").json()
+        self.assertEqual([row[1] for row in data["rows"]], ["Makerspace"])
+        self.assertEqual(self.get("notes_api", type="meeting").json()["results"][0]["summary"], "c")
+
+    def test_bad_parameters(self):
+        for params in ({"fields": "title,password"}, {"cursor": "abc"}, {"format": "xml"}):
+            resp = self.get("tasks_api", **params)
+            self.assertEqual(resp.status_code, 400, params)
+            self.assertIn("error", resp.json())
+        with mock.patch.object(listapi, "msgpack", None):
+            self.assertEqual(self.get("tasks_api", format="msgpack").status_code, 400)
+
+    def test_msgpack_when_available(self):
+        packer = mock.Mock(packb=mock.Mock(return_value=b"packed"))
+        with mock.patch.object(listapi, "msgpack", packer):
+            resp = self.get("initiatives_api", format="msgpack", fields="id,start_date")
+        self.assertEqual((resp["Content-Type"], resp.content), ("application/msgpack", b"packed"))
+        body = packer.packb.call_args.args[0]
+        self.assertEqual(body["rows"], [(self.initiative.pk, self.initiative.start_date)])
+
+    def test_gzip(self):
+        resp = self.client.get(reverse("tasks_api"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+
+
 # Create your tests here.
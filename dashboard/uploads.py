@@ -0,0 +1,79 @@
+"""Resumable chunked uploads.
+
+A client opens an ``UploadSession``, PUTs the file in chunks at increasing
+offsets and then finalizes it. Chunks are streamed from the request straight
+into a part file under ``<MEDIA_ROOT>/uploads/partial`` so memory use per
+chunk is constant, and finalizing moves the assembled file into document
+storage without copying it.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+
+from .models import UploadSession
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+def part_path(session):
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial', f'{session.pk}.part')
+
+
+def write_chunk(session, stream, offset, limit):
+    """Stream at most ``limit`` bytes from ``stream`` into the part file at
+    ``offset`` and return the number of bytes written.
+
+    The data is fsync'ed before returning so an acknowledged offset survives
+    a crash.
+    """
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+        part.seek(offset)
+        part.truncate()
+        while written < limit:
+            data = stream.read(min(COPY_BUFFER_SIZE, limit - written))
+            if not data:
+                break
+            part.write(data)
+            written += len(data)
+        part.flush()
+        os.fsync(part.fileno())
+    return written
+
+
+def hash_part(session):
+    hasher = hashlib.sha256()
+    with open(part_path(session), 'rb') as part:
+        for data in iter(lambda: part.read(COPY_BUFFER_SIZE), b''):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+class AssembledUpload(File):
+    """A finished part file; exposing ``temporary_file_path`` lets the
+    storage move it into place instead of copying it"""
+
+    def __init__(self, path, name, sha256):
+        super().__init__(open(path, 'rb'), name=name)
+        self.path = path
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def discard_part(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def discard_parts(session_ids):
+    """Remove the part files of sessions deleted in bulk"""
+    for pk in session_ids:
+        discard_part(UploadSession(pk=pk))
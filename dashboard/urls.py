@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
+
+# Polling endpoints: async views under ASGI, plain views under WSGI
+api_views = api if settings.ASYNC_API else views
 
 urlpatterns = [
     # Dashboard - AdminLTE style URLs
@@ -21,6 +25,7 @@ urlpatterns = [
     # Task Management
     path('tasks/', views.tasks_list, name='tasks_list'),
     path('tasks/<int:pk>/', views.task_detail, name='task_detail'),
+    path('tasks/bulk/', views.tasks_bulk_action, name='tasks_bulk_action'),
     path('tasks/create/', views.TaskCreateView.as_view(), name='task_create'),
     path('tasks/<int:pk>/edit/', views.TaskUpdateView.as_view(), name='task_update'),
     path('tasks/<int:pk>/delete/', views.TaskDeleteView.as_view(), name='task_delete'),
@@ -36,8 +41,13 @@ urlpatterns = [
     # Document Management
     path('documents/', views.documents_list, name='documents_list'),
     path('documents/<int:pk>/', views.document_detail, name='document_detail'),
+    path('documents/<int:pk>/download/', views.document_download, name='document_download'),
+    path('documents/<int:pk>/preview/<str:size>.<str:fmt>', views.document_preview, name='document_preview'),
     path('documents/create/', views.DocumentCreateView.as_view(), name='document_create'),
     path('documents/<int:pk>/delete/', views.DocumentDeleteView.as_view(), name='document_delete'),
+    path('api/uploads/', views.upload_init, name='upload_init'),
+    path('api/uploads/<uuid:pk>/', views.upload_chunk, name='upload_chunk'),
+    path('api/uploads/<uuid:pk>/finalize/', views.upload_finalize, name='upload_finalize'),
     
     # Reports and Analytics
     path('reports/', views.reports_dashboard, name='reports_dashboard'),
@@ -52,6 +62,7 @@ urlpatterns = [
     path('users/<int:pk>/edit/', views.UserUpdateView.as_view(), name='user_update'),
     path('users/<int:pk>/profile/', views.UserProfileUpdateView.as_view(), name='user_profile_update'),
     path('users/<int:pk>/delete/', views.UserDeleteView.as_view(), name='user_delete'),
+    path('users/<int:pk>/picture/<str:size>.<str:fmt>', views.profile_picture_preview, name='profile_picture_preview'),
     
     # Districts Management
     path('districts/', views.districts_list, name='districts_list'),
@@ -62,6 +73,7 @@ urlpatterns = [
     
     # Calendar and Timeline
     path('calendar/', views.calendar_view, name='calendar'),
+    path('calendar/feeds/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
     path('timeline/', views.timeline_view, name='timeline'),
     
     # Widgets and Components
@@ -69,9 +81,15 @@ urlpatterns = [
     path('charts/', views.charts_page, name='charts'),
     
     # API endpoints
-    path('api/dashboard-stats/', views.get_dashboard_stats, name='dashboard_stats'),
-    path('api/chart-data/', views.get_chart_data, name='chart_data'),
-    path('api/notifications/', views.get_notifications, name='notifications'),
-    path('api/ai/summary/', views.ai_summary, name='ai_summary'),
-    path('api/ai/suggestions/', views.ai_suggestions, name='ai_suggestions'),
+    path('api/dashboard-stats/', api_views.get_dashboard_stats, name='dashboard_stats'),
+    path('api/chart-data/', api_views.get_chart_data, name='chart_data'),
+    path('api/kpi-trend/', views.kpi_trend, name='kpi_trend'),
+    path('api/deletion-jobs/<int:pk>/', views.deletion_job_status, name='deletion_job_status'),
+    path('api/tasks/', views.tasks_api, name='tasks_api'),
+    path('api/initiatives/', views.initiatives_api, name='initiatives_api'),
+    path('api/notes/', views.notes_api, name='notes_api'),
+    path('api/sync/', views.sync_changes, name='sync_changes'),
+    path('api/notifications/', api_views.get_notifications, name='notifications'),
+    path('api/ai/summary/', api_views.ai_summary, name='ai_summary'),
+    path('api/ai/suggestions/', api_views.ai_suggestions, name='ai_suggestions'),
 ]
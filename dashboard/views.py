@@ -2,19 +2,40 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import Count, Max, Q
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse, Http404, QueryDict
+from django.core import signing
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe, require_POST, require_http_methods
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.views import View
 from django.contrib.auth.forms import UserCreationForm
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.models import User
-from .models import District, UserProfile, Initiative, Task, Note, Document, InitiativeSheet, Event
-from .forms import InitiativeForm, TaskForm, NoteForm, DocumentForm, UserProfileForm, InitiativeSheetForm, EventForm, EventAdminForm
-from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from .models import District, UserProfile, Initiative, Task, Note, Document, InitiativeSheet, Event, Activity, Blob, UploadSession, DocumentText, DeletionJob, InitiativeArchive, TaskArchive
+from .forms import InitiativeForm, TaskForm, NoteForm, DocumentForm, UserProfileForm, InitiativeSheetForm, EventForm, EventAdminForm, UploadSessionForm
+from . import bulk, calendar_feeds, deletion, fragments, kpis, listapi, previews, reports, sync, uploads, sendfile
+from .db import SerializedWriteMixin, WriteQueueTimeout, serialized_write
+from .deletion import BulkDeleteMixin
+from .permissions import OwnedObjectPermissionMixin
+from .routers import replica_reads
+from datetime import datetime, timedelta, timezone as dt_timezone
 import csv
 import json
+import os
+
+# Full text the list cards never render; they show ``summary`` instead
+TASK_CARD_DEFER = ('description', 'initiative__description', 'initiative__kpi_target', 'assigned_to__bio')
+NOTE_CARD_DEFER = (
+    'content', 'initiative__description', 'initiative__kpi_target', 'initiative__district__description',
+    'task__description', 'author__bio',
+)
+INITIATIVE_CARD_DEFER = ('description', 'kpi_target', 'district__description', 'coordinator__bio')
 
 def is_admin(user):
     """Check if user is admin"""
@@ -71,8 +92,10 @@ def dashboard_home(request):
     overdue_tasks = tasks.filter(due_date__lt=timezone.now(), status__in=['not_started', 'in_progress']).count()
     
     # Recent activities
-    recent_tasks = tasks.order_by('-created_at')[:5]
-    recent_notes = Note.objects.filter(initiative__in=initiatives).order_by('-created_at')[:5]
+    recent_tasks = tasks.select_related('initiative', 'assigned_to__user').defer(*TASK_CARD_DEFER).order_by('-created_at')[:5]
+    recent_notes = Note.objects.filter(initiative__in=initiatives).select_related('author__user').defer(
+        'content', 'author__bio',
+    ).order_by('-created_at')[:5]
     
     # Weekly progress
     week_ago = timezone.now() - timedelta(days=7)
@@ -86,6 +109,11 @@ def dashboard_home(request):
 
     context = {
         'user_profile': user_profile,
+        'recent_tasks_stamp': fragments.change_stamp(tasks, last_initiative=Max('initiative__updated_at')),
+        'recent_notes_stamp': fragments.change_stamp(Note.objects.filter(initiative__in=initiatives)),
+        'districts_stamp': fragments.change_stamp(
+            districts_qs, initiative_count=Count('initiatives'), last_initiative=Max('initiatives__updated_at'),
+        ),
         'total_initiatives': total_initiatives,
         'active_initiatives': active_initiatives,
         'completed_initiatives': completed_initiatives,
@@ -110,27 +138,10 @@ def initiatives_list(request):
         district=user_profile.district
     )
 
-    # Filtering
-    status_filter = request.GET.get('status')
-    district_filter = request.GET.get('district')
-    type_filter = request.GET.get('type')
-    search_query = request.GET.get('search')
+    queryset = _filter_initiatives(queryset, request.GET)
 
-    if status_filter:
-        queryset = queryset.filter(status=status_filter)
-    if district_filter:
-        queryset = queryset.filter(district__name=district_filter)
-    if type_filter:
-        queryset = queryset.filter(initiative_type=type_filter)
-    if search_query:
-        queryset = queryset.filter(Q(title__icontains=search_query) | Q(description__icontains=search_query))
-
-    # Optimize and annotate for template counters
-    initiatives = queryset.select_related('district', 'coordinator__user').annotate(
-        total_tasks=Count('tasks'),
-        completed_tasks=Count('tasks', filter=Q(tasks__status='completed')),
-        notes_count=Count('notes'),
-    )
+    # Card counters are denormalized columns, so no joins are needed
+    initiatives = queryset.select_related('district', 'coordinator__user').defer(*INITIATIVE_CARD_DEFER)
 
     # District options for admin filtering
     districts = District.objects.all() if user_profile.role == 'admin' else District.objects.filter(
@@ -139,6 +150,8 @@ def initiatives_list(request):
 
     context = {
         'initiatives': initiatives,
+        # Counter updates stamp updated_at, so the plain stamp covers them
+        'initiatives_stamp': fragments.change_stamp(queryset),
         'user_profile': user_profile,
         'status_choices': Initiative.STATUS_CHOICES,
         'type_choices': Initiative.TYPE_CHOICES,
@@ -147,6 +160,23 @@ def initiatives_list(request):
 
     return render(request, 'dashboard/initiatives_list.html', context)
 
+def _filter_initiatives(queryset, params):
+    """Apply the initiatives list filters in ``params``"""
+    status_filter = params.get('status')
+    district_filter = params.get('district')
+    type_filter = params.get('type')
+    search_query = params.get('search')
+
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    if district_filter:
+        queryset = queryset.filter(district__name=district_filter)
+    if type_filter:
+        queryset = queryset.filter(initiative_type=type_filter)
+    if search_query:
+        queryset = queryset.filter(Q(title__icontains=search_query) | Q(description__icontains=search_query))
+    return queryset
+
 @login_required
 def initiative_detail(request, pk):
     """Detail view for an initiative including sheets and events"""
@@ -162,10 +192,11 @@ def initiative_detail(request, pk):
     sheets = initiative.sheets.select_related('coordinator').all()
     events = initiative.events.filter(start_datetime__gte=timezone.now()-timedelta(days=30)).order_by('start_datetime')
 
-    # Derive progress as average of task progress if tasks exist
-    if tasks.exists():
+    # Derive progress as average of task progress if tasks exist; len() fills
+    # the queryset cache the template then iterates
+    if initiative.tasks_count and len(tasks):
         total_progress = sum(t.progress_percentage for t in tasks)
-        progress = int(total_progress / tasks.count())
+        progress = int(total_progress / len(tasks))
     else:
         progress = 0
 
@@ -192,27 +223,72 @@ def tasks_list(request):
     else:
         tasks = Task.objects.filter(initiative__district=user_profile.district)
     
-    # Filtering
-    status_filter = request.GET.get('status')
-    priority_filter = request.GET.get('priority')
-    district_filter = request.GET.get('district')
+    tasks = _filter_tasks(tasks, request.GET)
     
-    if status_filter:
-        tasks = tasks.filter(status=status_filter)
-    if priority_filter:
-        tasks = tasks.filter(priority=priority_filter)
-    if district_filter:
-        tasks = tasks.filter(initiative__district__name=district_filter)
+    # Outer fragment key; the list itself is only queried on a miss
+    tasks_stamp = fragments.change_stamp(
+        tasks,
+        overdue_count=Count('pk', filter=Q(due_date__lt=timezone.now()) & ~Q(status='completed')),
+        last_initiative=Max('initiative__updated_at'),
+    )
     
     context = {
-        'tasks': tasks,
+        'tasks': tasks.select_related('initiative', 'assigned_to__user').defer(*TASK_CARD_DEFER),
+        'tasks_stamp': tasks_stamp,
         'user_profile': user_profile,
         'status_choices': Task.STATUS_CHOICES,
         'priority_choices': Task.PRIORITY_CHOICES,
     }
+    if user_profile.role != 'readonly':
+        context.update({
+            'bulk_actions': bulk.ACTIONS,
+            'bulk_assignees': bulk.assignable_profiles(user_profile).select_related('user'),
+            'bulk_initiatives': bulk.target_initiatives(user_profile).only('pk', 'title'),
+        })
     
     return render(request, 'dashboard/tasks_list.html', context)
 
+def _filter_tasks(tasks, params):
+    """Apply the tasks list filters in ``params``"""
+    status_filter = params.get('status')
+    priority_filter = params.get('priority')
+    district_filter = params.get('district')
+    
+    if status_filter:
+        tasks = tasks.filter(status=status_filter)
+    if priority_filter:
+        tasks = tasks.filter(priority=priority_filter)
+    if district_filter:
+        tasks = tasks.filter(initiative__district__name=district_filter)
+    return tasks
+
+@login_required
+@require_POST
+def tasks_bulk_action(request):
+    """Apply one bulk action to the checked tasks, or to every task matching the list filters"""
+    user_profile = request.user.profile
+    query = request.POST.get('query', '')
+    back = f"{reverse('tasks_list')}?{query}" if query else reverse('tasks_list')
+    if user_profile.role == 'readonly':
+        messages.error(request, 'You do not have permission to change tasks.')
+        return redirect(back)
+    
+    tasks = bulk.scoped_tasks(user_profile)
+    if request.POST.get('scope') == 'filtered':
+        tasks = _filter_tasks(tasks, QueryDict(query))
+    else:
+        tasks = tasks.filter(pk__in=[pk for pk in request.POST.getlist('tasks') if pk.isdigit()])
+    
+    try:
+        changed = bulk.apply(tasks, request.POST.get('action'), request.POST.get('value'), user_profile)
+    except bulk.BulkActionError as exc:
+        messages.error(request, str(exc))
+    except WriteQueueTimeout:
+        messages.error(request, 'The server is busy saving other changes. Please try again.')
+    else:
+        messages.success(request, f'{changed} task{"s" if changed != 1 else ""} updated.')
+    return redirect(back)
+
 @login_required
 def task_detail(request, pk):
     """Detail view for a task"""
@@ -245,23 +321,30 @@ def notes_list(request):
     else:
         notes = Note.objects.filter(initiative__district=user_profile.district)
     
-    # Filtering
-    type_filter = request.GET.get('type')
-    district_filter = request.GET.get('district')
-    
-    if type_filter:
-        notes = notes.filter(note_type=type_filter)
-    if district_filter:
-        notes = notes.filter(initiative__district__name=district_filter)
+    notes = _filter_notes(notes, request.GET)
     
     context = {
-        'notes': notes,
+        'notes': notes.select_related('initiative__district', 'task', 'author__user').defer(*NOTE_CARD_DEFER),
+        'notes_stamp': fragments.change_stamp(
+            notes, last_initiative=Max('initiative__updated_at'), last_task=Max('task__updated_at'),
+        ),
         'user_profile': user_profile,
         'type_choices': Note.NOTE_TYPE_CHOICES,
     }
     
     return render(request, 'dashboard/notes_list.html', context)
 
+def _filter_notes(notes, params):
+    """Apply the notes list filters in ``params``"""
+    type_filter = params.get('type')
+    district_filter = params.get('district')
+    
+    if type_filter:
+        notes = notes.filter(note_type=type_filter)
+    if district_filter:
+        notes = notes.filter(initiative__district__name=district_filter)
+    return notes
+
 @login_required
 def documents_list(request):
     """List all documents"""
@@ -274,9 +357,16 @@ def documents_list(request):
     
     # Filtering
     district_filter = request.GET.get('district')
+    search_query = request.GET.get('search')
     
     if district_filter:
         documents = documents.filter(initiative__district__name=district_filter)
+    if search_query:
+        # Matches on extracted file contents as well as on the metadata
+        matching_text = DocumentText.objects.filter(text__icontains=search_query).values('document_id')
+        documents = documents.filter(
+            Q(title__icontains=search_query) | Q(description__icontains=search_query) | Q(pk__in=matching_text)
+        )
     
     context = {
         'documents': documents,
@@ -286,7 +376,7 @@ def documents_list(request):
     return render(request, 'dashboard/documents_list.html', context)
 
 # Form Views
-class InitiativeCreateView(LoginRequiredMixin, CreateView):
+class InitiativeCreateView(LoginRequiredMixin, SerializedWriteMixin, CreateView):
     model = Initiative
     form_class = InitiativeForm
     template_name = 'dashboard/initiative_form.html'
@@ -294,8 +384,10 @@ class InitiativeCreateView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.coordinator = self.request.user.profile
-        messages.success(self.request, 'Initiative created successfully!')
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        if form.instance.pk:
+            messages.success(self.request, 'Initiative created successfully!')
+        return response
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -312,16 +404,14 @@ class InitiativeCreateView(LoginRequiredMixin, CreateView):
         context.setdefault('documents_count', 0)
         return context
 
-class InitiativeUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class InitiativeUpdateView(LoginRequiredMixin, OwnedObjectPermissionMixin, UpdateView):
     model = Initiative
     form_class = InitiativeForm
     template_name = 'dashboard/initiative_form.html'
     success_url = reverse_lazy('initiatives_list')
-    
-    def test_func(self):
-        initiative = self.get_object()
-        user_profile = self.request.user.profile
-        return user_profile.role == 'admin' or initiative.coordinator == user_profile
+    owner_field = 'coordinator'
+    district_lookup = 'district'
+    related = ('district',)
     
     def form_valid(self, form):
         messages.success(self.request, 'Initiative updated successfully!')
@@ -335,13 +425,13 @@ class InitiativeUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         initiative = self.object
-        context['total_tasks_count'] = initiative.tasks.count()
-        context['completed_tasks_count'] = initiative.tasks.filter(status='completed').count()
-        context['notes_count'] = initiative.notes.count()
-        context['documents_count'] = initiative.documents.count()
+        context['total_tasks_count'] = initiative.tasks_count
+        context['completed_tasks_count'] = initiative.completed_tasks_count
+        context['notes_count'] = initiative.notes_count
+        context['documents_count'] = initiative.documents_count
         return context
 
-class TaskCreateView(LoginRequiredMixin, CreateView):
+class TaskCreateView(LoginRequiredMixin, SerializedWriteMixin, CreateView):
     model = Task
     form_class = TaskForm
     template_name = 'dashboard/task_form.html'
@@ -349,24 +439,24 @@ class TaskCreateView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.created_by = self.request.user.profile
-        messages.success(self.request, 'Task created successfully!')
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        if form.instance.pk:
+            messages.success(self.request, 'Task created successfully!')
+        return response
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs.setdefault('user', self.request.user)
         return kwargs
 
-class TaskUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class TaskUpdateView(LoginRequiredMixin, OwnedObjectPermissionMixin, UpdateView):
     model = Task
     form_class = TaskForm
     template_name = 'dashboard/task_form.html'
     success_url = reverse_lazy('tasks_list')
-    
-    def test_func(self):
-        task = self.get_object()
-        user_profile = self.request.user.profile
-        return user_profile.role == 'admin' or task.assigned_to == user_profile
+    owner_field = 'assigned_to'
+    district_lookup = 'initiative__district'
+    related = ('initiative',)
     
     def form_valid(self, form):
         messages.success(self.request, 'Task updated successfully!')
@@ -377,7 +467,7 @@ class TaskUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         kwargs.setdefault('user', self.request.user)
         return kwargs
 
-class NoteCreateView(LoginRequiredMixin, CreateView):
+class NoteCreateView(LoginRequiredMixin, SerializedWriteMixin, CreateView):
     model = Note
     form_class = NoteForm
     template_name = 'dashboard/note_form.html'
@@ -385,24 +475,24 @@ class NoteCreateView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.author = self.request.user.profile
-        messages.success(self.request, 'Note created successfully!')
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        if form.instance.pk:
+            messages.success(self.request, 'Note created successfully!')
+        return response
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs.setdefault('user', self.request.user)
         return kwargs
 
-class NoteUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class NoteUpdateView(LoginRequiredMixin, OwnedObjectPermissionMixin, UpdateView):
     model = Note
     form_class = NoteForm
     template_name = 'dashboard/note_form.html'
     success_url = reverse_lazy('notes_list')
-    
-    def test_func(self):
-        note = self.get_object()
-        user_profile = self.request.user.profile
-        return user_profile.role == 'admin' or note.author == user_profile
+    owner_field = 'author'
+    district_lookup = 'initiative__district'
+    related = ('initiative',)
     
     def form_valid(self, form):
         messages.success(self.request, 'Note updated successfully!')
@@ -413,7 +503,7 @@ class NoteUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         kwargs.setdefault('user', self.request.user)
         return kwargs
 
-class DocumentCreateView(LoginRequiredMixin, CreateView):
+class DocumentCreateView(LoginRequiredMixin, SerializedWriteMixin, CreateView):
     model = Document
     form_class = DocumentForm
     template_name = 'dashboard/document_form.html'
@@ -421,53 +511,175 @@ class DocumentCreateView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.uploaded_by = self.request.user.profile
-        messages.success(self.request, 'Document uploaded successfully!')
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        if form.instance.pk:
+            messages.success(self.request, 'Document uploaded successfully!')
+        return response
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs.setdefault('user', self.request.user)
         return kwargs
 
-class InitiativeSheetCreateView(LoginRequiredMixin, CreateView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Files above one chunk go through the resumable upload API
+        context['chunk_threshold'] = settings.CHUNKED_UPLOAD_CHUNK_SIZE
+        return context
+
+# Resumable chunked uploads
+def upload_status(session):
+    return {
+        'id': str(session.pk),
+        'offset': session.received,
+        'size': session.total_size,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        'complete': session.is_complete,
+        'document': session.document_id,
+        'redirect': reverse('documents_list') if session.document_id else None,
+    }
+
+def create_session_document(session, file, **fields):
+    return Document.objects.create(
+        title=session.title,
+        description=session.description,
+        initiative=session.initiative,
+        task=session.task,
+        uploaded_by=session.owner,
+        file=file,
+        **fields,
+    )
+
+@login_required
+@require_POST
+def upload_init(request):
+    """Open a chunked upload session"""
+    form = UploadSessionForm(request.POST, user=request.user)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    session = form.save(commit=False)
+    session.owner = request.user.profile
+
+    # Content the user can already download needs no bytes at all. Blobs held
+    # only by documents outside their scope are not revealed: knowing a hash
+    # must not grant the file.
+    blob = None
+    if session.sha256:
+        visible = Document.objects.all() if session.owner.role == 'admin' else Document.objects.filter(
+            initiative__district=session.owner.district
+        )
+        blob = Blob.objects.filter(
+            pk=session.sha256, ref_count__gt=0, sha256__in=visible.values('sha256'),
+        ).first()
+    if blob is not None:
+        session.received = session.total_size
+        session.document = create_session_document(
+            session, blob.name, sha256=blob.sha256, file_size=blob.size, original_name=session.filename,
+        )
+    session.save()
+    return JsonResponse(upload_status(session), status=201)
+
+@login_required
+@require_http_methods(['GET', 'HEAD', 'PUT'])
+def upload_chunk(request, pk):
+    """Report the acknowledged offset (GET) or append a chunk at it (PUT)"""
+    session = get_object_or_404(UploadSession, pk=pk, owner=request.user.profile)
+    if request.method != 'PUT':
+        return JsonResponse(upload_status(session))
+    if session.document_id:
+        return JsonResponse(upload_status(session), status=409)
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.GET.get('offset', '')))
+    except ValueError:
+        return JsonResponse({'error': 'Missing or invalid offset.'}, status=400)
+    if offset != session.received:
+        # Client is out of sync; it should resume from the acknowledged offset
+        return JsonResponse(upload_status(session), status=409)
+
+    limit = min(session.total_size - offset, settings.CHUNKED_UPLOAD_CHUNK_SIZE)
+    written = uploads.write_chunk(session, request, offset, limit)
+    advanced = UploadSession.objects.filter(pk=session.pk, received=offset).update(
+        received=offset + written, updated_at=timezone.now(),
+    )
+    session.refresh_from_db()
+    return JsonResponse(upload_status(session), status=200 if advanced else 409)
+
+@login_required
+@require_POST
+def upload_finalize(request, pk):
+    """Verify the assembled file and create its Document"""
+    session = get_object_or_404(UploadSession, pk=pk, owner=request.user.profile)
+    if session.document_id:
+        return JsonResponse(upload_status(session))
+    if not session.is_complete:
+        return JsonResponse(upload_status(session), status=409)
+
+    digest = uploads.hash_part(session)
+    if session.sha256 and digest != session.sha256:
+        uploads.discard_part(session)
+        session.received = 0
+        session.save(update_fields=['received', 'updated_at'])
+        return JsonResponse({'error': 'Checksum mismatch; upload restarted.', **upload_status(session)}, status=400)
+
+    upload = uploads.AssembledUpload(uploads.part_path(session), session.filename, digest)
+    try:
+        session.document = create_session_document(session, upload)
+    finally:
+        upload.close()
+        uploads.discard_part(session)
+    session.save(update_fields=['document', 'updated_at'])
+    messages.success(request, 'Document uploaded successfully!')
+    return JsonResponse(upload_status(session), status=201)
+
+class InitiativeSheetCreateView(LoginRequiredMixin, SerializedWriteMixin, CreateView):
     model = InitiativeSheet
     form_class = InitiativeSheetForm
     template_name = 'dashboard/initiative_sheet_form.html'
 
     def dispatch(self, request, *args, **kwargs):
         self.initiative = get_object_or_404(Initiative, pk=kwargs['pk'])
-        # permission check
-        if request.user.profile.role != 'admin' and request.user.profile.district != self.initiative.district:
+        self.user_profile = request.user.profile
+        # permission check; compare ids so neither district is loaded
+        if self.user_profile.role != 'admin' and self.user_profile.district_id != self.initiative.district_id:
             messages.error(request, 'Access denied.')
             return redirect('dashboard_home')
         return super().dispatch(request, *args, **kwargs)
 
     def form_valid(self, form):
         form.instance.initiative = self.initiative
-        form.instance.coordinator = self.request.user.profile if self.request.user.profile.role == 'coordinator' else self.initiative.coordinator
-        messages.success(self.request, 'Sheet link added successfully!')
-        return super().form_valid(form)
+        if self.user_profile.role == 'coordinator':
+            form.instance.coordinator = self.user_profile
+        else:
+            form.instance.coordinator_id = self.initiative.coordinator_id
+        response = super().form_valid(form)
+        if form.instance.pk:
+            messages.success(self.request, 'Sheet link added successfully!')
+        return response
 
     def get_success_url(self):
         return reverse('initiative_detail', args=[self.initiative.pk])
 
-class EventCreateView(LoginRequiredMixin, CreateView):
+class EventCreateView(LoginRequiredMixin, SerializedWriteMixin, CreateView):
     model = Event
     form_class = EventForm
     template_name = 'dashboard/event_form.html'
 
     def dispatch(self, request, *args, **kwargs):
         self.initiative = get_object_or_404(Initiative, pk=kwargs['pk'])
-        if request.user.profile.role != 'admin' and request.user.profile.district != self.initiative.district:
+        self.user_profile = request.user.profile
+        if self.user_profile.role != 'admin' and self.user_profile.district_id != self.initiative.district_id:
             messages.error(request, 'Access denied.')
             return redirect('dashboard_home')
         return super().dispatch(request, *args, **kwargs)
 
     def form_valid(self, form):
         form.instance.initiative = self.initiative
-        form.instance.organizer = self.request.user.profile
-        messages.success(self.request, 'Event created successfully!')
-        return super().form_valid(form)
+        form.instance.organizer = self.user_profile
+        response = super().form_valid(form)
+        if form.instance.pk:
+            messages.success(self.request, 'Event created successfully!')
+        return response
 
     def get_success_url(self):
         return reverse('initiative_detail', args=[self.initiative.pk])
@@ -488,12 +700,19 @@ def update_task_status(request, pk):
             if new_status == 'completed':
                 task.completed_at = timezone.now()
             
-            task.save()
+            try:
+                with serialized_write():
+                    task.save()
+            except WriteQueueTimeout:
+                response = JsonResponse({'success': False, 'error': 'busy'}, status=503)
+                response['Retry-After'] = '1'
+                return response
             return JsonResponse({'success': True})
     
     return JsonResponse({'success': False})
 
 @login_required
+@replica_reads
 def get_dashboard_stats(request):
     """Get dashboard statistics via AJAX"""
     user_profile = request.user.profile
@@ -540,6 +759,10 @@ def note_detail(request, pk):
         note = get_object_or_404(Note, pk=pk)
     else:
         note = get_object_or_404(Note, pk=pk, initiative__district=user_profile.district)
+
+    # The notes list loads a note's full text only when its modal is opened
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return render(request, 'dashboard/note_content.html', {'note': note})
     
     return render(request, 'dashboard/note_detail.html', {
         'note': note,
@@ -561,42 +784,96 @@ def document_detail(request, pk):
         'user_profile': user_profile,
     })
 
+@login_required
+@require_safe
+def document_download(request, pk):
+    """Permission-checked document download; the transfer itself is handed
+    to the front-end server where configured"""
+    user_profile = request.user.profile
+    
+    if user_profile.role == 'admin':
+        document = get_object_or_404(Document.objects.only('file', 'sha256', 'original_name'), pk=pk)
+    else:
+        document = get_object_or_404(
+            Document.objects.only('file', 'sha256', 'original_name'), pk=pk, initiative__district=user_profile.district
+        )
+    
+    if not document.file or not document.file.storage.exists(document.file.name):
+        raise Http404('File not found')
+    filename = document.original_name or os.path.basename(document.file.name)
+    return sendfile.serve_file(
+        request,
+        document.file.path,
+        document.file.name,
+        filename,
+        # Content-addressed files make the digest a perfect strong validator
+        etag=f'"{document.sha256}"' if document.sha256 else None,
+        as_attachment=request.GET.get('inline') != '1',
+    )
+
+def _serve_preview(request, sha256, size, fmt):
+    if not sha256 or size not in previews.preview_sizes() or fmt not in previews.PREVIEW_FORMATS:
+        raise Http404('No such preview')
+    name = previews.preview_name(sha256, size, fmt)
+    if not default_storage.exists(name):
+        raise Http404('Preview not rendered yet')
+    return sendfile.serve_file(
+        request, default_storage.path(name), name, os.path.basename(name),
+        etag=f'"{sha256}-{size}-{fmt}"', as_attachment=False,
+    )
+
+@login_required
+@require_safe
+def document_preview(request, pk, size, fmt):
+    """Rendition of an image document, checked like document_download"""
+    user_profile = request.user.profile
+    documents = Document.objects.all() if user_profile.role == 'admin' else Document.objects.filter(
+        initiative__district=user_profile.district
+    )
+    document = get_object_or_404(documents.only('sha256', 'preview_ready'), pk=pk, preview_ready=True)
+    return _serve_preview(request, document.sha256, size, fmt)
+
+@login_required
+@require_safe
+def profile_picture_preview(request, pk, size, fmt):
+    """Rendition of a profile picture, for admins and the user themselves"""
+    if request.user.profile.role != 'admin' and request.user.pk != pk:
+        raise Http404('No such preview')
+    profile = get_object_or_404(UserProfile.objects.only('picture_sha256', 'preview_ready'), user_id=pk, preview_ready=True)
+    return _serve_preview(request, profile.picture_sha256, size, fmt)
+
 # Delete Views
-class InitiativeDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class InitiativeDeleteView(LoginRequiredMixin, OwnedObjectPermissionMixin, BulkDeleteMixin, DeleteView):
     model = Initiative
     template_name = 'dashboard/initiative_confirm_delete.html'
     success_url = reverse_lazy('initiatives_list')
-    
-    def test_func(self):
-        initiative = self.get_object()
-        return self.request.user.profile.role == 'admin' or initiative.coordinator == self.request.user.profile
+    owner_field = 'coordinator'
+    district_lookup = 'district'
+    related = ('district',)
 
-class TaskDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class TaskDeleteView(LoginRequiredMixin, OwnedObjectPermissionMixin, DeleteView):
     model = Task
     template_name = 'dashboard/task_confirm_delete.html'
     success_url = reverse_lazy('tasks_list')
-    
-    def test_func(self):
-        task = self.get_object()
-        return self.request.user.profile.role == 'admin' or task.assigned_to == self.request.user.profile
+    owner_field = 'assigned_to'
+    district_lookup = 'initiative__district'
+    related = ('initiative',)
 
-class NoteDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class NoteDeleteView(LoginRequiredMixin, OwnedObjectPermissionMixin, DeleteView):
     model = Note
     template_name = 'dashboard/note_confirm_delete.html'
     success_url = reverse_lazy('notes_list')
-    
-    def test_func(self):
-        note = self.get_object()
-        return self.request.user.profile.role == 'admin' or note.author == self.request.user.profile
+    owner_field = 'author'
+    district_lookup = 'initiative__district'
+    related = ('initiative',)
 
-class DocumentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class DocumentDeleteView(LoginRequiredMixin, OwnedObjectPermissionMixin, DeleteView):
     model = Document
     template_name = 'dashboard/document_confirm_delete.html'
     success_url = reverse_lazy('documents_list')
-    
-    def test_func(self):
-        document = self.get_object()
-        return self.request.user.profile.role == 'admin' or document.uploaded_by == self.request.user.profile
+    owner_field = 'uploaded_by'
+    district_lookup = 'initiative__district'
+    related = ('initiative',)
 
 # Reports and Analytics
 @login_required
@@ -610,41 +887,57 @@ def reports_dashboard(request):
     
     return render(request, 'dashboard/reports_dashboard.html', context)
 
-@login_required
-def initiatives_report(request):
-    """Initiatives report"""
+def _pivot_report(request, subject):
+    """Render a pivot report as HTML, CSV or JSON (``?format=``)."""
     user_profile = request.user.profile
-    
-    if user_profile.role == 'admin':
-        initiatives = Initiative.objects.all()
-    else:
-        initiatives = Initiative.objects.filter(district=user_profile.district)
-    
+    dimensions = [name for name in request.GET.getlist('dim') if name]
+    measures = request.GET.getlist('measure')
+    try:
+        report = reports.build_report(subject, user_profile, dimensions, measures)
+    except reports.ReportError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    output = request.GET.get('format', 'html')
+    if output == 'json':
+        return JsonResponse(report)
+    if output == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{subject}_report.csv"'
+        writer = csv.writer(response)
+        writer.writerow(report['dimensions'] + report['measures'])
+        for row in report['rows']:
+            writer.writerow(row['keys'] + ['' if value is None else value for value in row['values']])
+        return response
+
+    dimension_options, measure_options = reports.subject_options(subject)
+    selected = report['dimension_names'] + [''] * (reports.MAX_DIMENSIONS - len(report['dimension_names']))
+    query = request.GET.copy()
+    query.pop('format', None)
     context = {
-        'initiatives': initiatives,
+        'report': report,
+        'report_title': 'Initiatives Report' if subject == 'initiatives' else 'Tasks Report',
+        'dimension_options': dimension_options,
+        'measure_options': measure_options,
+        'selected_dimensions': selected,
+        'query': query.urlencode(),
         'user_profile': user_profile,
     }
-    
-    return render(request, 'dashboard/initiatives_report.html', context)
+    return render(request, 'dashboard/report.html', context)
+
+@login_required
+@replica_reads
+def initiatives_report(request):
+    """Initiatives report"""
+    return _pivot_report(request, 'initiatives')
 
 @login_required
+@replica_reads
 def tasks_report(request):
     """Tasks report"""
-    user_profile = request.user.profile
-    
-    if user_profile.role == 'admin':
-        tasks = Task.objects.all()
-    else:
-        tasks = Task.objects.filter(initiative__district=user_profile.district)
-    
-    context = {
-        'tasks': tasks,
-        'user_profile': user_profile,
-    }
-    
-    return render(request, 'dashboard/tasks_report.html', context)
+    return _pivot_report(request, 'tasks')
 
 @login_required
+@replica_reads
 def export_data(request):
     """Export data to CSV"""
     export_type = request.GET.get('type', 'initiatives')
@@ -657,39 +950,51 @@ def export_data(request):
         writer = csv.writer(response)
         writer.writerow(['Title', 'District', 'Coordinator', 'Type', 'Status', 'Start Date', 'End Date'])
         
-        if user_profile.role == 'admin':
-            initiatives = Initiative.objects.all()
-        else:
-            initiatives = Initiative.objects.filter(district=user_profile.district)
-        
-        for initiative in initiatives:
-            writer.writerow([
-                initiative.title,
-                initiative.district.name,
-                initiative.coordinator.user.get_full_name(),
-                initiative.get_initiative_type_display(),
-                initiative.get_status_display(),
-                initiative.start_date,
-                initiative.end_date or '',
-            ])
+        # Exports include archived initiatives
+        for model in (Initiative, InitiativeArchive):
+            if user_profile.role == 'admin':
+                initiatives = model.objects.all()
+            else:
+                initiatives = model.objects.filter(district=user_profile.district)
+            initiatives = initiatives.select_related('district', 'coordinator__user').only(
+                'title', 'initiative_type', 'status', 'start_date', 'end_date', 'district__name',
+                'coordinator__user__first_name', 'coordinator__user__last_name',
+            )
+            
+            for initiative in initiatives:
+                writer.writerow([
+                    initiative.title,
+                    # Archived rows can outlive their district or coordinator
+                    initiative.district.name if initiative.district else '',
+                    initiative.coordinator.user.get_full_name() if initiative.coordinator else '',
+                    initiative.get_initiative_type_display(),
+                    initiative.get_status_display(),
+                    initiative.start_date,
+                    initiative.end_date or '',
+                ])
     elif export_type == 'tasks':
         response['Content-Disposition'] = 'attachment; filename="tasks.csv"'
         writer = csv.writer(response)
         writer.writerow(['Title', 'Initiative', 'Assigned To', 'Priority', 'Status', 'Due Date', 'Progress %'])
-        if user_profile.role == 'admin':
-            tasks = Task.objects.select_related('initiative', 'assigned_to__user')
-        else:
-            tasks = Task.objects.filter(initiative__district=user_profile.district).select_related('initiative', 'assigned_to__user')
-        for task in tasks:
-            writer.writerow([
-                task.title,
-                task.initiative.title,
-                task.assigned_to.user.get_full_name(),
-                task.get_priority_display(),
-                task.get_status_display(),
-                task.due_date,
-                task.progress_percentage,
-            ])
+        for model in (Task, TaskArchive):
+            if user_profile.role == 'admin':
+                tasks = model.objects.select_related('initiative', 'assigned_to__user')
+            else:
+                tasks = model.objects.filter(initiative__district=user_profile.district).select_related('initiative', 'assigned_to__user')
+            tasks = tasks.only(
+                'title', 'priority', 'status', 'due_date', 'progress_percentage', 'initiative__title',
+                'assigned_to__user__first_name', 'assigned_to__user__last_name',
+            )
+            for task in tasks:
+                writer.writerow([
+                    task.title,
+                    task.initiative.title,
+                    task.assigned_to.user.get_full_name() if task.assigned_to else '',
+                    task.get_priority_display(),
+                    task.get_status_display(),
+                    task.due_date,
+                    task.progress_percentage,
+                ])
     
     return response
 
@@ -701,7 +1006,7 @@ def users_list(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard_home')
     
-    users = User.objects.all().select_related('profile')
+    users = User.objects.all().select_related('profile__district').defer('profile__bio', 'profile__district__description')
     
     context = {
         'users': users,
@@ -778,7 +1083,7 @@ class UserCreateView(LoginRequiredMixin, UserPassesTestMixin, View):
             'profile_form': profile_form,
         })
 
-class UserDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class UserDeleteView(LoginRequiredMixin, OwnedObjectPermissionMixin, BulkDeleteMixin, DeleteView):
     model = User
     template_name = 'dashboard/user_confirm_delete.html'
     success_url = reverse_lazy('users_list')
@@ -837,7 +1142,7 @@ class DistrictUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def test_func(self):
         return self.request.user.profile.role == 'admin'
 
-class DistrictDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class DistrictDeleteView(LoginRequiredMixin, UserPassesTestMixin, BulkDeleteMixin, DeleteView):
     model = District
     template_name = 'dashboard/district_confirm_delete.html'
     success_url = reverse_lazy('districts_list')
@@ -858,24 +1163,157 @@ def calendar_view(request):
         events = Event.objects.filter(initiative__district=user_profile.district).select_related('initiative').order_by('start_datetime')[:50]
         form = EventAdminForm(user=request.user)
 
+    # Subscription URLs for calendar apps
+    feed_urls = {
+        'user': request.build_absolute_uri(reverse(
+            'calendar_feed', args=[calendar_feeds.make_feed_token(request.user, 'user', user_profile.pk)]
+        )),
+    }
+    if user_profile.district_id:
+        feed_urls['district'] = request.build_absolute_uri(reverse(
+            'calendar_feed', args=[calendar_feeds.make_feed_token(request.user, 'district', user_profile.district_id)]
+        ))
+
     return render(request, 'dashboard/calendar.html', {
         'user_profile': user_profile,
         'events': events,
         'event_form': form,
+        'feed_urls': feed_urls,
     })
 
+@require_safe
+def calendar_feed(request, token):
+    """Tokenized ICS feed for a district or a coordinator"""
+    try:
+        user_id, scope, pk = calendar_feeds.read_feed_token(token)
+    except signing.BadSignature:
+        raise Http404('Unknown calendar feed')
+
+    # Re-check access on every poll so deactivated users and moved
+    # coordinators lose their feeds
+    profile = UserProfile.objects.select_related('user').filter(user_id=user_id, user__is_active=True).first()
+    if profile is None:
+        raise Http404('Unknown calendar feed')
+    if scope == 'user':
+        allowed = profile.pk == pk
+        name = f"{profile.user.get_full_name() or profile.user.username} - Yarl IT Hub"
+    else:
+        allowed = profile.role == 'admin' or profile.district_id == pk
+        district = District.objects.filter(pk=pk).first()
+        allowed = allowed and district is not None
+        name = f"{district.name} - Yarl IT Hub" if district else ''
+    if not allowed:
+        raise Http404('Unknown calendar feed')
+
+    start, end = calendar_feeds.feed_window()
+    events, tasks = calendar_feeds.feed_querysets(scope, pk, start, end)
+    etag, last_modified = calendar_feeds.change_stamp(scope, pk, events, tasks, start)
+    last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+    response = get_conditional_response(request, etag=f'"{etag}"', last_modified=last_modified_ts)
+    if response is None:
+        response = StreamingHttpResponse(
+            calendar_feeds.iter_calendar(name, events, tasks, request.get_host()),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="calendar.ics"'
+    response['ETag'] = f'"{etag}"'
+    if last_modified_ts:
+        response['Last-Modified'] = http_date(last_modified_ts)
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
+
+def encode_activity_cursor(activity):
+    """Opaque keyset cursor for the position just after ``activity``"""
+    stamp = int(activity.created_at.timestamp()) * 1000000 + activity.created_at.microsecond
+    return f"{stamp}.{activity.pk}"
+
+def decode_activity_cursor(cursor):
+    """Return ``(created_at, pk)`` for a cursor, or None if it is malformed"""
+    try:
+        stamp, pk = (int(part) for part in cursor.split('.'))
+        created_at = datetime.fromtimestamp(stamp // 1000000, tz=dt_timezone.utc).replace(microsecond=stamp % 1000000)
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return None
+    return created_at, pk
+
+@login_required
+@require_safe
+@gzip_page
+@replica_reads
+def tasks_api(request):
+    """JSON list of tasks with the tasks_list filters (see dashboard.listapi)"""
+    user_profile = request.user.profile
+    if user_profile.role == 'admin':
+        tasks = Task.objects.all()
+    else:
+        tasks = Task.objects.filter(initiative__district=user_profile.district)
+    return listapi.respond(_filter_tasks(tasks, request.GET), request.GET)
+
+@login_required
+@require_safe
+@gzip_page
+@replica_reads
+def initiatives_api(request):
+    """JSON list of initiatives with the initiatives_list filters"""
+    user_profile = request.user.profile
+    if user_profile.role == 'admin':
+        initiatives = Initiative.objects.all()
+    else:
+        initiatives = Initiative.objects.filter(district=user_profile.district)
+    return listapi.respond(_filter_initiatives(initiatives, request.GET), request.GET)
+
+@login_required
+@require_safe
+@gzip_page
+@replica_reads
+def notes_api(request):
+    """JSON list of notes with the notes_list filters"""
+    user_profile = request.user.profile
+    if user_profile.role == 'admin':
+        notes = Note.objects.all()
+    else:
+        notes = Note.objects.filter(initiative__district=user_profile.district)
+    return listapi.respond(_filter_notes(notes, request.GET), request.GET)
+
+@login_required
+@require_safe
+@gzip_page
+def sync_changes(request):
+    """Delta sync for offline clients: rows changed since ``cursor`` plus deletions"""
+    # Not replica_reads: a lagging replica would let the cursor skip rows
+    try:
+        limit = int(request.GET.get('limit') or 0)
+    except ValueError:
+        return HttpResponseBadRequest('limit must be a number')
+    response = JsonResponse(sync.changes(request.user.profile, request.GET.get('cursor', ''), limit))
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @login_required
 def timeline_view(request):
-    """Timeline view"""
+    """Timeline view backed by the activity stream, paged by keyset"""
     user_profile = request.user.profile
+    page_size = settings.TIMELINE_PAGE_SIZE
     
     if user_profile.role == 'admin':
-        activities = Task.objects.all().order_by('-created_at')[:20]
+        activities = Activity.objects.all()
     else:
-        activities = Task.objects.filter(initiative__district=user_profile.district).order_by('-created_at')[:20]
+        activities = Activity.objects.filter(district=user_profile.district)
+    
+    # Keyset pagination: rows strictly older than the cursor position
+    position = decode_activity_cursor(request.GET.get('before', ''))
+    if position:
+        created_at, pk = position
+        activities = activities.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    
+    page = list(activities.order_by('-created_at', '-id')[:page_size + 1])
+    next_cursor = encode_activity_cursor(page[page_size - 1]) if len(page) > page_size else None
     
     context = {
-        'activities': activities,
+        'activities': page[:page_size],
+        'next_cursor': next_cursor,
+        'is_first_page': position is None,
         'user_profile': user_profile,
     }
     
@@ -902,6 +1340,7 @@ def charts_page(request):
 
 # API Views
 @login_required
+@replica_reads
 def get_chart_data(request):
     """Get chart data for dashboard"""
     user_profile = request.user.profile
@@ -913,23 +1352,17 @@ def get_chart_data(request):
         initiatives = Initiative.objects.filter(district=user_profile.district)
         tasks = Task.objects.filter(initiative__district=user_profile.district)
     
-    # Monthly data for the last 6 months
-    months = []
-    initiative_data = []
-    task_data = []
-    
-    for i in range(6, 0, -1):
-        month_date = timezone.now() - timedelta(days=30 * i)
-        months.append(month_date.strftime('%b'))
-        
-        month_initiatives = initiatives.filter(created_at__year=month_date.year, created_at__month=month_date.month)
-        month_tasks = tasks.filter(created_at__year=month_date.year, created_at__month=month_date.month)
-        
-        initiative_data.append(month_initiatives.count())
-        task_data.append(month_tasks.count())
+    # Monthly data for the last 6 months, from the nightly KPI snapshots for
+    # the months they cover
+    months = kpis.chart_months()
+    initiative_data, task_data = kpis.monthly_created(kpis.scoped_snapshots(user_profile), months)
+    uncovered = kpis.uncovered_counts(months, initiative_data)
+    if uncovered:
+        initiative_data = kpis.fill_uncovered(initiative_data, initiatives.aggregate(**uncovered))
+        task_data = kpis.fill_uncovered(task_data, tasks.aggregate(**uncovered))
     
     chart_data = {
-        'labels': months,
+        'labels': [label for label, _, _ in months],
         'datasets': [
             {
                 'label': 'Initiatives',
@@ -951,6 +1384,35 @@ def get_chart_data(request):
     return JsonResponse(chart_data)
 
 @login_required
+@replica_reads
+def kpi_trend(request):
+    """Daily KPI history from the snapshot table"""
+    try:
+        days = min(max(int(request.GET.get('days', 90)), 1), 730)
+    except ValueError:
+        return HttpResponseBadRequest('days must be a number')
+    series = kpis.daily_trend(kpis.scoped_snapshots(request.user.profile), days)
+    return JsonResponse({'series': series})
+
+@login_required
+def deletion_job_status(request, pk):
+    """Progress of a queued district, initiative or user deletion"""
+    user_profile = request.user.profile
+    if user_profile.role == 'admin':
+        job = get_object_or_404(DeletionJob, pk=pk)
+    else:
+        job = get_object_or_404(DeletionJob, pk=pk, requested_by=user_profile)
+    deleted, total = deletion.job_progress(job)
+    return JsonResponse({
+        'status': job.status,
+        'target': job.target_label,
+        'deleted': deleted,
+        'total': total,
+        'error': job.error,
+    })
+
+@login_required
+@replica_reads
 def get_notifications(request):
     """Get notifications for user"""
     user_profile = request.user.profile
@@ -981,6 +1443,7 @@ def get_notifications(request):
 
 # AI assistant stubs
 @login_required
+@replica_reads
 def ai_summary(request):
     """Return AI-like daily/weekly summaries based on recent data (stub)."""
     user_profile = request.user.profile
@@ -1008,6 +1471,7 @@ def ai_summary(request):
     return JsonResponse(summary)
 
 @login_required
+@replica_reads
 def ai_suggestions(request):
     """Provide simple, rule-based next-step suggestions (stub)."""
     user_profile = request.user.profile
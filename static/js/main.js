@@ -104,6 +104,10 @@ $(document).ready(function() {
     $('.document-preview').on('click', function() {
         var fileUrl = $(this).data('file-url');
         var fileName = $(this).data('file-name');
+        var previewUrl = $(this).data('preview-url');
+        var body = previewUrl
+            ? `<img src="${previewUrl}" class="img-fluid d-block mx-auto" alt="${fileName}">`
+            : `<iframe src="${fileUrl}" width="100%" height="500px"></iframe>`;
         
         // Create modal for document preview
         var modal = `
@@ -115,10 +119,10 @@ $(document).ready(function() {
                             <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
                         </div>
                         <div class="modal-body">
-                            <iframe src="${fileUrl}" width="100%" height="500px"></iframe>
+                            ${body}
                         </div>
                         <div class="modal-footer">
-                            <a href="${fileUrl}" class="btn btn-primary" download>Download</a>
+                            <a href="${fileUrl.replace('?inline=1', '')}" class="btn btn-primary">Download</a>
                             <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Close</button>
                         </div>
                     </div>